@@ -0,0 +1,186 @@
+# art.py
+import os, hashlib, tempfile, threading, urllib.request
+from collections import OrderedDict
+from typing import Optional
+import base64
+from mutagen import File as MutagenFile
+from mutagen.id3 import ID3, APIC, ID3NoHeaderError
+from mutagen.flac import FLAC, Picture
+from mutagen.mp4 import MP4, MP4Cover
+from constants import ART_MAX_PX, ART_JPEG_QSCALE, ART_CACHE_MAX_FILES
+from config import ART_CACHE_DIR
+from ffmpeg_utils import encode_cover_jpeg
+
+FETCH_TIMEOUT = 10
+MAX_SOURCE_BYTES = 10 * 1024 * 1024   # ignore absurd "thumbnails"
+_URL_MEMO_SIZE = 4096
+
+def thumbnail_url(entry: Optional[dict]) -> Optional[str]:
+    """Best thumbnail yt-dlp reported for an entry (info['thumbnail'] is already the preferred one)."""
+    if not entry: return None
+    if entry.get("thumbnail"): return entry["thumbnail"]
+    thumbs = [t for t in (entry.get("thumbnails") or []) if t and t.get("url")]
+    return thumbs[-1]["url"] if thumbs else None
+
+class ArtCache:
+    """
+    Encoded covers on disk as <root>/<sha256 of source image>.jpg.
+    A thumbnail URL is fetched once per process (url -> digest memo) and each distinct
+    source image is downscaled/encoded once, so a playlist sharing one album cover (or
+    the same cover across requests) costs one fetch and one encode.
+    At most max_files covers are kept, least recently used pruned first; a file's mtime
+    is its LRU clock across restarts.
+    """
+    def __init__(self, root: str, max_files: int = ART_CACHE_MAX_FILES):
+        self.root = root
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._by_url: "OrderedDict[str, Optional[str]]" = OrderedDict()  # url -> digest (None = unusable)
+        self._url_locks: dict[str, threading.Lock] = {}
+        self._encode_lock = threading.Lock()   # encodes are rare (one per distinct cover)
+        os.makedirs(root, exist_ok=True)
+        found = sorted((e.stat().st_mtime, e.name[:-4]) for e in os.scandir(root) if e.name.endswith(".jpg"))
+        self._files: "OrderedDict[str, None]" = OrderedDict((d, None) for _, d in found)  # digest, oldest first
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest + ".jpg")
+
+    def _read(self, digest: Optional[str]) -> Optional[bytes]:
+        """A cover's bytes (marking it recently used), else None."""
+        if not digest: return None
+        try:
+            with open(self._path(digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self._files.pop(digest, None)
+            return None
+        with self._lock:
+            self._files[digest] = None
+            self._files.move_to_end(digest)
+        try: os.utime(self._path(digest))
+        except OSError: pass
+        return data
+
+    def _remember(self, url: str, digest: Optional[str]) -> None:
+        with self._lock:
+            self._by_url[url] = digest
+            self._by_url.move_to_end(url)
+            while len(self._by_url) > _URL_MEMO_SIZE:
+                self._by_url.popitem(last=False)
+
+    def _prune(self) -> None:
+        while len(self._files) > self.max_files:
+            digest, _ = self._files.popitem(last=False)
+            try: os.remove(self._path(digest))
+            except OSError: pass
+
+    def _store(self, source: bytes) -> Optional[str]:
+        """Encode a source image once; returns its digest."""
+        digest = hashlib.sha256(source).hexdigest()
+        final = self._path(digest)
+        with self._encode_lock:
+            if os.path.exists(final): return digest
+            try:
+                jpeg = encode_cover_jpeg(source, ART_MAX_PX, ART_JPEG_QSCALE)
+            except Exception:
+                return None
+            if not jpeg: return None
+            fd, tmp = tempfile.mkstemp(prefix=".incoming_", dir=self.root)
+            with os.fdopen(fd, "wb") as f:
+                f.write(jpeg)
+            os.replace(tmp, final)
+        with self._lock:
+            self._files[digest] = None
+            self._files.move_to_end(digest)
+            self._prune()
+        return digest
+
+    def cover(self, url: Optional[str]) -> Optional[bytes]:
+        """Encoded JPEG for a thumbnail URL, fetching/encoding at most once; None if unavailable."""
+        if not url: return None
+        with self._lock:
+            known = url in self._by_url
+            if known:
+                self._by_url.move_to_end(url)
+                digest = self._by_url[url]
+            else:
+                url_lock = self._url_locks.setdefault(url, threading.Lock())
+        if known: return self._read(digest)
+        # parallel playlist workers asking for the same cover wait for one fetch
+        with url_lock:
+            with self._lock:
+                known, digest = url in self._by_url, self._by_url.get(url)
+            if known: return self._read(digest)
+            digest = None
+            try:
+                req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
+                with urllib.request.urlopen(req, timeout=FETCH_TIMEOUT) as r:
+                    source = r.read(MAX_SOURCE_BYTES + 1)
+                if 0 < len(source) <= MAX_SOURCE_BYTES:
+                    digest = self._store(source)
+            except Exception:
+                pass
+            self._remember(url, digest)
+        with self._lock:
+            self._url_locks.pop(url, None)
+        return self._read(digest)
+
+def _picture(jpeg: bytes) -> Picture:
+    pic = Picture()
+    pic.type, pic.mime, pic.desc, pic.data = 3, "image/jpeg", "Cover", jpeg
+    return pic
+
+def tag_cover(path: str, jpeg: bytes) -> bool:
+    """
+    Write (replace) the front cover in place; audio frames are not re-encoded.
+    MP3 (ID3 APIC), M4A (covr), FLAC and Ogg/Opus (picture block); False for other containers.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".mp3":
+        try:
+            tags = ID3(path)
+        except ID3NoHeaderError:
+            tags = ID3()
+        tags.delall("APIC")
+        tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="Cover", data=jpeg))
+        tags.save(path, v2_version=3)
+    elif ext == ".m4a":
+        f = MP4(path)
+        f["covr"] = [MP4Cover(jpeg, imageformat=MP4Cover.FORMAT_JPEG)]
+        f.save()
+    elif ext == ".flac":
+        f = FLAC(path)
+        f.clear_pictures()
+        f.add_picture(_picture(jpeg))
+        f.save()
+    elif ext in (".opus", ".ogg"):
+        f = MutagenFile(path)
+        if f is None: return False
+        f["metadata_block_picture"] = [base64.b64encode(_picture(jpeg).write()).decode("ascii")]
+        f.save()
+    else:
+        return False
+    return True
+
+def fetch_cover(entry: Optional[dict]) -> Optional[bytes]:
+    """An entry's encoded cover (through the cache), None if unavailable. Network I/O: call it off the transcode pool."""
+    return get_art_cache().cover(thumbnail_url(entry))
+
+def embed_cover(path: str, jpeg: Optional[bytes]) -> bool:
+    """Tag a finished track with a cover from fetch_cover; False if there was no usable art."""
+    if not jpeg: return False
+    try:
+        return tag_cover(path, jpeg)
+    except Exception:
+        return False
+
+_art_cache: Optional[ArtCache] = None
+_art_lock = threading.Lock()
+
+def get_art_cache() -> ArtCache:
+    global _art_cache
+    with _art_lock:
+        if _art_cache is None:
+            _art_cache = ArtCache(ART_CACHE_DIR)
+        return _art_cache
@@ -0,0 +1,233 @@
+# bench.py
+"""
+Offline end-to-end benchmark for the rip pipeline (no network needed).
+
+A local HTTP server serves one synthetic track under many URLs plus an RSS feed
+per playlist size; yt-dlp's generic extractor resolves the feed like any
+playlist. Each size runs in a fresh child process (clean caches, honest peak RSS)
+and reports per-stage wall time, CPU time, peak RSS, bytes written and part counts.
+
+    python bench.py                                  # 1, 10, 100 entries -> bench_results.json
+    python bench.py --sizes 1 10 --out new.json --compare bench_results.json
+"""
+import os, sys, json, time, shutil, argparse, platform, resource, subprocess, tempfile, threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from xml.sax.saxutils import escape
+
+# -------------------- FIXTURES --------------------
+def make_source(out_dir: str, seconds: int) -> str:
+    """One AAC/M4A track (stereo tone + noise, so the encoder has real work)."""
+    path = os.path.join(out_dir, "source.m4a")
+    subprocess.run([
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.05:duration={seconds}",
+        "-filter_complex", "[0][1]amix=inputs=2,aformat=channel_layouts=stereo",
+        "-c:a", "aac", "-b:a", "160k", path,
+    ], check=True)
+    return path
+
+def feed_xml(base: str, n: int) -> bytes:
+    items = "".join(
+        f'<item><title>Bench Track {i:03d}</title><guid>bench-{n}-{i}</guid>'
+        f'<enclosure url="{base}/t/{n}/{i}.m4a" type="audio/mp4" length="1"/></item>'
+        for i in range(1, n + 1))
+    return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f'<title>{escape(f"Bench Feed {n}")}</title><link>{base}/</link><description>bench</description>'
+            f'{items}</channel></rss>').encode("utf-8")
+
+def serve(source: str) -> tuple[ThreadingHTTPServer, str]:
+    """Serve /feed/<n>.xml and /t/<n>/<i>.m4a (always the same source bytes) on 127.0.0.1."""
+    with open(source, "rb") as f:
+        audio = f.read()
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a): pass
+        def do_HEAD(self): self._send(head=True)
+        def do_GET(self): self._send()
+        def _send(self, head: bool = False):
+            base = f"http://{self.headers.get('Host')}"
+            if self.path.startswith("/feed/") and self.path.endswith(".xml"):
+                body, ctype = feed_xml(base, int(self.path[6:-4])), "application/rss+xml"
+            elif self.path.startswith("/t/") and self.path.endswith(".m4a"):
+                body, ctype = audio, "audio/mp4"
+            else:
+                self.send_error(404); return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if not head: self.wfile.write(body)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, name="bench-http", daemon=True).start()
+    return httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+
+# -------------------- MEASUREMENT --------------------
+def _usage() -> dict:
+    me, kids = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {"wall": time.perf_counter(), "cpu": me.ru_utime + me.ru_stime,
+            "child_cpu": kids.ru_utime + kids.ru_stime, "write_bytes": _io_write_bytes()}
+
+def _io_write_bytes() -> int:
+    """Bytes this process caused to be written to storage (Linux /proc; 0 elsewhere)."""
+    try:
+        with open("/proc/self/io") as f:
+            return next(int(l.split()[1]) for l in f if l.startswith("write_bytes"))
+    except (OSError, StopIteration, ValueError):
+        return 0
+
+def _delta(a: dict, b: dict) -> dict:
+    return {"wall_s": round(b["wall"] - a["wall"], 4), "cpu_s": round(b["cpu"] - a["cpu"], 4),
+            "child_cpu_s": round(b["child_cpu"] - a["child_cpu"], 4)}
+
+def _du(path: str) -> int:
+    total = 0
+    for root, _, names in os.walk(path):
+        for n in names:
+            try: total += os.path.getsize(os.path.join(root, n))
+            except OSError: pass
+    return total
+
+def run_case(url: str, n: int, part_mb: int, output_format: str) -> dict:
+    """Child-process body: one cold rip of an n-entry feed, then the two packaging paths."""
+    from rip_core import rip_to_zips
+    from packager import open_part, build_zip_parts
+    from config import TRACK_CACHE_DIR
+
+    limit = part_mb * 1024 * 1024
+    parts_sealed = []
+    u0 = _usage()
+    res = rip_to_zips(url, False, limit, part_cb=parts_sealed.append, output_format=output_format)
+    u1 = _usage()
+    files = sorted({fp for p in res["parts"] for fp in p["files"]})
+
+    # upload source: every part streamed once from the session files (what discord.File reads)
+    streamed = 0
+    for p in res["parts"]:
+        with open_part(p) as z:
+            while chunk := z.read(1024 * 1024):
+                streamed += len(chunk)
+    u2 = _usage()
+
+    # legacy path: materialized ZIP parts
+    zip_dir = tempfile.mkdtemp(prefix="bench_zips_")
+    zips = build_zip_parts(files, zip_dir, res["zip_base"], limit)
+    u3 = _usage()
+
+    out = {
+        "entries": n,
+        "tracks": res["count"],
+        "parts": len(res["parts"]),
+        "parts_sealed_early": len(parts_sealed),
+        "part_bytes": sum(p["size"] for p in res["parts"]),
+        "stages": {
+            "rip": {**_delta(u0, u1), "breakdown_s": {k: round(v, 4) for k, v in res.get("timings", {}).items()}},
+            "stream_parts": {**_delta(u1, u2), "bytes": streamed},
+            "build_zip_parts": {**_delta(u2, u3), "parts": len(zips), "bytes": _du(zip_dir)},
+        },
+        "total": _delta(u0, u3),
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "rip_rss_peak_kb": res["memory"]["rss_peak_bytes"] // 1024,
+        "peak_child_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        "io_write_bytes": _io_write_bytes() - u0["write_bytes"],
+        "disk_bytes": {"work_dir": _du(res["work_dir"]), "track_cache": _du(TRACK_CACHE_DIR)},
+    }
+    shutil.rmtree(zip_dir, ignore_errors=True)
+    shutil.rmtree(res["work_dir"], ignore_errors=True)
+    return out
+
+def spawn_case(url: str, n: int, args) -> dict:
+    """Run one size in a fresh interpreter with its own throwaway cache dirs."""
+    scratch = tempfile.mkdtemp(prefix="bench_cache_")
+    env = dict(os.environ, RIPPERROO_CACHE_DIR=os.path.join(scratch, "tracks"),
+               RIPPERROO_ART_DIR=os.path.join(scratch, "art"), NO_PROXY="127.0.0.1,localhost")
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", str(n), "--url", url,
+           "--part-mb", str(args.part_mb), "--format", args.format]
+    try:
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"case {n} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+# -------------------- REPORTING --------------------
+_COMPARE = [("rip wall s", ("stages", "rip", "wall_s")), ("rip cpu s", ("stages", "rip", "cpu_s")),
+            ("ffmpeg cpu s", ("stages", "rip", "child_cpu_s")),
+            ("stream wall s", ("stages", "stream_parts", "wall_s")),
+            ("build zips wall s", ("stages", "build_zip_parts", "wall_s")),
+            ("peak rss KiB", ("peak_rss_kb",)), ("io write B", ("io_write_bytes",)), ("parts", ("parts",))]
+
+def _dig(d: dict, path: tuple):
+    for k in path:
+        d = (d or {}).get(k)
+    return d
+
+def compare(old: dict, new: dict) -> str:
+    before = {c["entries"]: c for c in old.get("cases", [])}
+    lines = []
+    for case in new.get("cases", []):
+        prev = before.get(case["entries"])
+        if not prev: continue
+        lines.append(f"{case['entries']} entries:")
+        for label, path in _COMPARE:
+            a, b = _dig(prev, path), _dig(case, path)
+            if a is None or b is None: continue
+            pct = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            lines.append(f"  {label:<18} {a:>14,.3f} -> {b:>14,.3f}  {pct}")
+    return "\n".join(lines)
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Offline rip pipeline benchmark")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100], help="playlist sizes to rip")
+    ap.add_argument("--track-seconds", type=int, default=30, help="length of the synthetic track")
+    ap.add_argument("--part-mb", type=int, default=8, help="ZIP part limit (MiB)")
+    ap.add_argument("--format", default="mp3", choices=["mp3", "original", "auto"])
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", help="previous results JSON to diff against")
+    ap.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--url", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_case(args.url, args.child, args.part_mb, args.format)))
+        return
+
+    import yt_dlp.version
+    fixtures = tempfile.mkdtemp(prefix="bench_media_")
+    httpd, base = serve(make_source(fixtures, args.track_seconds))
+    try:
+        cases = []
+        for n in args.sizes:
+            case = spawn_case(f"{base}/feed/{n}.xml", n, args)
+            print(f"{n:>4} entries: rip {case['stages']['rip']['wall_s']:.2f}s "
+                  f"(cpu {case['stages']['rip']['cpu_s']:.2f}s + ffmpeg {case['stages']['rip']['child_cpu_s']:.2f}s), "
+                  f"{case['tracks']} tracks, {case['parts']} parts, peak rss {case['peak_rss_kb'] // 1024} MiB")
+            cases.append(case)
+    finally:
+        httpd.shutdown()
+        shutil.rmtree(fixtures, ignore_errors=True)
+
+    result = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "git": _git_rev(),
+                 "python": platform.python_version(), "yt_dlp": yt_dlp.version.__version__,
+                 "cpus": os.cpu_count(), "track_seconds": args.track_seconds,
+                 "part_mb": args.part_mb, "format": args.format},
+        "cases": cases,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"wrote {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print(compare(json.load(f), result))
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,104 @@
+import time
+_BOOT = time.perf_counter()   # startup timing starts before the heavy imports
+
+import os, json, asyncio, hashlib
 import discord
 from discord import app_commands
 from discord.ext import commands
-from config import TOKEN
-from discord_adapter import handle_rip
-from utils import auto_clean_temp
+from typing import Optional
+from config import TOKEN, METRICS_HOST, COMMAND_SYNC_STAMP
+from metrics import get_metrics
+from scheduler import get_scheduler
+from constants import DEFAULT_OUTPUT_FORMAT
+from discord_adapter import handle_rip, prewarm, reclaim_jobs, resume_jobs
+from workspace import get_workspace
+from fileserver import get_link_server
 
 intents = discord.Intents.default()
 bot = commands.Bot(command_prefix="*", intents=intents)
+startup = {"imports": time.perf_counter() - _BOOT}
+interrupted = []   # journals of rips the previous process died in (see journal.py)
+
+# -------------------- COMMAND SYNC --------------------
+def _tree_hash() -> str:
+    """Hash of the slash-command definitions (and the app they belong to)."""
+    payload = [bot.application_id, sorted((c.to_dict(bot.tree) for c in bot.tree.get_commands()),
+                                          key=lambda d: d["name"])]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _read_stamp() -> Optional[str]:
+    try:
+        with open(COMMAND_SYNC_STAMP, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _write_stamp(digest: str) -> None:
+    os.makedirs(os.path.dirname(COMMAND_SYNC_STAMP) or ".", exist_ok=True)
+    with open(COMMAND_SYNC_STAMP, "w", encoding="utf-8") as f:
+        f.write(digest)
+
+async def _sync_commands_if_changed() -> None:
+    """tree.sync() only when the command definitions changed since the last sync (delete the stamp to force)."""
+    digest = _tree_hash()
+    if _read_stamp() == digest:
+        print("✅ Slash commands unchanged, sync skipped.")
+        return
+    await bot.tree.sync()
+    _write_stamp(digest)
+    print("✅ Slash commands synced.")
+
+# -------------------- LIFECYCLE --------------------
+@bot.event
+async def setup_hook():
+    # once per process, before the gateway connects (on_ready fires again on every reconnect)
+    interrupted[:] = reclaim_jobs()   # before the janitor: it would sweep their session dirs
+    get_workspace().start()  # 🧹 janitor thread: sweeps old temp folders now and periodically
+    metrics = get_metrics()
+    metrics.gauge("ripperroo_rips_running", "Rips running now.", lambda: get_scheduler().stats()["running"])
+    metrics.gauge("ripperroo_rips_queued", "Rips waiting for a slot.", lambda: get_scheduler().stats()["queued"])
+    metrics.gauge("ripperroo_work_reserved_bytes", "Working space reserved by rips.", lambda: get_workspace().reserved())
+    metrics.gauge("ripperroo_startup_seconds", "Process start to first ready.", lambda: startup.get("ready", 0.0))
+    metrics.gauge("ripperroo_download_links", "Download links being served.", lambda: get_link_server().stats()["links"])
+    if (port := metrics.serve()):
+        print(f"📈 Metrics on http://{METRICS_HOST}:{port}/metrics")
+    if (base := await get_link_server().start()):
+        print(f"🔗 Download links on {base}")
+    t = time.perf_counter()
+    await _sync_commands_if_changed()
+    startup["sync"] = time.perf_counter() - t
+
+async def _prewarm() -> None:
+    t = time.perf_counter()
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, prewarm)
+    except Exception as e:
+        print(f"⚠️ Prewarm failed (first /rip will load yt-dlp): {e}")
+        return
+    print(f"🔥 Rip stack loaded in {time.perf_counter() - t:.2f}s")
 
 @bot.event
 async def on_ready():
     print(f"✅ Logged in as {bot.user}")
-    auto_clean_temp()  # 🧹 Clean old temp folders on startup
-    await bot.tree.sync()
-    print("✅ Slash commands synced and temp cleaned.")
+    if "ready" in startup: return   # reconnect
+    startup["ready"] = time.perf_counter() - _BOOT
+    print(f"⏱️ Ready in {startup['ready']:.2f}s (imports {startup['imports']:.2f}s, "
+          f"command sync {startup.get('sync', 0.0):.2f}s)")
+    # yt-dlp loads in the background: /rip is usable now, the first probe just doesn't pay for it
+    asyncio.create_task(_prewarm())
+    asyncio.create_task(resume_jobs(bot, interrupted))
 
 @bot.tree.command(name="rip", description="Rip audio from supported sites")
-@app_commands.describe(link="Provide a YouTube, SoundCloud, Vimeo, or Dailymotion link")
-async def rip(interaction: discord.Interaction, link: str):
-    await handle_rip(interaction, link)
+@app_commands.describe(link="Provide a YouTube, SoundCloud, Vimeo, or Dailymotion link",
+                       format="MP3 (default), original stream (no re-encode), or auto (original when good enough)",
+                       only_new="Playlists: only rip entries added since this server's last rip of it")
+@app_commands.choices(format=[
+    app_commands.Choice(name="MP3", value="mp3"),
+    app_commands.Choice(name="Original", value="original"),
+    app_commands.Choice(name="Auto", value="auto"),
+])
+async def rip(interaction: discord.Interaction, link: str, format: Optional[app_commands.Choice[str]] = None,
+              only_new: bool = False):
+    await handle_rip(interaction, link, format.value if format else DEFAULT_OUTPUT_FORMAT, only_new)
 
 bot.run(TOKEN)
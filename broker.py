@@ -0,0 +1,224 @@
+# broker.py
+import os, json, time, sqlite3, threading
+from typing import Any, Callable, Dict, Optional
+from constants import BROKER_POLL_SEC, WORKER_STALE_SEC, BROKER_KEEP_HOURS
+from config import BROKER_DB
+
+# Job kinds a worker runs (see worker.py); args/results are JSON
+KINDS = ("probe", "rip")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind      TEXT NOT NULL,
+    args      TEXT NOT NULL,
+    state     TEXT NOT NULL DEFAULT 'queued',   -- queued | running | done | failed | abandoned
+    worker    TEXT,
+    created   REAL NOT NULL,
+    heartbeat REAL,
+    result    TEXT,
+    error     TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+CREATE TABLE IF NOT EXISTS events (
+    seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id  INTEGER NOT NULL,
+    kind    TEXT NOT NULL,                      -- progress | part | track
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_job ON events (job_id, seq);
+"""
+
+class WorkerLost(RuntimeError):
+    """The worker running a job stopped heartbeating (crashed or was killed)."""
+
+class Broker:
+    """
+    Local job broker on one SQLite file (WAL), shared by the bot and its worker
+    processes on the same host.
+    - the bot enqueue()s a job and polls its events() and state
+    - a worker claim()s the oldest queued job, emit()s progress/part events,
+      heartbeat()s while it runs, then finish()es or fail()s it
+    - a restarted bot abandon()s what its previous process had in flight (it
+      resumes those rips itself); workers stop abandoned jobs at the next heartbeat
+    One connection per process, serialized by a lock; safe from any thread.
+    """
+    def __init__(self, path: str = BROKER_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _exec(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # ---------- bot side ----------
+    def enqueue(self, kind: str, args: Dict[str, Any]) -> int:
+        with self._lock:
+            cur = self._db.execute("INSERT INTO jobs (kind, args, created) VALUES (?, ?, ?)",
+                                   (kind, json.dumps(args), time.time()))
+            return cur.lastrowid
+
+    def events(self, job_id: int, after: int = 0) -> list[tuple[int, str, Any]]:
+        rows = self._exec("SELECT seq, kind, payload FROM events WHERE job_id = ? AND seq > ? ORDER BY seq",
+                          (job_id, after))
+        return [(seq, kind, json.loads(payload)) for seq, kind, payload in rows]
+
+    def status(self, job_id: int) -> Optional[dict]:
+        rows = self._exec("SELECT state, heartbeat, result, error FROM jobs WHERE id = ?", (job_id,))
+        if not rows: return None
+        state, hb, result, error = rows[0]
+        return {"state": state, "heartbeat": hb, "result": json.loads(result) if result else None, "error": error}
+
+    def forget(self, job_id: int) -> None:
+        """Drop a finished job and its events (the caller has read them)."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("DELETE FROM events WHERE job_id = ?", (job_id,))
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._db.execute("COMMIT")
+
+    def abandon(self) -> int:
+        """Give up on every unfinished job (their caller is gone); returns how many."""
+        with self._lock:
+            return self._db.execute("UPDATE jobs SET state = 'abandoned' WHERE state IN ('queued', 'running')").rowcount
+
+    def abandoned_alive(self) -> int:
+        """Abandoned jobs a live worker is still winding down (fresh heartbeat)."""
+        rows = self._exec("SELECT COUNT(*) FROM jobs WHERE state = 'abandoned' AND heartbeat > ?",
+                          (time.time() - WORKER_STALE_SEC,))
+        return rows[0][0]
+
+    # ---------- worker side ----------
+    def claim(self, worker: str) -> Optional[tuple[int, str, dict]]:
+        """Atomically take the oldest queued job: (id, kind, args), or None."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT id, kind, args FROM jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+                if row:
+                    self._db.execute("UPDATE jobs SET state = 'running', worker = ?, heartbeat = ? WHERE id = ?",
+                                     (worker, time.time(), row[0]))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return (row[0], row[1], json.loads(row[2])) if row else None
+
+    def emit(self, job_id: int, kind: str, payload: Any) -> None:
+        with self._lock:
+            self._db.execute("INSERT INTO events (job_id, kind, payload) VALUES (?, ?, ?)",
+                             (job_id, kind, json.dumps(payload, default=str)))
+
+    def heartbeat(self, job_id: int) -> bool:
+        """Refresh the job's heartbeat; False once it was abandoned (stop working on it)."""
+        self._exec("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+        st = self.status(job_id)
+        return bool(st) and st["state"] != "abandoned"
+
+    def finish(self, job_id: int, result: Any) -> None:
+        self._exec("UPDATE jobs SET state = 'done', result = ?, heartbeat = ? WHERE id = ? AND state = 'running'",
+                   (json.dumps(result, default=str), time.time(), job_id))
+
+    def fail(self, job_id: int, error: str) -> None:
+        self._exec("UPDATE jobs SET state = 'failed', error = ?, heartbeat = ? WHERE id = ? AND state IN ('queued', 'running')",
+                   (error, time.time(), job_id))
+
+    def prune(self, max_age_sec: float = BROKER_KEEP_HOURS * 3600) -> None:
+        """Drop jobs nobody collected (bot restarted mid-job) and their events."""
+        cutoff = time.time() - max_age_sec
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("DELETE FROM events WHERE job_id IN (SELECT id FROM jobs WHERE created < ?)", (cutoff,))
+            self._db.execute("DELETE FROM jobs WHERE created < ?", (cutoff,))
+            self._db.execute("COMMIT")
+
+_broker: Optional[Broker] = None
+_broker_lock = threading.Lock()
+
+def broker_enabled() -> bool:
+    """Worker mode is on when RIPPERROO_BROKER_DB is set; rips run in-process otherwise."""
+    return bool(BROKER_DB)
+
+def get_broker() -> Broker:
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = Broker()
+        return _broker
+
+# -------------------- CLIENT --------------------
+def remote_call(kind: str, args: Dict[str, Any],
+                on_event: Optional[Callable[[str, Any], None]] = None) -> Any:
+    """
+    Enqueue a job and block until a worker finishes it, relaying its events to
+    on_event(kind, payload) in order. Runs on the scheduler's thread pools, so the
+    event loop never touches SQLite. Raises RuntimeError with the worker's error.
+    """
+    broker = get_broker()
+    job_id = broker.enqueue(kind, args)
+    seen = 0
+    try:
+        while True:
+            st = broker.status(job_id)
+            for seen, ev, payload in broker.events(job_id, seen):
+                if on_event: on_event(ev, payload)
+            if st is None: raise RuntimeError("rip job vanished from the broker")
+            if st["state"] == "done": return st["result"]
+            if st["state"] == "failed": raise RuntimeError(st["error"] or "rip failed in worker")
+            if st["state"] == "abandoned": raise RuntimeError("rip job was abandoned")
+            if st["state"] == "running" and time.time() - (st["heartbeat"] or 0) > WORKER_STALE_SEC:
+                broker.fail(job_id, "worker stopped responding")
+                raise WorkerLost("The rip worker stopped responding.")
+            time.sleep(BROKER_POLL_SEC)
+    finally:
+        try: broker.forget(job_id)
+        except sqlite3.Error: pass
+
+def remote_extract_info(url: str, out_dir: str, include_art: bool, format_str: Optional[str] = None,
+                        flat: bool = False) -> Optional[dict]:
+    """ytdlp_wrapper.extract_info, run by a worker."""
+    return remote_call("probe", {"url": url, "out_dir": out_dir, "include_art": include_art,
+                                 "format_str": format_str, "flat": flat})
+
+# What a rip reads from a probed entry besides its URL (tracks.TrackInfo, cache keys, manifest ids)
+_ENTRY_KEYS = ("id", "extractor_key", "ie_key", "title", "track", "artist", "uploader", "channel", "album",
+               "playlist_index", "track_number", "duration")
+_PROBE_KEYS = ("_type", "id", "extractor_key", "title", "playlist_title", "playlist", "uploader", "channel",
+               "webpage_url")
+
+def _compact_probe(info: Optional[dict]) -> Optional[dict]:
+    """
+    A probed playlist as a flat listing (entry URLs + the fields above) for the job row, instead
+    of every entry's formats, thumbnails and headers; the worker resolves each entry as it
+    downloads it, keeping the probe's metadata (url_transparent). Unresolved (None) and
+    already-flat entries pass through; so do single videos.
+    """
+    entries = info.get("entries") if info else None
+    if not isinstance(entries, list): return info
+    def flat(e: Optional[dict]) -> Optional[dict]:
+        url = e and (e.get("webpage_url") or e.get("original_url"))
+        if not url or e.get("_type") in ("url", "url_transparent"): return e
+        return {**{k: e[k] for k in _ENTRY_KEYS if e.get(k) is not None}, "_type": "url_transparent", "url": url,
+                "ie_key": e.get("ie_key") or e.get("extractor_key")}
+    return {**{k: info[k] for k in _PROBE_KEYS if info.get(k) is not None}, "entries": [flat(e) for e in entries]}
+
+def remote_rip_to_zips(url: str, include_art: bool, zip_part_limit_bytes: int,
+                       progress_cb: Optional[Callable[[dict], None]] = None,
+                       part_cb: Optional[Callable[[dict], None]] = None,
+                       info: Optional[dict] = None, output_format: str = "mp3",
+                       work_dir: Optional[str] = None, resume: Optional[Dict[str, Any]] = None,
+                       track_cb: Optional[Callable[[dict], None]] = None) -> Dict[str, Any]:
+    """rip_core.rip_to_zips, run by a worker; progress, finished tracks and sealed parts stream back as events."""
+    def on_event(kind: str, payload: Any):
+        if kind == "progress" and progress_cb: progress_cb(payload)
+        elif kind == "part" and part_cb: part_cb(payload)
+        elif kind == "track" and track_cb: track_cb(payload)
+    return remote_call("rip", {"url": url, "include_art": include_art, "zip_part_limit_bytes": zip_part_limit_bytes,
+                               "info": _compact_probe(info), "output_format": output_format, "work_dir": work_dir,
+                               "stream_parts": part_cb is not None, "resume": resume,
+                               "track_events": track_cb is not None}, on_event)
@@ -1,4 +1,4 @@
-import os
+import os, tempfile
 
 TOKEN = os.getenv("DISCORD_TOKEN")
 
@@ -12,3 +12,39 @@ ALLOWED_DOMAINS = {
 # temp download path
 DOWNLOAD_DIR = os.path.join(os.getcwd(), "downloads")
 os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+
+# finished-track cache shared across rips (see track_cache.py)
+TRACK_CACHE_DIR = os.getenv("RIPPERROO_CACHE_DIR", os.path.join(os.getcwd(), "cache", "tracks"))
+
+# encoded album covers, keyed by source-image hash (see art.py)
+ART_CACHE_DIR = os.getenv("RIPPERROO_ART_DIR", os.path.join(os.getcwd(), "cache", "art"))
+
+# per-job metrics (see metrics.py): JSON-lines log + Prometheus text on localhost (port 0 disables)
+METRICS_LOG = os.getenv("RIPPERROO_METRICS_LOG", os.path.join(os.getcwd(), "logs", "rip_metrics.jsonl"))
+METRICS_HOST = os.getenv("RIPPERROO_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("RIPPERROO_METRICS_PORT", "9464"))
+
+# where rip session dirs live (see workspace.py)
+WORK_DIR = os.getenv("RIPPERROO_WORK_DIR", tempfile.gettempdir())
+
+# per-playlist delivery manifests for "only new" re-rips (see manifest.py)
+MANIFEST_DIR = os.getenv("RIPPERROO_MANIFEST_DIR", os.path.join(os.getcwd(), "cache", "manifests"))
+
+# local job broker for out-of-process rip workers (see broker.py, worker.py); unset = rip in-process
+BROKER_DB = os.getenv("RIPPERROO_BROKER_DB", "")
+# worker.py processes serving it (each runs one job at a time): the bot's rip cap in worker mode; 0 = RIP_MAX_CONCURRENT
+BROKER_WORKERS = int(os.getenv("RIPPERROO_WORKERS", "0"))
+
+# hash of the last slash-command tree synced to Discord (sync is skipped while it matches)
+COMMAND_SYNC_STAMP = os.getenv("RIPPERROO_COMMAND_STAMP", os.path.join(os.getcwd(), "cache", "command_tree.sha256"))
+
+# optional download-link delivery (see fileserver.py); port 0 = off. Behind a proxy/NAT set
+# RIPPERROO_LINK_BASE to the public URL. RIPPERROO_LINK_SECRET only keeps link signatures stable
+# across restarts: the links themselves live in memory, so every link answers 410 after a restart.
+LINK_HOST = os.getenv("RIPPERROO_LINK_HOST", "127.0.0.1")
+LINK_PORT = int(os.getenv("RIPPERROO_LINK_PORT", "0"))
+LINK_BASE_URL = os.getenv("RIPPERROO_LINK_BASE", "")
+LINK_SECRET = os.getenv("RIPPERROO_LINK_SECRET", "")
+
+# crash-safe journals of running rips, resumed at startup (see journal.py)
+JOURNAL_DIR = os.getenv("RIPPERROO_JOURNAL_DIR", os.path.join(os.getcwd(), "cache", "jobs"))
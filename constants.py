@@ -1,13 +1,79 @@
 # constants.py
 TARGET_ABR_KBPS = 192  # final MP3 bitrate
+
+# Output format per rip: "mp3" (re-encode), "original" (stream copy), "auto" (copy if good enough)
+OUTPUT_FORMATS = ("mp3", "original", "auto")
+DEFAULT_OUTPUT_FORMAT = "mp3"
+# "auto": minimum source kbps per codec that counts as meeting the MP3 target
+PASSTHROUGH_MIN_KBPS = {"mp3": TARGET_ABR_KBPS, "aac": 128, "opus": 96}
 ALLOWED_DOMAINS = {"youtube.com", "youtu.be", "soundcloud.com", "vimeo.com", "dailymotion.com"}
 DEFAULT_ZIP_PART_MB = 45  # local/test; Discord limit is read at runtime
-OUT_FILENAME_TEMPLATE = "%(title)s.%(ext)s"
+OUT_FILENAME_TEMPLATE = "%(title)s [%(id)s].%(ext)s"  # id keeps same-titled entries apart; ZIPs use tracks.display_name
+TRACK_CACHE_MAX_MB = 2048  # finished-MP3 cache cap (LRU); 0 disables
+
+# Parallel playlist mode: entries are spread over a bounded pool
+PLAYLIST_WORKERS = 4       # concurrent entries per rip
+PLAYLIST_PER_HOST = 3      # concurrent entries against any one host
+PLAYLIST_POOL = "thread"   # "thread" or "process"
+TRANSCODE_WORKERS = 0      # concurrent ffmpeg transcodes, bot-wide; 0 = one per CPU
+
+# Per-entry retries (see rip_core): playlist entries that fail on their own are retried with
+# YTDLP_FORMAT_FALLBACK, not the whole playlist
+ENTRY_RETRY_ATTEMPTS = 3       # tries per entry, the first one included
+ENTRY_RETRY_BACKOFF_SEC = 2.0  # wait before the first retry round; doubles per round
+ENTRY_RETRY_MAX_PER_JOB = 50   # retries per rip, all rounds together
+
+# Rip job scheduler (see scheduler.py)
+RIP_MAX_CONCURRENT = 3         # rips running at once, bot-wide
+RIP_MAX_PER_GUILD = 2          # ... per guild
+RIP_MAX_PER_USER = 1           # ... per user
+RIP_MAX_QUEUED = 25            # waiting rips before new ones are rejected
+RIP_MAX_QUEUED_PER_GUILD = 8   # one guild's share of the queue
+RIP_MAX_PROBES = 4             # concurrent link probes (cost estimation)
+RIP_AGING_PER_MIN = 20.0       # within a guild, a waiting rip's cost counts down this many audio-minutes per minute
+
+# ZIP part uploads (see uploads.py)
+UPLOAD_MAX_FILES = 10          # attachments per message (Discord)
+UPLOAD_CONCURRENCY = 3         # part replies in flight at once, per job
+UPLOAD_RETRIES = 3             # resends of one message on transient errors (5xx, dropped connection)
+UPLOAD_BACKOFF_SEC = 1.0       # first retry delay; doubles per attempt (jittered)
+
+# Download links (see fileserver.py): rips bigger than one attachment are served as a single ZIP
+LINK_TTL_HOURS = 24            # how long a link (and its session files) lives
+LINK_MAX_MB = 51200            # largest single ZIP served by link
+
+# Progress-UI edits (see render.py): (edits, per seconds) until rate-limit headers say otherwise
+RENDER_CHANNEL_BUDGET = (5, 5.0)   # shared by every view in one channel
+RENDER_WEBHOOK_BUDGET = (5, 5.0)   # per interaction (ephemeral followups)
+RENDER_MIN_INTERVAL = 1.0          # min seconds between edits of one message
 
 # Primary, then fallback if nothing downloads
 YTDLP_FORMAT_PRIMARY = "ba[ext=m4a]/ba[acodec^=mp4a]/ba[ext=webm]/ba/bestaudio/best"
 YTDLP_FORMAT_FALLBACK = "bestaudio/best"
 
+# Reused YoutubeDL sessions (see ytdlp_wrapper.SessionPool): keep-alive connections, cookies, extractor caches
+YTDLP_SESSIONS = 8                 # idle sessions kept per process; 0 = a fresh YoutubeDL per call
+YTDLP_SESSION_MAX_USES = 200       # calls before a session is closed and replaced
+
 # OPTIONAL: export your browser cookies and put the file in project root.
 # Use a “cookies.txt” extension (Netscape format).
 COOKIES_FILE = "cookies.txt"  # set to None to disable
+
+# Album art (see art.py): covers are downscaled + JPEG-encoded once and shared by content hash
+ART_MAX_PX = 600            # longest cover side
+ART_JPEG_QSCALE = 3         # ffmpeg mjpeg quality (2 = best .. 31 = worst)
+ART_CACHE_MAX_FILES = 5000  # encoded covers kept on disk (oldest pruned)
+
+# Working space (see workspace.py): session dirs are reserved against a quota and freed by a janitor
+WORK_QUOTA_MB = 20480          # bytes reserved by running/queued rips, bot-wide
+WORK_MIN_FREE_MB = 1024        # never plan to leave less than this free on the work volume
+WORK_WAIT_SEC = 600            # how long a rip may wait for space before it is rejected
+JANITOR_INTERVAL_SEC = 600     # orphan sweep period
+ORPHAN_MAX_AGE_HOURS = 1.0     # untracked ripperroo_* dirs older than this are removed
+
+# Worker mode (see broker.py, worker.py): rips run in separate processes fed by a SQLite broker
+BROKER_POLL_SEC = 0.2          # how often the bot / idle workers poll the broker
+PROGRESS_EVENT_SEC = 0.25      # "downloading" progress events per file, at most one per this
+WORKER_HEARTBEAT_SEC = 5       # running jobs refresh their heartbeat this often
+WORKER_STALE_SEC = 60          # a running job without a heartbeat this long is failed (worker died)
+BROKER_KEEP_HOURS = 24         # uncollected jobs/events older than this are pruned by workers
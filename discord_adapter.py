@@ -1,10 +1,21 @@
 # discord_adapter.py
 import os, asyncio, time, tempfile
 import discord
-from rip_core import rip_to_zips
-from constants import TARGET_ABR_KBPS
+from packager import open_part
+from scheduler import get_scheduler, estimate_cost, QueueFull
+from render import get_render
+from singleflight import get_flights, flight_key
+from metrics import JobMetrics, get_metrics, current_job, set_current_job, reset_current_job
+from constants import TARGET_ABR_KBPS, DEFAULT_OUTPUT_FORMAT, UPLOAD_CONCURRENCY, LINK_TTL_HOURS, LINK_MAX_MB
 from ui_components import ArtChoice
-from utils import validate_link, clean_dir
+from utils import validate_link
+from workspace import get_workspace, estimate_bytes, estimate_output_bytes, WorkspaceFull
+from fileserver import get_link_server
+from manifest import PlaylistManifest, NothingNew, is_playlist
+from broker import broker_enabled, get_broker, remote_extract_info, remote_rip_to_zips
+from journal import JobJournal
+from tracks import display_name
+from uploads import plan_batches, part_label, send_with_retry, too_large
 from config import ALLOWED_DOMAINS
 
 # Keep parts comfortably under the guild limit to avoid 413s.
@@ -23,103 +34,395 @@ def _render_bar(p01: float, eta: int | None, abr: int | None, title: str) -> str
     abr_part = f"  @{abr} kbps" if abr else ""
     return f"🎶 **{title}**\n```[{bar}]  {pct}%{eta_part}{abr_part}```"
 
-async def _animated_public(interaction: discord.Interaction):
-    msg = await interaction.channel.send(f"{interaction.user.mention} is ripping audio…")
-    state = {"dots": 0, "done": 0, "tot": None, "run": True}
+def _backend() -> tuple:
+    """(probe, rip) callables: out-of-process workers via the broker when enabled, else in-process."""
+    if broker_enabled(): return remote_extract_info, remote_rip_to_zips
+    # yt-dlp is imported on first use (or by prewarm()), not at bot startup
+    from rip_core import rip_to_zips
+    from ytdlp_wrapper import extract_info
+    return extract_info, rip_to_zips
+
+def prewarm() -> None:
+    """Import the rip stack and yt-dlp's extractors ahead of the first /rip (blocking; run off the loop)."""
+    if broker_enabled(): return   # workers do the ripping
+    _backend()
+    from ytdlp_wrapper import warm_extractors
+    warm_extractors()
+
+def _eph_view(interaction: discord.Interaction) -> tuple:
+    """(render key, route) for the job's ephemeral message (interaction webhook)."""
+    return ("eph", interaction.id), f"wh:{interaction.id}"
+
+async def _animated_public(channel: discord.abc.Messageable, mention: str, key_id):
+    msg = await channel.send(f"{mention} is ripping audio…")
+    state = {"done": 0, "tot": None, "run": True}
+    render = get_render()
+    key, route = ("pub", key_id), f"ch:{channel.id}"
     async def ticker():
+        # render only re-sends when the count actually changes
         while state["run"]:
-            dots = "." * (1 + (state["dots"] % 3))
             total = state["tot"]
-            text = (f"{interaction.user.mention} is ripping audio{dots}"
+            text = (f"{mention} is ripping audio…"
                     if total is None else
-                    f"{interaction.user.mention} is ripping audio{dots} ({state['done']}/{total})")
-            try: await msg.edit(content=text)
-            except Exception: pass
-            state["dots"] += 1
+                    f"{mention} is ripping audio… ({state['done']}/{total})")
+            render.set(key, msg, text, route)
             await asyncio.sleep(0.9)
+        await render.drop(key)
     task = asyncio.create_task(ticker())
     return msg, state, task
 
-async def _send_zips_as_replies(channel: discord.TextChannel, summary_msg: discord.Message, zips: list[str]):
-    """Always send each zip as its own message reply to summary_msg."""
-    total = len(zips)
-    for i, zp in enumerate(zips, start=1):
-        label = f"Part {i}/{total}" if total > 1 else "Download"
+async def _send_priority(channel: discord.TextChannel, **kwargs) -> discord.Message:
+    """channel.send with progress edits on the channel paused, so uploads go first."""
+    job = current_job()
+    files = kwargs.get("files") or ([kwargs["file"]] if kwargs.get("file") else [])
+    t = time.perf_counter()
+    with get_render().hold(f"ch:{channel.id}"):
         try:
-            await channel.send(content=f"📦 {label}", file=discord.File(zp), reference=summary_msg)
-        except Exception:
-            # try without reference if thread linking fails
+            msg = await channel.send(**kwargs)
+        finally:
+            if job and files: job.add_span("upload", time.perf_counter() - t)
+    if job and files:
+        job.count("bytes_uploaded", sum(getattr(f.fp, "size", 0) for f in files))
+        job.count("parts_uploaded", len(files))
+    return msg
+
+def _zip_file(part: dict) -> discord.File:
+    """Attachment streamed straight from the part's source files (no ZIP on disk)."""
+    return discord.File(open_part(part), filename=part["name"])
+
+async def _send_parts(channel: discord.TextChannel, content: str, parts: list[dict],
+                      reference: discord.Message | None = None) -> discord.Message:
+    """One message carrying these parts; transient failures resend only this message, with backoff."""
+    job = current_job()
+    async def send():
+        kw = {"reference": reference} if reference else {}
+        return await _send_priority(channel, content=content, files=[_zip_file(p) for p in parts], **kw)
+    return await send_with_retry(send, on_retry=lambda e: job and job.retry("upload_retry"))
+
+class _Replies:
+    """
+    Part replies under one anchor message, planned into batches up front and
+    uploaded UPLOAD_CONCURRENCY at a time. A failed batch is retried on its own
+    (never the parts that already went out). on_sent(batch) runs after each
+    batch reaches the channel (e.g. journal.JobJournal.sent).
+    """
+    def __init__(self, channel: discord.TextChannel, anchor: discord.Message, request_limit: int,
+                 on_sent=None):
+        self.channel, self.anchor, self.request_limit, self.on_sent = channel, anchor, request_limit, on_sent
+        self._sem = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+        self._tasks: list[asyncio.Task] = []
+
+    def send(self, parts: list[dict], start: int, total: int | None) -> None:
+        for batch in plan_batches(parts, self.request_limit):
+            self._tasks.append(asyncio.create_task(self._send(batch, start, total)))
+            start += len(batch)
+
+    async def _send(self, batch: list[dict], start: int, total: int | None) -> None:
+        job = current_job()
+        content = f"📦 {part_label(start, len(batch), total)}"
+        async with self._sem:
+            try:
+                await _send_parts(self.channel, content, batch, reference=self.anchor)
+                if self.on_sent: self.on_sent(batch)
+                return
+            except Exception as e:
+                err = e
+        if too_large(err) and len(batch) > 1:
+            # the request limit is lower than planned: one part per message from here
+            if job: job.retry("batch_split")
+            for i, p in enumerate(batch):
+                await self._send([p], start + i, total)
+        elif isinstance(err, discord.HTTPException) and not too_large(err) and err.status < 500:
+            # e.g. the anchor is gone: post without the reply link
+            if job: job.retry("reply_without_reference")
+            async with self._sem:
+                try: await _send_parts(self.channel, content, batch)
+                except Exception: return
+            if self.on_sent: self.on_sent(batch)
+
+    async def wait(self) -> None:
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+async def _send_zips_as_replies(channel: discord.TextChannel, summary_msg: discord.Message, zips: list[dict],
+                                request_limit: int, start: int = 1, total: int | None = None, on_sent=None):
+    """Send the parts as replies to summary_msg (batched per plan_batches) and wait for all of them."""
+    total = total if total is not None else start - 1 + len(zips)
+    replies = _Replies(channel, summary_msg, request_limit, on_sent)
+    replies.send(zips, start, total)
+    await replies.wait()
+
+async def _stream_parts(channel: discord.TextChannel, parts_q: asyncio.Queue, interim: str, request_limit: int,
+                        first: int = 1, on_sent=None):
+    """
+    Upload ZIP parts while the rip is still running (queue is closed with None).
+    Part 1 is held until part 2 is sealed, so single-part rips still go out as one
+    summary message with the file attached; later parts go out as replies as they arrive.
+    first: label of the first part (> 1 when a resumed rip already sent some).
+    Returns (anchor message or None, parts not sent yet, number of parts sent).
+    """
+    held: list[dict] = []
+    anchor = replies = None
+    sent = 0
+    while (zp := await parts_q.get()) is not None:
+        held.append(zp)
+        if anchor is None:
+            if len(held) < 2:
+                continue
             try:
-                await channel.send(content=f"📦 {label}", file=discord.File(zp))
+                anchor = await _send_parts(channel, interim, held[:1])
             except Exception:
-                pass
-        await asyncio.sleep(0.2)
+                if job := current_job(): job.retry("anchor_upload")
+                continue  # keep holding; the final send falls back to best effort
+            if on_sent: on_sent(held[:1])
+            replies = _Replies(channel, anchor, request_limit, on_sent)
+            sent, held = 1, held[1:]
+        replies.send(held, first + sent, 0)
+        sent += len(held); held = []
+    if replies: await replies.wait()
+    return anchor, held, sent
 
-async def _send_with_files_best_effort(channel: discord.TextChannel, content: str, zips: list[str]):
+async def _send_with_files_best_effort(channel: discord.TextChannel, content: str, zips: list[dict],
+                                       request_limit: int, start: int = 1, on_sent=None):
     """
-    Try to send summary + attachments in ONE message (<=10 files). If that fails,
-    post the summary text-only, then follow-up with each ZIP as its own message.
+    Send the summary with as many parts attached as the plan fits in one request
+    (<=10 files, <= request_limit bytes), the rest as replies. If the summary upload
+    fails for good, post it text-only and send every part as a reply.
     """
-    zips = [p for p in zips if p and os.path.isfile(p)]
+    zips = [p for p in zips if p and p.get("files")]
     if not zips:
         raise RuntimeError("No zip files to send.")
 
-    # Attempt single message with as many as possible (down to 1)
-    max_batch = min(len(zips), 10)
-    for n in range(max_batch, 0, -1):
-        try:
-            files = [discord.File(p) for p in zips[:n]]
-            msg = await channel.send(content=content, files=files)
-            # overflow parts as replies
-            if len(zips) > n:
-                await _send_zips_as_replies(channel, msg, zips[n:])
-            return msg
-        except discord.HTTPException as e:
-            # If it's a 413 or similar, fall through to text+followups quickly
-            if getattr(e, "status", None) == 413 or "Payload Too Large" in str(e):
-                break
-            continue
-        except Exception:
-            continue
+    job = current_job()
+    total = start - 1 + len(zips)
+    first = plan_batches(zips, request_limit)[0]
+    try:
+        msg = await _send_parts(channel, content, first)
+    except Exception:
+        msg = None
+    if msg:
+        if on_sent: on_sent(first)
+        if len(zips) > len(first):
+            await _send_zips_as_replies(channel, msg, zips[len(first):], request_limit,
+                                        start=start + len(first), total=total, on_sent=on_sent)
+        return msg
 
     # Fallback: summary text-only, then follow up each ZIP so users still get downloads
+    if job: job.retry("text_then_replies")
     msg = await channel.send(content=content)
-    await _send_zips_as_replies(channel, msg, zips)
+    await _send_zips_as_replies(channel, msg, zips, request_limit, start=start, total=total, on_sent=on_sent)
     return msg
 
-async def handle_rip(interaction: discord.Interaction, link: str):
+def _publish_links(res: dict) -> list[str]:
+    """Serve the rip's part(s) by signed link; the session dir goes to the janitor when the last link expires."""
+    parts, workspace = res["parts"], get_workspace()
+    left = [len(parts)]
+    def expired():
+        left[0] -= 1
+        if not left[0]: workspace.discard(res["work_dir"])
+    name = lambda p: f"{res['zip_base']}.zip" if len(parts) == 1 else p["name"]
+    return [get_link_server().publish(p, name(p), on_expire=expired) for p in parts]
+
+def _links_md(res: dict) -> str:
+    size = sum(p["size"] for p in res["parts"]) / (1024 * 1024)
+    if len(res["links"]) == 1:
+        links = f"[Download ZIP](<{res['links'][0]}>)"
+    else:
+        links = " · ".join(f"[Part {i}](<{u}>)" for i, u in enumerate(res["links"], start=1))
+    return f"**{links}** ({size:,.0f} MB, link expires in {LINK_TTL_HOURS} h)"
+
+def _summary(mention: str, res: dict, elapsed_sec: float, link: str, manifest=None, note: str = "") -> str:
+    """Final summary line (no rich preview, so the files aren't hidden behind an embed)."""
+    mm, ss = divmod(int(elapsed_sec), 60)
+    if not res.get("copied"):
+        quality = f"@ {TARGET_ABR_KBPS} kbps"
+    elif res["copied"] >= res["count"]:
+        quality = "in original quality"
+    else:
+        quality = f"({res['copied']} original, rest @ {TARGET_ABR_KBPS} kbps)"
+    if manifest:
+        since = manifest.last_rip
+        quality += f" · new since {time.strftime('%Y-%m-%d', time.localtime(since))}" if since else " · first rip of this playlist"
+    return (f"{mention} ripped 🎶 **{res['count']} track(s)** "
+            f"for {mm:02d}:{ss:02d} {quality}{note} · [Source](<{link}>) — "
+            + (_links_md(res) if res.get("links") else "**Download below ⤵️**")
+            + _skipped_md(res.get("skipped") or []))
+
+def _skipped_md(skipped: list[dict], shown: int = 5) -> str:
+    """'-# Skipped 3: a, b (too large), c' under the summary; empty when nothing was skipped."""
+    if not skipped: return ""
+    def name(s: dict) -> str:
+        title = (s.get("title") or s.get("id") or "untitled").replace("`", "'")
+        title = title if len(title) <= 60 else title[:59] + "…"
+        return f"{title} (too large)" if s.get("reason") == "too large" else title
+    names = ", ".join(name(s) for s in skipped[:shown])
+    more = f" (+{len(skipped) - shown} more)" if len(skipped) > shown else ""
+    return f"\n-# ⚠️ Skipped {len(skipped)} track(s): {names}{more}"
+
+async def _deliver(channel: discord.abc.Messageable, summary: str, res: dict, streamed: tuple,
+                   request_limit: int, first: int = 1, on_sent=None) -> None:
+    """
+    Post the summary with whatever _stream_parts (anchor, rest, sent) didn't send.
+    Streamed parts already went out under an anchor message: finish the tail and
+    promote the anchor to the summary. Otherwise best effort: single message with
+    attachments; if not, summary then follow-up ZIP posts.
+    """
+    anchor, rest, sent = streamed
+    if res.get("links"):
+        await channel.send(content=summary)
+    elif anchor:
+        try: await anchor.edit(content=summary)
+        except Exception: pass
+        await _send_zips_as_replies(channel, anchor, rest, request_limit, start=first + sent,
+                                    total=first - 1 + len(res["parts"]), on_sent=on_sent)
+    else:
+        await _send_with_files_best_effort(channel, summary, rest, request_limit, first + sent, on_sent)
+
+async def handle_rip(interaction: discord.Interaction, link: str, output_format: str = DEFAULT_OUTPUT_FORMAT,
+                     only_new: bool = False):
+    """
+    One /rip, instrumented: its JobMetrics go to the metrics log and /metrics when it ends.
+    Its journal (see journal.py) is closed too, unless the process is shutting down under it.
+    """
+    job = JobMetrics(interaction.id, guild=getattr(interaction.guild, "id", None),
+                     user=interaction.user.id, format=output_format, only_new=only_new)
+    token = set_current_job(job)   # tasks created below (uploader) inherit it
+    held: dict = {}   # "journal": the JobJournal _rip started, if any
+    try:
+        await _rip(interaction, link, output_format, only_new, job, held)
+        job.outcome = job.outcome or "ok"
+    except asyncio.CancelledError:
+        job.outcome = "cancelled"
+        raise
+    except Exception:
+        job.outcome = "error"
+        raise
+    finally:
+        # through the object: its closed guard keeps late track()/sent() writes from recreating it
+        if job.outcome != "cancelled" and held.get("journal"): held["journal"].close()
+        reset_current_job(token)
+        get_metrics().finish(job)
+
+async def _rip(interaction: discord.Interaction, link: str, output_format: str, only_new: bool, job: JobMetrics,
+               held: dict):
     started = time.monotonic()
 
     await interaction.response.defer(ephemeral=True, thinking=True)
     eph = await interaction.followup.send("✅ Received. Checking link…", ephemeral=True)
 
     if not validate_link(link, ALLOWED_DOMAINS):
+        job.outcome = "invalid"
         await eph.edit(content="❌ Unsupported or invalid link.")
         return
 
     # Album art choice (ephemeral)
     view = ArtChoice()
     await eph.edit(content="🎨 Include album art?", view=view)
-    await view.wait()
+    with job.span("user_choice"):
+        await view.wait()
     include_art = view.choice or False
     await eph.edit(content="Thank you for using Ripper Roo, your download will begin momentarily…", view=None)
+    loop = asyncio.get_running_loop()
 
-    # Public ticker
-    pub, pub_state, pub_task = await _animated_public(interaction)
+    # Determine safe per-file size (the guild limit also caps one upload request)
+    guild_limit = int(getattr(interaction.guild, "filesize_limit", 8 * 1024 * 1024))
+    part_limit = max(1, guild_limit - HEADROOM)
+
+    # Single-flight: the same link with the same options is ripped once; later
+    # callers attach to the running job and deliver its parts to their channel
+    flights = get_flights()
+    # "only new" re-rips remember deliveries per server (per user in DMs)
+    scope = (f"guild:{interaction.guild.id}" if interaction.guild else f"user:{interaction.user.id}") if only_new else None
+    flight, leader = flights.join(flight_key(link, include_art, TARGET_ABR_KBPS, part_limit, output_format, scope))
+    job.labels.update(art=include_art, shared=not leader)
+
+    # Admission (leader only): one probe prices the job (and is reused by the rip), then wait for a fair slot
+    sched = get_scheduler()
+    render = get_render()
+    eph_key, eph_route = _eph_view(interaction)
+    workspace = get_workspace()
+    probe_fn, rip_fn = _backend()
+    ticket = journal = None
+    if leader:
+        def on_position(pos: int):
+            render.set(eph_key, eph, f"⏳ Queued — you're **#{pos}** in line…", eph_route)
+        def on_disk_wait():
+            render.set(eph_key, eph, "💾 Waiting for free working space…", eph_route)
+        try:
+            with job.span("probe"):
+                # only-new: a flat listing is enough to diff against the manifest
+                flight.info = await sched.probe(probe_fn, link, tempfile.gettempdir(), include_art, None, only_new)
+            if only_new and is_playlist(flight.info):
+                flight.full_info = flight.info
+                flight.manifest = PlaylistManifest.load(scope, flight.info)
+                flight.info = flight.manifest.new_entries(flight.info)
+                if not flight.info["entries"]:
+                    raise NothingNew("Nothing new in this playlist since the last rip here. 🎉")
+            if is_playlist(flight.info):
+                flight.total = sum(1 for e in flight.info["entries"] if e) or None
+            # bigger than one attachment: one ZIP behind a download link instead of many parts
+            links = get_link_server()
+            flight.link_mode = links.enabled and estimate_output_bytes(flight.info, output_format) > part_limit
+            # working space is reserved up front (held while queued) so a started rip can't fill the disk
+            need = estimate_bytes(flight.info, output_format)
+            with job.span("disk_wait"):
+                flight.work_dir = await workspace.reserve(need, on_disk_wait)
+            # from here a restart resumes the rip instead of losing it (see resume_jobs); written
+            # before submit() so a failed write can't leave a ticket holding a slot
+            journal = held["journal"] = JobJournal.start(
+                interaction.id, channel=interaction.channel.id, guild=getattr(interaction.guild, "id", None),
+                user=interaction.user.id, link=link, include_art=include_art, output_format=output_format,
+                only_new=only_new, scope=scope, guild_limit=guild_limit, work_dir=flight.work_dir,
+                reserved=need, link_mode=flight.link_mode)
+            ticket = sched.submit(getattr(interaction.guild, "id", None), interaction.user.id,
+                                  estimate_cost(flight.info), on_position)
+        except (QueueFull, WorkspaceFull, NothingNew) as e:
+            job.outcome = "up_to_date" if isinstance(e, NothingNew) else "rejected"
+            flights.fail(flight, e)
+            if flight.release(): workspace.discard(flight.work_dir)
+            await render.drop(eph_key)
+            icon = {QueueFull: "🚦", WorkspaceFull: "💾", NothingNew: "✅"}[type(e)]
+            await eph.edit(content=f"{icon} {e}")
+            return
+        except BaseException as e:
+            if ticket: ticket.release()
+            flights.fail(flight, e)
+            if flight.release(): workspace.discard(flight.work_dir)
+            raise
+    else:
+        await eph.edit(content="🔗 This link is already being ripped — joining that job…")
+
+    try:
+        if ticket:
+            with job.span("queue_wait"):
+                await ticket.wait()
+        # Public ticker
+        pub, pub_state, pub_task = await _animated_public(interaction.channel, interaction.user.mention, interaction.id)
+    except BaseException as e:
+        if ticket:
+            ticket.release()
+            flights.fail(flight, e)
+        if flights.detach(flight): workspace.discard(flight.work_dir)
+        raise
+    info = None
+    if leader:
+        info, flight.info = flight.info, None   # rip_to_zips takes the probe over (see its docstring)
+    if flight.total is not None:
+        pub_state["tot"] = flight.total
+        job.labels["entries"] = flight.total
 
     # Ephemeral progress with smoothing
-    loop = asyncio.get_running_loop()
     prog = {
         "title": "…",
         "p01_target": 0.0,   # true % from hooks
         "p01_smooth": 0.0,   # eased % for UI
         "eta": None,
-        "abr": TARGET_ABR_KBPS,
+        "abr": TARGET_ABR_KBPS if output_format == "mp3" else None,
         "active": True,
     }
 
     async def animator():
-        # smooth using exponential moving average toward target
+        # smooth using exponential moving average toward target; the render
+        # scheduler decides when (and whether) the eased frame is actually sent
         alpha = 0.20  # smoothing factor; higher = faster
         tick = 0.16   # ~6 fps
         while prog["active"]:
@@ -127,11 +430,9 @@ async def handle_rip(interaction: discord.Interaction, link: str):
             t = prog["p01_target"]
             s = prog["p01_smooth"]
             prog["p01_smooth"] = s + alpha * (t - s)
-            try:
-                await eph.edit(content=_render_bar(prog["p01_smooth"], prog["eta"], prog["abr"], prog["title"]))
-            except Exception:
-                pass
+            render.set(eph_key, eph, _render_bar(prog["p01_smooth"], prog["eta"], prog["abr"], prog["title"]), eph_route)
             await asyncio.sleep(tick)
+        await render.drop(eph_key)
     anim_task = asyncio.create_task(animator())
 
     # Hook: update target % from yt-dlp; animator eases the bar
@@ -139,7 +440,7 @@ async def handle_rip(interaction: discord.Interaction, link: str):
         def upd():
             status = d.get("status")
             fn = d.get("filename") or "unknown"
-            prog["title"] = os.path.splitext(os.path.basename(fn))[0]
+            prog["title"] = os.path.splitext(display_name(fn))[0]
             if status == "downloading":
                 total = d.get("total_bytes") or d.get("total_bytes_estimate")
                 dl    = d.get("downloaded_bytes")
@@ -158,24 +459,61 @@ async def handle_rip(interaction: discord.Interaction, link: str):
                 pub_state["done"] += 1
         loop.call_soon_threadsafe(upd)
 
-    # Determine safe per-file size
-    guild_limit = int(getattr(interaction.guild, "filesize_limit", 8 * 1024 * 1024))
-    part_limit = max(1, guild_limit - HEADROOM)
+    # Pipelined delivery: parts are uploaded as soon as the rip seals them
+    parts_q: asyncio.Queue = asyncio.Queue()
+    def part_cb(zp: dict):
+        loop.call_soon_threadsafe(parts_q.put_nowait, zp)
+    interim = f"{interaction.user.mention} is ripping 🎶 · [Source](<{link}>) — **parts arriving below ⤵️**"
+    on_sent = journal.sent if journal else None
+    uploader = asyncio.create_task(_stream_parts(interaction.channel, parts_q, interim, guild_limit, on_sent=on_sent))
 
-    # Run rip (yt-dlp+ffmpeg) with progress callback
+    # Subscribe to the flight (replays parts already sealed), then run it or wait on it
+    pub_state["done"] = flight.attach(progress_cb, part_cb)
     try:
-        res = await asyncio.to_thread(rip_to_zips, link, include_art, part_limit, progress_cb)
+        if leader:
+            try:
+                with job.span("rip"):
+                    res = await sched.run(ticket, rip_fn, link, include_art,
+                                          LINK_MAX_MB * 1024 * 1024 if flight.link_mode else part_limit,
+                                          flight.progress_cb, None if flight.link_mode else flight.part_cb,
+                                          info, output_format,
+                                          flight.work_dir, None, journal.track)
+            except BaseException as e:
+                flights.fail(flight, e)
+                raise
+            if flight.link_mode:
+                res["links"] = _publish_links(res)   # before finish(): followers deliver the same links
+            flights.finish(flight, res)
+            job.absorb(res)   # the leader owns the rip's stage breakdown and bytes
+        else:
+            with job.span("shared_wait"):
+                try:
+                    res = await flight.wait()
+                except asyncio.CancelledError:
+                    if flights.detach(flight): workspace.discard(flight.work_dir)
+                    raise
     except Exception as e:
+        job.outcome = "failed"
         prog["active"] = False
         try: await anim_task
         except Exception: pass
         pub_state["run"] = False
         try: await pub_task
         except Exception: pass
-        await eph.edit(content=f"❌ Rip failed: `{e}`")
+        parts_q.put_nowait(None)
+        anchor = None
+        try: anchor, _, _ = await uploader
+        except Exception: pass
+        if anchor:
+            try: await anchor.edit(content=f"{interaction.user.mention} ⚠️ rip stopped early — parts above are partial · [Source](<{link}>)")
+            except Exception: pass
+        # partial parts were streamed from the session dir; only now may it go
+        if flight.release(): workspace.discard(flight.work_dir)
+        await eph.edit(content=f"✅ {e}" if isinstance(e, NothingNew) else f"❌ Rip failed: `{e}`")
         try: await pub.delete()
         except Exception: pass
         return
+    parts_q.put_nowait(None)
 
     # Close UI animations
     prog["active"] = False
@@ -188,30 +526,165 @@ async def handle_rip(interaction: discord.Interaction, link: str):
     try: await pub.delete()
     except Exception: pass
 
-    # Final summary (suppress rich preview so files aren’t hidden by embeds)
-    elapsed = int(time.monotonic() - started)
-    mm, ss = divmod(elapsed, 60)
-    elapsed_txt = f"{mm:02d}:{ss:02d}"
-    source_md = f"[Source](<{link}>)"
-    summary = (f"{interaction.user.mention} ripped 🎶 **{res['count']} track(s)** "
-               f"for {elapsed_txt} @ {TARGET_ABR_KBPS} kbps · {source_md} — **Download below ⤵️**")
-
-    # Try best effort: single message with attachments; if not, summary then follow-up ZIP posts
+    summary = _summary(interaction.user.mention, res, time.monotonic() - started, link, flight.manifest)
     try:
-        await _send_with_files_best_effort(interaction.channel, summary, res["zips"])
+        with job.span("deliver_tail"):
+            await _deliver(interaction.channel, summary, res, await uploader, guild_limit, on_sent=on_sent)
     except Exception as e:
+        job.outcome = "upload_failed"
         await eph.edit(content=f"❌ Failed to attach ZIP(s): `{e}`")
-        clean_dir(res.get("work_dir") or tempfile.gettempdir())
+        if flight.release() and not res.get("links"): workspace.discard(res.get("work_dir"))
         return
+    if res.get("links"):
+        job.count("bytes_linked", sum(p["size"] for p in res["parts"]))
+
+    # delivered: remember these entries for the next "only new" re-rip
+    if flight.manifest:
+        try: flight.manifest.record(flight.full_info, res.get("entry_ids") or [])
+        except OSError: pass
 
+    # the work dir is shared by every caller of this flight: the last delivery hands it
+    # to the workspace janitor (deleted off the event loop); linked rips keep it until the links expire
+    if flight.release() and not res.get("links"): workspace.discard(res.get("work_dir"))
     await eph.edit(content="✅ Done! Cleaning up…")
-    try:
-        await asyncio.sleep(1.0)
-        clean_dir(res.get("work_dir") or tempfile.gettempdir())
-    except Exception:
-        pass
     try:
         await asyncio.sleep(0.6)
         await eph.delete()
     except Exception:
         pass
+
+# ---------- Resume after restart ----------
+def reclaim_jobs() -> list[JobJournal]:
+    """
+    At startup, before the workspace janitor runs: journals of rips the previous
+    process died in, with their session dirs re-adopted (so the orphan sweep keeps
+    them) and, in worker mode, their broker jobs abandoned (this process resumes them).
+    """
+    journals = JobJournal.pending()
+    if not journals: return journals
+    if broker_enabled():
+        get_broker().abandon()
+    workspace = get_workspace()
+    for j in journals:
+        workspace.adopt(j.data["work_dir"], j.data.get("reserved") or 0)
+    return journals
+
+async def resume_jobs(client: discord.Client, journals: list[JobJournal]) -> None:
+    """Resume reclaimed rips in the background, delivering to the channels they were started in."""
+    if not journals: return
+    if broker_enabled():
+        # a worker may still be writing into a session dir until it notices the abandon
+        loop = asyncio.get_running_loop()
+        while await loop.run_in_executor(None, get_broker().abandoned_alive):
+            await asyncio.sleep(1.0)
+    print(f"♻️ Resuming {len(journals)} interrupted rip(s)")
+    for j in journals:
+        asyncio.create_task(_resume_job(client, j))
+
+async def _resume_job(client: discord.Client, j: JobJournal) -> None:
+    d = j.data
+    job = JobMetrics(d["job"], guild=d.get("guild"), user=d.get("user"), format=d["output_format"],
+                     only_new=d["only_new"], resumed=True)
+    token = set_current_job(job)
+    try:
+        await _resume(client, j, job)
+        job.outcome = job.outcome or "ok"
+    except asyncio.CancelledError:
+        job.outcome = "cancelled"
+        raise
+    except Exception as e:
+        job.outcome = "error"
+        print(f"⚠️ Couldn't resume rip {d['job']}: {e}")
+    finally:
+        if job.outcome != "cancelled": j.close()
+        reset_current_job(token)
+        get_metrics().finish(job)
+
+async def _resume(client: discord.Client, j: JobJournal, job: JobMetrics) -> None:
+    d = j.data
+    workspace, sched = get_workspace(), get_scheduler()
+    work_dir, keep_dir, channel = d["work_dir"], False, None
+    mention, link, include_art, output_format = f"<@{d['user']}>", d["link"], d["include_art"], d["output_format"]
+    try:
+        channel = client.get_channel(d["channel"]) or await client.fetch_channel(d["channel"])
+        part_limit = max(1, d["guild_limit"] - HEADROOM)
+        probe_fn, rip_fn = _backend()
+        with job.span("probe"):
+            info = await sched.probe(probe_fn, link, tempfile.gettempdir(), include_art, None, d["only_new"])
+        manifest = full_info = None
+        if d["only_new"] and is_playlist(info):
+            full_info = info
+            manifest = PlaylistManifest.load(d["scope"], info)
+            info = manifest.new_entries(info)
+            if not info["entries"]:
+                job.outcome = "up_to_date"
+                return
+        if not os.path.isdir(work_dir):
+            # the session dir went with the restart: start over (parts already sent stay skipped)
+            with job.span("disk_wait"):
+                work_dir = await workspace.reserve(d.get("reserved") or estimate_bytes(info, output_format))
+            j.update(work_dir=work_dir, tracks={})
+        ticket = sched.submit(d.get("guild"), d["user"], estimate_cost(info))
+        try:
+            with job.span("queue_wait"):
+                await ticket.wait()
+        except BaseException:
+            ticket.release()
+            raise
+
+        pub, pub_state, pub_task = await _animated_public(channel, mention, d["job"])
+        entries = (info or {}).get("entries")
+        if isinstance(entries, list):
+            pub_state["tot"] = sum(1 for e in entries if e) or None
+        loop = asyncio.get_running_loop()
+        def progress_cb(p: dict):
+            def upd():
+                pub_state["done"] += 1
+            if p.get("status") == "finished": loop.call_soon_threadsafe(upd)
+
+        first = d["sent_parts"] + 1
+        parts_q: asyncio.Queue = asyncio.Queue()
+        def part_cb(zp: dict):
+            loop.call_soon_threadsafe(parts_q.put_nowait, zp)
+        interim = f"{mention} is ripping 🎶 (resumed after a restart) · [Source](<{link}>) — **parts arriving below ⤵️**"
+        uploader = asyncio.create_task(_stream_parts(channel, parts_q, interim, d["guild_limit"], first, j.sent))
+        started = d["created"]
+        try:
+            with job.span("rip"):
+                res = await sched.run(ticket, rip_fn, link, include_art,
+                                      LINK_MAX_MB * 1024 * 1024 if d["link_mode"] else part_limit,
+                                      progress_cb, None if d["link_mode"] else part_cb,
+                                      info, output_format, work_dir, j.resume_state(), j.track)
+        except Exception:
+            parts_q.put_nowait(None)
+            try: await uploader   # partial parts stream from work_dir: let them finish first
+            except Exception: pass
+            raise
+        finally:
+            parts_q.put_nowait(None)
+            pub_state["run"] = False
+            try: await pub_task
+            except Exception: pass
+            try: await pub.delete()
+            except Exception: pass
+        job.absorb(res)
+        if d["link_mode"]:
+            res["links"] = _publish_links(res)
+            keep_dir = True   # the links own it now
+            job.count("bytes_linked", sum(p["size"] for p in res["parts"]))
+        summary = _summary(mention, res, time.time() - started, link, manifest, " (resumed after a restart)")
+        with job.span("deliver_tail"):
+            await _deliver(channel, summary, res, await uploader, d["guild_limit"], first, j.sent)
+        if manifest:
+            try: manifest.record(full_info, res.get("entry_ids") or [])
+            except OSError: pass
+    except asyncio.CancelledError:
+        keep_dir = True   # shutting down again: the journal stays, so does the dir
+        raise
+    except Exception as e:
+        if channel:
+            try: await channel.send(f"{mention} ⚠️ Your rip couldn't be resumed after a restart: `{e}` · [Source](<{link}>)")
+            except Exception: pass
+        raise
+    finally:
+        if not keep_dir: workspace.discard(work_dir)
@@ -1,41 +1,66 @@
 # ffmpeg_utils.py
 import shutil, subprocess, os
+from typing import Dict, Optional
 from constants import TARGET_ABR_KBPS
 
 def ensure_ffmpeg_available() -> None:
     if not shutil.which("ffmpeg"):
         raise RuntimeError("ffmpeg is not available on PATH. Install ffmpeg first.")
 
-def transcode_to_mp3(src_path: str, dst_path: str, abr_kbps: int = TARGET_ABR_KBPS) -> None:
+def transcode_to_mp3(src_path: str, dst_path: str, abr_kbps: int = TARGET_ABR_KBPS,
+                     metadata: Optional[Dict[str, str]] = None) -> None:
     """
     Transcode (or re-mux) any audio file to constant-bitrate MP3 using ffmpeg.
-    Overwrites dst_path if exists.
+    metadata becomes ID3 text tags. Overwrites dst_path if exists.
     """
     ensure_ffmpeg_available()
     os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    tags = []
+    for k, v in (metadata or {}).items():
+        tags += ["-metadata", f"{k}={v}"]
     cmd = [
         "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
         "-i", src_path,
         "-vn",
         "-acodec", "libmp3lame",
         "-b:a", f"{abr_kbps}k",
+        *tags,
+        "-id3v2_version", "3",
         dst_path
     ]
     subprocess.run(cmd, check=True)
 
-def embed_art_in_mp3(mp3_path: str, art_path: str) -> None:
-    """Embed album art into the MP3 as APIC (front cover)."""
+def remux_audio(src_path: str, dst_path: str, metadata: Optional[Dict[str, str]] = None) -> None:
+    """
+    Copy the audio stream into the container implied by dst_path's extension (no decode/encode).
+    metadata becomes container tags. Overwrites dst_path if exists.
+    """
     ensure_ffmpeg_available()
-    tmp = mp3_path + ".arttmp.mp3"
+    tags = []
+    for k, v in (metadata or {}).items():
+        tags += ["-metadata", f"{k}={v}"]
     cmd = [
         "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
-        "-i", mp3_path, "-i", art_path,
-        "-map", "0:a", "-map", "1:v",
+        "-i", src_path,
+        "-map", "0:a:0",
         "-c:a", "copy",
-        "-c:v", "mjpeg",
-        "-metadata:s:v", "title=Album cover",
-        "-metadata:s:v", "comment=Cover (front)",
-        tmp
+        *tags,
+        dst_path
     ]
     subprocess.run(cmd, check=True)
-    os.replace(tmp, mp3_path)
+
+def encode_cover_jpeg(image: bytes, max_px: int, qscale: int = 3) -> bytes:
+    """
+    Downscale (longest side <= max_px, aspect kept) and re-encode any image to baseline JPEG.
+    Input/output go through pipes; nothing is written to disk.
+    """
+    ensure_ffmpeg_available()
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-vf", f"scale=w='min(iw,{max_px})':h='min(ih,{max_px})':force_original_aspect_ratio=decrease",
+        "-frames:v", "1",
+        "-c:v", "mjpeg", "-q:v", str(qscale), "-pix_fmt", "yuvj420p",
+        "-f", "image2pipe", "pipe:1"
+    ]
+    return subprocess.run(cmd, input=image, capture_output=True, check=True).stdout
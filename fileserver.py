@@ -0,0 +1,164 @@
+# fileserver.py
+import hmac, time, base64, asyncio, hashlib, secrets
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import quote
+from aiohttp import web
+from constants import LINK_TTL_HOURS
+from config import LINK_HOST, LINK_PORT, LINK_BASE_URL, LINK_SECRET
+from packager import open_part
+
+CHUNK = 256 * 1024
+SWEEP_SEC = 60
+
+class _Published:
+    __slots__ = ("part", "name", "expires", "on_expire")
+    def __init__(self, part: Dict[str, Any], name: str, expires: float, on_expire: Optional[Callable[[], None]]):
+        self.part, self.name, self.expires, self.on_expire = part, name, expires, on_expire
+
+def _parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """
+    Single 'bytes=a-b' / 'bytes=a-' / 'bytes=-n' range -> (start, end inclusive).
+    None = serve the whole file (no header, malformed or multi-range); raises 416 if unsatisfiable.
+    """
+    if not header or not header.startswith("bytes=") or "," in header: return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if not first:
+            n = int(last)
+            start, end = max(0, size - n), size - 1
+            if n <= 0: start = size
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise web.HTTPRequestRangeNotSatisfiable(headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+class LinkServer:
+    """
+    Optional delivery backend: a finished rip's files are served as ONE stored ZIP
+    (a packager part streamed from the session dir, nothing written) behind a signed,
+    expiring URL, instead of being split into attachment-sized parts.
+    - URLs are /d/<id>/<name>?e=<expiry>&s=<HMAC(secret, id|expiry|name)>
+    - GET/HEAD with single Range requests (resumable downloads, download managers)
+    - on expiry the link is dropped and on_expire() runs (e.g. hand the dir to the janitor)
+    Runs on the bot's event loop; file reads go to the default executor.
+    """
+    def __init__(self, host: str = LINK_HOST, port: int = LINK_PORT, base_url: str = LINK_BASE_URL,
+                 secret: str = LINK_SECRET):
+        self.host, self.port = host, port
+        self.base_url = (base_url or f"http://{host}:{port}").rstrip("/")
+        self._key = (secret or secrets.token_hex(32)).encode("utf-8")   # random = links die with the process
+        self._links: Dict[str, _Published] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.port)
+
+    # ---------- signing ----------
+    def _sign(self, link_id: str, expires: int, name: str) -> str:
+        mac = hmac.new(self._key, f"{link_id}|{expires}|{name}".encode("utf-8"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(mac[:24]).decode("ascii")
+
+    def publish(self, part: Dict[str, Any], name: Optional[str] = None, ttl_sec: float = LINK_TTL_HOURS * 3600,
+                on_expire: Optional[Callable[[], None]] = None) -> str:
+        """Serve a part until ttl_sec from now; returns its signed URL."""
+        link_id = secrets.token_urlsafe(12)
+        name = name or part["name"]
+        expires = int(time.time() + ttl_sec)
+        self._links[link_id] = _Published(part, name, expires, on_expire)
+        return f"{self.base_url}/d/{link_id}/{quote(name)}?e={expires}&s={self._sign(link_id, expires, name)}"
+
+    def _expire(self, link_id: str) -> None:
+        pub = self._links.pop(link_id, None)
+        if pub and pub.on_expire:
+            try: pub.on_expire()
+            except Exception: pass
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(SWEEP_SEC)
+            now = time.time()
+            for link_id in [k for k, p in self._links.items() if p.expires <= now]:
+                self._expire(link_id)
+
+    # ---------- HTTP ----------
+    def _lookup(self, request: web.Request) -> _Published:
+        link_id, name = request.match_info["id"], request.match_info["name"]
+        try:
+            expires = int(request.query.get("e", ""))
+        except ValueError:
+            raise web.HTTPForbidden()
+        if not hmac.compare_digest(request.query.get("s", ""), self._sign(link_id, expires, name)):
+            raise web.HTTPForbidden()
+        pub = self._links.get(link_id)
+        if expires <= time.time() or not pub or pub.name != name:
+            raise web.HTTPGone(text="This download link has expired.")
+        return pub
+
+    async def _serve(self, request: web.Request) -> web.StreamResponse:
+        pub = self._lookup(request)
+        size = pub.part["size"]
+        rng = _parse_range(request.headers.get("Range"), size)
+        start, end = rng or (0, size - 1)
+        resp = web.StreamResponse(status=206 if rng else 200, headers={
+            "Content-Type": "application/zip",
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(pub.name)}",
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "private, no-store",
+        })
+        if rng: resp.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        resp.content_length = end - start + 1
+        await resp.prepare(request)
+        if request.method == "HEAD": return resp
+        loop = asyncio.get_running_loop()
+        stream = open_part(pub.part)
+        try:
+            stream.seek(start)
+            left = end - start + 1
+            while left > 0:
+                chunk = await loop.run_in_executor(None, stream.read, min(CHUNK, left))
+                if not chunk: break
+                await resp.write(chunk)
+                left -= len(chunk)
+        finally:
+            stream.close()
+        await resp.write_eof()
+        return resp
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/d/{id}/{name}", self._serve)   # also answers HEAD
+        return app
+
+    async def start(self) -> Optional[str]:
+        """Start listening (idempotent; LINK_PORT 0 = disabled). Returns the base URL."""
+        if not self.enabled: return None
+        if self._runner: return self.base_url
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._sweeper = asyncio.create_task(self._sweep())
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._sweeper: self._sweeper.cancel()
+        if self._runner: await self._runner.cleanup()
+        self._runner = self._sweeper = None
+        for link_id in list(self._links):
+            self._expire(link_id)
+
+    def stats(self) -> dict:
+        return {"links": len(self._links), "bytes": sum(p.part["size"] for p in self._links.values())}
+
+_server: Optional[LinkServer] = None
+
+def get_link_server() -> LinkServer:
+    global _server
+    if _server is None:
+        _server = LinkServer()
+    return _server
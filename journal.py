@@ -0,0 +1,90 @@
+# journal.py
+import os, json, time, tempfile, threading
+from typing import Any, Dict, List
+from config import JOURNAL_DIR
+
+class JobJournal:
+    """
+    Crash-safe record of one running /rip, as a small JSON file per job under
+    JOURNAL_DIR (atomic rewrites): where to deliver (channel, user), the rip's
+    options, its session dir, the tracks finished so far (entry key -> filename)
+    and the parts already uploaded.
+    The file is removed when the job ends (delivered, failed or rejected); one
+    still present at startup belongs to a rip the process died in the middle of
+    and is resumed (see discord_adapter.resume_jobs). Thread-safe.
+    """
+    def __init__(self, path: str, data: Dict[str, Any]):
+        self.path = path
+        self.data = data
+        self._lock = threading.Lock()
+        self._closed = False   # late progress from a stopped rip mustn't bring the file back
+
+    @staticmethod
+    def path_for(job_id: Any) -> str:
+        return os.path.join(JOURNAL_DIR, f"{job_id}.json")
+
+    @classmethod
+    def start(cls, job_id: Any, **fields) -> "JobJournal":
+        data = {"job": str(job_id), "created": time.time(), **fields, "tracks": {}, "sent_parts": 0, "sent_files": []}
+        j = cls(cls.path_for(job_id), data)
+        j._write()
+        return j
+
+    @classmethod
+    def pending(cls) -> List["JobJournal"]:
+        """Journals left behind by a previous process, oldest first."""
+        out = []
+        try:
+            names = sorted(n for n in os.listdir(JOURNAL_DIR) if n.endswith(".json"))
+        except OSError:
+            return out
+        for name in names:
+            path = os.path.join(JOURNAL_DIR, name)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    out.append(cls(path, json.load(f)))
+            except (OSError, ValueError):
+                try: os.remove(path)   # unreadable: nothing to resume
+                except OSError: pass
+        return sorted(out, key=lambda j: j.data.get("created", 0))
+
+    def _write(self) -> None:
+        if self._closed: return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".journal_", dir=os.path.dirname(self.path))
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def update(self, **fields) -> None:
+        with self._lock:
+            self.data.update(fields)
+            self._write()
+
+    # ---------- progress (rip threads / uploader) ----------
+    def track(self, rec: dict) -> None:
+        """A track is finished in the session dir (a tracks.TrackManifest record)."""
+        with self._lock:
+            self.data["tracks"][rec["key"]] = os.path.basename(rec["path"])
+            try: self._write()
+            except OSError: pass
+
+    def sent(self, parts: List[dict]) -> None:
+        """These parts reached the channel: resumed rips don't upload their tracks again."""
+        with self._lock:
+            self.data["sent_parts"] += len(parts)
+            self.data["sent_files"] += [os.path.basename(fp) for p in parts for fp in p["files"]]
+            try: self._write()
+            except OSError: pass
+
+    def resume_state(self) -> Dict[str, Any]:
+        """What rip_to_zips(resume=...) needs to pick up where this job stopped."""
+        with self._lock:
+            return {"tracks": dict(self.data["tracks"]), "sent_files": list(self.data["sent_files"]),
+                    "sent_parts": self.data["sent_parts"]}
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            try: os.remove(self.path)
+            except OSError: pass
@@ -0,0 +1,84 @@
+# manifest.py
+import os, json, time, hashlib, tempfile, threading
+from typing import Any, Dict, Iterable, Optional
+from config import MANIFEST_DIR
+
+class NothingNew(RuntimeError):
+    """An "only new" re-rip found no entries that weren't delivered already."""
+
+_lock = threading.Lock()   # load-merge-save of one manifest at a time
+
+def entry_id(entry: Optional[dict]) -> Optional[str]:
+    """
+    Stable identity of a playlist entry across rips: '<extractor>:<id>', or 'url:<url>'
+    for flat entries that carry no id (e.g. feed enclosures).
+    """
+    if not entry: return None
+    vid = entry.get("id")
+    ie = entry.get("extractor_key") or entry.get("ie_key") or entry.get("extractor")
+    if vid and ie: return f"{str(ie).lower()}:{vid}"
+    url = entry.get("webpage_url") or entry.get("url")
+    return f"url:{url.split('#', 1)[0]}" if url else None
+
+def is_playlist(info: Optional[dict]) -> bool:
+    return bool(info and isinstance(info.get("entries"), list))
+
+class PlaylistManifest:
+    """
+    Which entries of one playlist were already delivered to one scope (a guild, or a
+    user in DMs). Stored as JSON under MANIFEST_DIR; the metadata.json in each ZIP
+    carries the same entry ids.
+    """
+    def __init__(self, path: str, data: Dict[str, Any]):
+        self.path = path
+        self.data = data
+
+    @staticmethod
+    def key(scope: str, info: dict) -> str:
+        ie = info.get("extractor_key") or info.get("ie_key") or info.get("extractor") or ""
+        pid = info.get("id") or info.get("webpage_url") or info.get("original_url") or ""
+        return hashlib.sha256(f"{scope}|{str(ie).lower()}:{pid}".encode("utf-8")).hexdigest()
+
+    @classmethod
+    def load(cls, scope: str, info: dict) -> "PlaylistManifest":
+        path = os.path.join(MANIFEST_DIR, cls.key(scope, info) + ".json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {"scope": scope, "playlist": info.get("id"), "entries": {}}
+        return cls(path, data)
+
+    @property
+    def delivered(self) -> Dict[str, Any]:
+        return self.data.setdefault("entries", {})
+
+    @property
+    def last_rip(self) -> Optional[float]:
+        return self.data.get("updated")
+
+    def new_entries(self, info: dict) -> dict:
+        """Copy of info keeping only entries not delivered yet (unidentifiable entries are kept)."""
+        seen = self.delivered
+        entries = [e for e in (info.get("entries") or []) if e]
+        return {**info, "entries": [e for e in entries if entry_id(e) not in seen]}
+
+    def record(self, info: dict, ids: Iterable[str]) -> None:
+        """Merge newly delivered entry ids into the on-disk manifest (atomic write)."""
+        now = time.time()
+        titles = {entry_id(e): (e.get("title") or "") for e in (info.get("entries") or []) if e}
+        with _lock:
+            # another rip of this playlist may have recorded since we loaded
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, ValueError):
+                pass
+            for i in ids:
+                if i: self.delivered.setdefault(i, {"title": titles.get(i, ""), "delivered": now})
+            self.data.update(title=info.get("title") or self.data.get("title"), updated=now)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=".manifest_", dir=os.path.dirname(self.path))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
@@ -0,0 +1,208 @@
+# metrics.py
+import os, json, time, threading, contextvars
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import METRICS_LOG, METRICS_HOST, METRICS_PORT
+
+# seconds; rips range from a single track to 300-entry playlists
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+# -------------------- PER JOB --------------------
+class JobMetrics:
+    """
+    One /rip's instrumentation: stage spans (seconds, accumulated per stage),
+    counters (bytes etc.), retries by kind and memory high-water marks.
+    Thread-safe; finish() it via the registry.
+    """
+    def __init__(self, job_id: Any, **labels):
+        self.job_id = job_id
+        self.labels = labels
+        self.outcome: Optional[str] = None
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.retries: Dict[str, int] = {}
+        self.memory: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage: str):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(stage, time.perf_counter() - t)
+
+    def add_span(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def retry(self, kind: str, n: int = 1) -> None:
+        if n <= 0: return
+        with self._lock:
+            self.retries[kind] = self.retries.get(kind, 0) + n
+
+    def peak(self, name: str, value: int) -> None:
+        with self._lock:
+            self.memory[name] = max(self.memory.get(name, 0), value)
+
+    def absorb(self, res: Dict[str, Any]) -> None:
+        """Fold rip_to_zips' timings/counters/memory in (timings as rip.<stage> spans)."""
+        for stage, sec in (res.get("timings") or {}).items():
+            self.add_span(f"rip.{stage}", sec)
+        for name, n in (res.get("counters") or {}).items():
+            if name in RIP_RETRY_COUNTERS: self.retry(name, n)
+            else: self.count(name, n)
+        for name, n in (res.get("memory") or {}).items():
+            self.peak(name, n)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "job": str(self.job_id), "outcome": self.outcome, **self.labels,
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "total_s": round(time.perf_counter() - self._t0, 4),
+                "spans_s": {k: round(v, 4) for k, v in self.spans.items()},
+                "counters": dict(self.counters), "retries": dict(self.retries), "memory": dict(self.memory),
+            }
+
+# rip_to_zips counters that are retries rather than volumes
+RIP_RETRY_COUNTERS = {"fallback_pass", "transcode_fallbacks", "entry_retries"}
+
+_current: contextvars.ContextVar[Optional[JobMetrics]] = contextvars.ContextVar("rip_job_metrics", default=None)
+
+def current_job() -> Optional[JobMetrics]:
+    """The job being handled by this task (inherited by tasks it creates), if any."""
+    return _current.get()
+
+def set_current_job(job: Optional[JobMetrics]) -> contextvars.Token:
+    return _current.set(job)
+
+def reset_current_job(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+# -------------------- AGGREGATES --------------------
+class _Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.series: Dict[Tuple, list] = {}   # labels -> [bucket counts..., sum, count]
+
+    def observe(self, labels: Tuple, value: float) -> None:
+        s = self.series.setdefault(labels, [0] * len(self.buckets) + [0.0, 0])
+        for i, b in enumerate(self.buckets):
+            if value <= b: s[i] += 1
+        s[-2] += value
+        s[-1] += 1
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple) -> str:
+    esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    parts = [f'{n}="{esc(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class MetricsRegistry:
+    """
+    Process-wide sink: finished jobs are appended to a JSON-lines log and folded
+    into Prometheus series served as text on http://METRICS_HOST:METRICS_PORT/metrics.
+    """
+    def __init__(self, log_path: Optional[str] = METRICS_LOG):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._stage = _Histogram(STAGE_BUCKETS)       # (stage,)
+        self._jobs: Dict[Tuple, int] = {}             # (outcome,)
+        self._counters: Dict[Tuple, int] = {}         # (name,)
+        self._retries: Dict[Tuple, int] = {}          # (kind,)
+        self._memory: Dict[Tuple, int] = {}           # (name,) -> max over jobs
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], float]) -> None:
+        """Register a value read at scrape time (e.g. scheduler queue depth)."""
+        self._gauges[name] = (help_text, fn)
+
+    def finish(self, job: JobMetrics, outcome: Optional[str] = None) -> Dict[str, Any]:
+        if outcome: job.outcome = outcome
+        record = job.to_dict()
+        with self._lock:
+            out = (record["outcome"] or "unknown",)
+            self._jobs[out] = self._jobs.get(out, 0) + 1
+            self._stage.observe(("total",), record["total_s"])
+            for stage, sec in record["spans_s"].items():
+                self._stage.observe((stage,), sec)
+            for name, n in record["counters"].items():
+                self._counters[(name,)] = self._counters.get((name,), 0) + n
+            for kind, n in record["retries"].items():
+                self._retries[(kind,)] = self._retries.get((kind,), 0) + n
+            for name, n in record["memory"].items():
+                self._memory[(name,)] = max(self._memory.get((name,), 0), n)
+            if self.log_path:
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                except OSError:
+                    pass
+        return record
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines = []
+        with self._lock:
+            lines += ["# HELP ripperroo_jobs_total Finished rip jobs by outcome.",
+                      "# TYPE ripperroo_jobs_total counter"]
+            lines += [f"ripperroo_jobs_total{_fmt_labels(('outcome',), k)} {v}" for k, v in sorted(self._jobs.items())]
+            lines += ["# HELP ripperroo_stage_seconds Time spent per job in each stage.",
+                      "# TYPE ripperroo_stage_seconds histogram"]
+            for labels, s in sorted(self._stage.series.items()):
+                for le, n in [*zip(self._stage.buckets, s), ("+Inf", s[-1])]:
+                    lines.append("ripperroo_stage_seconds_bucket"
+                                 + _fmt_labels(("stage", "le"), (*labels, le)) + f" {n}")
+                lines.append(f"ripperroo_stage_seconds_sum{_fmt_labels(('stage',), labels)} {s[-2]:.6f}")
+                lines.append(f"ripperroo_stage_seconds_count{_fmt_labels(('stage',), labels)} {s[-1]}")
+            for name, help_text, series, label in (
+                ("ripperroo_job_counter_total", "Per-job volumes (bytes downloaded/uploaded, tracks, ...).", self._counters, "name"),
+                ("ripperroo_retries_total", "Retries and fallbacks by kind.", self._retries, "kind"),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{_fmt_labels((label,), k)} {v}" for k, v in sorted(series.items())]
+            lines += ["# HELP ripperroo_job_memory_max_bytes Highest per-job memory mark seen (process RSS during a rip).",
+                      "# TYPE ripperroo_job_memory_max_bytes gauge"]
+            lines += [f"ripperroo_job_memory_max_bytes{_fmt_labels(('name',), k)} {v}" for k, v in sorted(self._memory.items())]
+        for name, (help_text, fn) in sorted(self._gauges.items()):
+            try: value = float(fn())
+            except Exception: continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[int]:
+        """Start the /metrics endpoint on a daemon thread (idempotent; port 0 = disabled)."""
+        if self._server or not port: return self._server.server_address[1] if self._server else None
+        registry = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *a): pass
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404); return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+
+_registry: Optional[MetricsRegistry] = None
+
+def get_metrics() -> MetricsRegistry:
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry()
+    return _registry
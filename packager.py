@@ -1,52 +1,341 @@
 # packager.py
-import os, zipfile
-from typing import List
+import os, io, zipfile, threading, struct, bisect
+from typing import List, Callable, Optional, Dict, Any
+
+def _part_path(out_dir: str, base_name: str, idx: int) -> str:
+    return os.path.join(out_dir, f"{base_name}_part_{idx:02d}.zip")
+
+class TrackTooLarge(RuntimeError):
+    """A track can't fit a part on its own, whatever else goes in it."""
+
+def arcname(fp: str, names: Optional[Dict[str, str]] = None) -> str:
+    """Member name of fp inside a part: names[fp] (e.g. a track's display name), else its basename."""
+    return (names or {}).get(fp) or os.path.basename(fp)
+
+def _write_zip(zip_path: str, files: List[str], names: Optional[Dict[str, str]] = None) -> str:
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for fp in files:
+            zf.write(fp, arcname(fp, names))
+    return zip_path
+
+# -------------------- EXACT SIZE PLANNING --------------------
+# ZIP_STORED layout as zipfile writes it to a seekable file (no data descriptors):
+#   per member: local header 30 + name (+20 zip64 extra when size*1.05 > ZIP64_LIMIT) + data
+#               central entry 46 + name (+4 +8/field for size > ZIP64_LIMIT / offset > ZIP64_LIMIT)
+#   trailer:    end record 22 (+56 zip64 end record +20 locator when counts/offsets overflow)
+_LOCAL_HDR, _CENTRAL_HDR, _END_REC, _ZIP64_END = 30, 46, 22, 56 + 20
+
+class ZipSizer:
+    """Exact byte size of a stored ZIP, built up member by member in write order."""
+    def __init__(self):
+        self.data_end = 0     # offset where the central directory starts
+        self.cd_size = 0
+        self.count = 0
+
+    @staticmethod
+    def _entry(arcname: str, size: int, header_offset: int) -> tuple[int, int]:
+        n = len(arcname.encode("utf-8"))
+        local = _LOCAL_HDR + n + (20 if size * 1.05 > zipfile.ZIP64_LIMIT else 0)
+        extra = (16 if size > zipfile.ZIP64_LIMIT else 0) + (8 if header_offset > zipfile.ZIP64_LIMIT else 0)
+        return local + size, _CENTRAL_HDR + n + (extra + 4 if extra else 0)
+
+    @staticmethod
+    def _total(data_end: int, cd_size: int, count: int) -> int:
+        zip64 = (count > zipfile.ZIP_FILECOUNT_LIMIT or data_end > zipfile.ZIP64_LIMIT
+                 or cd_size > zipfile.ZIP64_LIMIT)
+        return data_end + cd_size + _END_REC + (_ZIP64_END if zip64 else 0)
+
+    @property
+    def total(self) -> int:
+        return self._total(self.data_end, self.cd_size, self.count)
+
+    def with_member(self, arcname: str, size: int) -> int:
+        """Archive size if (arcname, size) were appended next."""
+        local, central = self._entry(arcname, size, self.data_end)
+        return self._total(self.data_end + local, self.cd_size + central, self.count + 1)
+
+    def add(self, arcname: str, size: int) -> None:
+        local, central = self._entry(arcname, size, self.data_end)
+        self.data_end += local; self.cd_size += central; self.count += 1
+
+def zip_stored_size(files: List[str], names: Optional[Dict[str, str]] = None) -> int:
+    """Exact size of the stored ZIP that _write_zip(…, files, names) produces."""
+    sizer = ZipSizer()
+    for fp in files:
+        sizer.add(arcname(fp, names), os.path.getsize(fp))
+    return sizer.total
+
+def plan_zip_parts(files: List[str], part_limit_bytes: int,
+                   extra_first: list[str] | None = None,
+                   names: Optional[Dict[str, str]] = None) -> list[list[str]]:
+    """
+    Plan parts <= part_limit_bytes from exact ZIP sizes, packed first-fit
+    decreasing (docs pinned to Part 1). Members keep their input order inside
+    a part; a path listed twice is packed once. names maps paths to member
+    names (see arcname). Raises TrackTooLarge if a track can't fit a part on its own.
+    """
+    docs = set(extra_first or [])
+    files = list(dict.fromkeys(fp for fp in files if fp not in docs))
+    order = {fp: i for i, fp in enumerate(list(extra_first or []) + files)}
+    bins: list[tuple[ZipSizer, list[str]]] = []
+
+    def place(fp: str, first_fit: bool):
+        name, size = arcname(fp, names), os.path.getsize(fp)
+        for sizer, members in (bins if first_fit else bins[-1:]):
+            if sizer.with_member(name, size) <= part_limit_bytes:
+                sizer.add(name, size); members.append(fp)
+                return
+        sizer = ZipSizer()
+        if sizer.with_member(name, size) > part_limit_bytes:
+            raise TrackTooLarge(f"Track too large for part limit: {name}")
+        sizer.add(name, size); bins.append((sizer, [fp]))
+
+    for doc in extra_first or []:
+        place(doc, first_fit=False)
+    for fp in sorted(files, key=os.path.getsize, reverse=True):
+        place(fp, first_fit=True)
+
+    plan = []
+    for sizer, members in bins:
+        ordered = sorted(members, key=order.__getitem__)
+        # re-ordering only moves header offsets; re-check in case that crosses zip64
+        plan.append(ordered if zip_stored_size(ordered, names) <= part_limit_bytes else members)
+    return plan
 
 def build_zip_parts(
     files: List[str],
     out_dir: str,
     base_name: str,
     part_limit_bytes: int,
-    extra_first: list[str] | None = None
+    extra_first: list[str] | None = None,
+    names: Optional[Dict[str, str]] = None,
 ) -> list[str]:
     """
-    Create ZIP parts <= part_limit_bytes (stored, no compression).
-    Returns list of zip paths. Docs in Part 1 if provided.
-    """
-    extra_first = extra_first or []
-    parts: list[str] = []
-    bundle: list[str] = []
-    total_in_bundle = 0
-
-    def flush_bundle(idx: int):
-        if not bundle:
-            return None
-        zip_path = os.path.join(out_dir, f"{base_name}_part_{idx:02d}.zip")
-        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED) as zf:
-            for fp in bundle:
-                zf.write(fp, os.path.basename(fp))
-        return zip_path
-
-    idx = 1
-    # docs in part 1
-    for doc in extra_first:
-        size = os.path.getsize(doc)
-        if total_in_bundle and (total_in_bundle + size) > part_limit_bytes:
-            zp = flush_bundle(idx)
-            if zp: parts.append(zp); idx += 1
-            bundle, total_in_bundle = [], 0
-        bundle.append(doc); total_in_bundle += size
+    Create ZIP parts <= part_limit_bytes (stored, no compression), each written once
+    from an exact size plan. Returns list of zip paths ([] if a track can never fit).
+    Docs in Part 1 if provided.
+    """
+    try:
+        plan = plan_zip_parts(files, part_limit_bytes, extra_first, names)
+    except TrackTooLarge:
+        return []
+    return [_write_zip(_part_path(out_dir, base_name, i), members, names)
+            for i, members in enumerate(plan, start=1)]
 
-    for fp in files:
-        size = os.path.getsize(fp)
-        if size > part_limit_bytes and len(files) == 1:
-            return []  # single file exceeds limit
-        if total_in_bundle and (total_in_bundle + size) > part_limit_bytes:
-            zp = flush_bundle(idx)
-            if zp: parts.append(zp); idx += 1
-            bundle, total_in_bundle = [], 0
-        bundle.append(fp); total_in_bundle += size
-
-    zp = flush_bundle(idx)
-    if zp: parts.append(zp)
-    return parts
+# -------------------- STREAMED PARTS --------------------
+# A part is a plain dict: {"name": zip filename, "files": [...], "names": [member names], "size": exact bytes,
+# "crcs": [...]}.
+# Nothing is written to disk; StoredZipStream assembles the archive while it's read.
+
+def file_crc32(path: str, chunk: int = 1024 * 1024) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        while buf := f.read(chunk):
+            crc = zipfile.crc32(buf, crc)
+    return crc
+
+def make_part(files: List[str], base_name: str, idx: int,
+              names: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    return {
+        "name": f"{base_name}_part_{idx:02d}.zip",
+        "files": list(files),
+        "names": [arcname(fp, names) for fp in files],
+        "size": zip_stored_size(files, names),
+        "crcs": [file_crc32(fp) for fp in files],
+    }
+
+def plan_parts(files: List[str], base_name: str, part_limit_bytes: int,
+               extra_first: list[str] | None = None,
+               names: Optional[Dict[str, str]] = None) -> list[Dict[str, Any]]:
+    """plan_zip_parts, as part dicts ready for StoredZipStream."""
+    return [make_part(members, base_name, i, names)
+            for i, members in enumerate(plan_zip_parts(files, part_limit_bytes, extra_first, names), start=1)]
+
+def _central_entry(zi: zipfile.ZipInfo) -> bytes:
+    """Central directory record, byte-identical to ZipFile._write_end_record."""
+    dt = zi.date_time
+    dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+    dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+    extra, file_size, header_offset = [], zi.file_size, zi.header_offset
+    if zi.file_size > zipfile.ZIP64_LIMIT:
+        extra += [zi.file_size, zi.file_size]
+        file_size = 0xFFFFFFFF
+    if zi.header_offset > zipfile.ZIP64_LIMIT:
+        extra.append(zi.header_offset)
+        header_offset = 0xFFFFFFFF
+    extra_data, min_version = b"", 0
+    if extra:
+        extra_data = struct.pack("<HH" + "Q" * len(extra), 1, 8 * len(extra), *extra)
+        min_version = zipfile.ZIP64_VERSION
+    filename, flag_bits = zi._encodeFilenameFlags()
+    return struct.pack(zipfile.structCentralDir, zipfile.stringCentralDir,
+                       max(min_version, zi.create_version), zi.create_system,
+                       max(min_version, zi.extract_version), zi.reserved,
+                       flag_bits, zi.compress_type, dostime, dosdate,
+                       zi.CRC, file_size, file_size,
+                       len(filename), len(extra_data), 0,
+                       0, zi.internal_attr, zi.external_attr, header_offset) + filename + extra_data
+
+def _end_records(count: int, cd_offset: int, cd_size: int) -> bytes:
+    out = b""
+    if count > zipfile.ZIP_FILECOUNT_LIMIT or cd_offset > zipfile.ZIP64_LIMIT or cd_size > zipfile.ZIP64_LIMIT:
+        out += struct.pack(zipfile.structEndArchive64, zipfile.stringEndArchive64,
+                           44, 45, 45, 0, 0, count, count, cd_size, cd_offset)
+        out += struct.pack(zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator,
+                           0, cd_offset + cd_size, 1)
+        count, cd_size, cd_offset = min(count, 0xFFFF), min(cd_size, 0xFFFFFFFF), min(cd_offset, 0xFFFFFFFF)
+    return out + struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive,
+                             0, 0, count, count, cd_size, cd_offset, 0)
+
+class StoredZipStream(io.RawIOBase):
+    """
+    Read-only, seekable file object producing the same bytes _write_zip(files, names)
+    would, assembled on the fly from the source files (no temporary ZIP on disk).
+    Pass the part's precomputed crcs to avoid an extra read pass; arcnames are the
+    member names, in files order (basenames by default).
+    """
+    def __init__(self, files: List[str], crcs: Optional[List[int]] = None, name: Optional[str] = None,
+                 arcnames: Optional[List[str]] = None):
+        super().__init__()
+        self.name = name
+        crcs = crcs if crcs is not None else [file_crc32(fp) for fp in files]
+        arcnames = arcnames or [os.path.basename(fp) for fp in files]
+        self._starts: list[int] = []
+        self._chunks: list[bytes | str] = []   # header bytes, or a source path for file data
+        infos, pos = [], 0
+        for fp, crc, arc in zip(files, crcs, arcnames):
+            zi = zipfile.ZipInfo.from_file(fp, arc)
+            zi.compress_type, zi.compress_size, zi.CRC = zipfile.ZIP_STORED, zi.file_size, crc
+            zi.flag_bits, zi.header_offset = 0, pos
+            if not zi.external_attr:
+                zi.external_attr = 0o600 << 16
+            hdr = zi.FileHeader(zi.file_size * 1.05 > zipfile.ZIP64_LIMIT)
+            pos = self._append(pos, hdr, len(hdr))
+            pos = self._append(pos, fp, zi.file_size)
+            infos.append(zi)
+        cd = b"".join(_central_entry(zi) for zi in infos)
+        tail = cd + _end_records(len(infos), pos, len(cd))
+        self.size = self._append(pos, tail, len(tail))
+        self._pos = 0
+        self._src: Optional[tuple[str, io.BufferedReader]] = None
+
+    def _append(self, pos: int, chunk: bytes | str, length: int) -> int:
+        if length:
+            self._starts.append(pos); self._chunks.append(chunk)
+        return pos + length
+
+    def readable(self) -> bool: return True
+    def seekable(self) -> bool: return True
+    def tell(self) -> int: return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self.size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def _source(self, path: str) -> io.BufferedReader:
+        if not self._src or self._src[0] != path:
+            if self._src: self._src[1].close()
+            self._src = (path, open(path, "rb"))
+        return self._src[1]
+
+    def readinto(self, b) -> int:
+        if self._pos >= self.size: return 0
+        i = bisect.bisect_right(self._starts, self._pos) - 1
+        start, chunk = self._starts[i], self._chunks[i]
+        end = self._starts[i + 1] if i + 1 < len(self._starts) else self.size
+        n = min(len(b), end - self._pos)
+        if isinstance(chunk, bytes):
+            data = chunk[self._pos - start:self._pos - start + n]
+        else:
+            f = self._source(chunk)
+            f.seek(self._pos - start)
+            data = f.read(n)
+            if len(data) != n:
+                raise IOError(f"{os.path.basename(chunk)} changed while streaming")
+        b[:n] = data
+        self._pos += n
+        return n
+
+    def close(self) -> None:
+        if self._src:
+            self._src[1].close(); self._src = None
+        super().close()
+
+def open_part(part: Dict[str, Any]) -> StoredZipStream:
+    return StoredZipStream(part["files"], part.get("crcs"), name=part["name"], arcnames=part.get("names"))
+
+class PartStreamer:
+    """
+    Incremental plan_parts for the pipelined rip: tracks are add()ed as they
+    finish and packed by their exact ZIP sizes into one of two open parts (the
+    fullest one they fit); when a track fits neither, the fuller part is sealed
+    and handed to on_part(part). Unlike plan_zip_parts' first-fit-decreasing this
+    only sees tracks in completion order, so parts can come out less full than the
+    exact planner's; the second open part keeps one big track from sealing a part
+    that still has room (plain next-fit), at the cost of holding back one part.
+    Sources stay on disk; the part is streamed from them at upload time.
+    Thread-safe: add() is called from download workers.
+    """
+    OPEN_PARTS = 2
+
+    def __init__(self, base_name: str, part_limit_bytes: int,
+                 on_part: Optional[Callable[[Dict[str, Any]], None]] = None, first_index: int = 1):
+        self.base_name = base_name
+        self.first_index = first_index   # > 1 when earlier parts went out before a restart
+        self.part_limit = part_limit_bytes
+        self.on_part = on_part
+        self.parts: list[Dict[str, Any]] = []
+        self.oversized: list[str] = []  # tracks that can never fit a part (skipped)
+        self._seen: set[str] = set()
+        self._open: list[tuple[list[str], ZipSizer]] = []   # parts still taking tracks: (files, sizer)
+        self._names: Dict[str, str] = {}   # path -> member name, for tracks not named by their basename
+        self._lock = threading.Lock()
+
+    def _fits_alone(self, name: str, size: int) -> bool:
+        return ZipSizer().with_member(name, size) <= self.part_limit
+
+    def _seal(self, bundle: tuple[list[str], ZipSizer]) -> None:
+        self._open.remove(bundle)
+        part = make_part(bundle[0], self.base_name, self.first_index + len(self.parts), self._names)
+        self.parts.append(part)
+        if self.on_part:
+            self.on_part(part)
+
+    def _push(self, fp: str, size: int) -> tuple[list[str], ZipSizer]:
+        name = arcname(fp, self._names)
+        fits = [b for b in self._open if b[1].with_member(name, size) <= self.part_limit]
+        if fits:
+            bundle = max(fits, key=lambda b: b[1].total)
+        else:
+            if len(self._open) >= self.OPEN_PARTS:
+                self._seal(max(self._open, key=lambda b: b[1].total))
+            bundle = ([], ZipSizer())
+            self._open.append(bundle)
+        bundle[0].append(fp); bundle[1].add(name, size)
+        return bundle
+
+    def add(self, fp: str, size: Optional[int] = None, name: Optional[str] = None) -> bool:
+        """
+        Queue a finished track, stored as name (default: its basename). Returns False
+        if that file was already added (it is packed once); raises TrackTooLarge if it
+        can never fit a part (it's listed in oversized and skipped).
+        """
+        size = os.path.getsize(fp) if size is None else size
+        with self._lock:
+            if fp in self._seen: return False
+            self._seen.add(fp)
+            if name: self._names[fp] = name
+            if not self._fits_alone(arcname(fp, self._names), size):
+                self.oversized.append(fp)
+                raise TrackTooLarge(f"Track too large for part limit: {arcname(fp, self._names)}")
+            self._push(fp, size)
+            return True
+
+    def close(self, extra_last: list[str] | None = None) -> list[Dict[str, Any]]:
+        """Seal the open part (docs ride along in the last part) and return all parts."""
+        with self._lock:
+            last = [self._push(doc, os.path.getsize(doc)) for doc in extra_last or [] if os.path.isfile(doc)]
+            for bundle in sorted(self._open, key=lambda b: any(b is d for d in last)):
+                self._seal(bundle)
+            return list(self.parts)
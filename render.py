@@ -0,0 +1,169 @@
+# render.py
+import asyncio, time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Hashable
+import discord
+from constants import RENDER_CHANNEL_BUDGET, RENDER_WEBHOOK_BUDGET, RENDER_MIN_INTERVAL
+
+# -------------------- ROUTE BUDGETS --------------------
+class _Budget:
+    """Token bucket for one Discord route (a channel, or an interaction webhook)."""
+    def __init__(self, edits: int, per_sec: float):
+        self.capacity = float(edits)
+        self.rate = edits / per_sec
+        self.tokens = float(edits)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.holds = 0   # higher-priority traffic (uploads) in flight
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready_in(self, now: float) -> Optional[float]:
+        """Seconds until an edit may go out (0 = now), or None while held."""
+        if self.holds: return None
+        self._refill(now)
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 1: wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def spend(self) -> None:
+        self.tokens -= 1
+
+    def observe(self, headers: Any) -> None:
+        """Adopt the route's real budget from X-RateLimit-* / Retry-After headers."""
+        if not headers: return
+        now = time.monotonic()
+        try:
+            limit = headers.get("X-RateLimit-Limit")
+            reset_after = headers.get("X-RateLimit-Reset-After")
+            remaining = headers.get("X-RateLimit-Remaining")
+            retry_after = headers.get("Retry-After")
+            if limit and reset_after and float(reset_after) > 0:
+                self.capacity = max(1.0, float(limit))
+                self.rate = self.capacity / max(float(reset_after), 0.5)
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + float(retry_after))
+        except (TypeError, ValueError):
+            pass
+
+# -------------------- VIEWS --------------------
+class _View:
+    __slots__ = ("msg", "route", "text", "sent", "last_at", "inflight")
+    def __init__(self, msg, route: str):
+        self.msg, self.route = msg, route
+        self.text: Optional[str] = None
+        self.sent: Optional[str] = None
+        self.last_at = 0.0
+        self.inflight: Optional[asyncio.Task] = None
+
+class RenderScheduler:
+    """
+    Owns every progress-UI edit (ephemeral bars, public tickers, queue positions).
+    Callers set() the latest rendered text per job view; one loop task sends an edit
+    only when the text changed, at most every RENDER_MIN_INTERVAL per view and
+    within each route's budget (per channel / per interaction webhook; updated from
+    rate-limit headers on errors). Intermediate states are coalesced away.
+    Routes under hold() (uploads in flight) get no edits until the hold ends.
+    Loop-thread only.
+    """
+    def __init__(self):
+        self._views: Dict[Hashable, _View] = {}
+        self._budgets: Dict[str, _Budget] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def _budget(self, route: str) -> _Budget:
+        b = self._budgets.get(route)
+        if b is None:
+            edits, per = RENDER_WEBHOOK_BUDGET if route.startswith("wh:") else RENDER_CHANNEL_BUDGET
+            b = self._budgets[route] = _Budget(edits, per)
+        return b
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    # ---------- public ----------
+    def set(self, key: Hashable, msg, text: str, route: str) -> None:
+        """Desired content for a job's view; cheap to call on every progress tick."""
+        v = self._views.get(key)
+        if v is None or v.msg is not msg:
+            v = self._views[key] = _View(msg, route)
+        v.text = text
+        if v.text != v.sent:
+            self._ensure_running()
+            self._wake.set()
+
+    async def drop(self, key: Hashable) -> None:
+        """Forget a view and wait out its in-flight edit; call before a final direct edit/delete."""
+        v = self._views.pop(key, None)
+        if v and v.inflight:
+            try: await asyncio.shield(v.inflight)
+            except Exception: pass
+
+    @contextmanager
+    def hold(self, route: str):
+        """Pause edits on route while higher-priority traffic (e.g. ZIP uploads) is sent."""
+        b = self._budget(route)
+        b.holds += 1
+        try:
+            yield
+        finally:
+            b.holds -= 1
+            self._wake.set()
+
+    # ---------- loop ----------
+    async def _edit(self, key: Hashable, v: _View, text: str) -> None:
+        b = self._budget(v.route)
+        try:
+            await v.msg.edit(content=text)
+            v.sent = text
+        except discord.HTTPException as e:
+            b.observe(getattr(getattr(e, "response", None), "headers", None))
+            if getattr(e, "status", None) == 404:
+                self._views.pop(key, None)   # message is gone
+        except Exception:
+            pass
+        finally:
+            v.inflight = None
+            v.last_at = time.monotonic()
+            self._wake.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            sleep_for: Optional[float] = None
+            # least recently edited first, so views sharing a route take turns
+            for key, v in sorted(self._views.items(), key=lambda kv: kv[1].last_at):
+                if v.inflight or v.text is None or v.text == v.sent:
+                    continue
+                b = self._budget(v.route)
+                wait = b.ready_in(now)
+                if wait is None: continue
+                wait = max(wait, v.last_at + RENDER_MIN_INTERVAL - now)
+                if wait <= 0:
+                    b.spend()
+                    v.inflight = loop.create_task(self._edit(key, v, v.text))
+                else:
+                    sleep_for = wait if sleep_for is None else min(sleep_for, wait)
+            if not self._views:
+                self._task = None
+                return
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=sleep_for)
+            except asyncio.TimeoutError:
+                pass
+
+_render: Optional[RenderScheduler] = None
+
+def get_render() -> RenderScheduler:
+    global _render
+    if _render is None:
+        _render = RenderScheduler()
+    return _render
@@ -1,63 +1,84 @@
 # rip_core.py
-import os, tempfile, time, json
+import os, tempfile, time, json, threading
 from typing import Dict, Any, List, Optional, Callable
 from constants import (
-    TARGET_ABR_KBPS, DEFAULT_ZIP_PART_MB, YTDLP_FORMAT_FALLBACK,
+    TARGET_ABR_KBPS, DEFAULT_ZIP_PART_MB, YTDLP_FORMAT_FALLBACK, DEFAULT_OUTPUT_FORMAT,
+    ENTRY_RETRY_ATTEMPTS, ENTRY_RETRY_BACKOFF_SEC, ENTRY_RETRY_MAX_PER_JOB,
 )
-from ytdlp_wrapper import extract_info, download_all
-from packager import build_zip_parts
+from ytdlp_wrapper import extract_info, download_all, download_entries, finished_track, entry_url
+from packager import plan_parts, PartStreamer, TrackTooLarge
+from track_cache import TrackCache, get_track_cache
+from art import fetch_cover, embed_cover
+from transcoder import TranscodeStage
+from tracks import TrackInfo, TrackTable, TrackManifest
+from utils import rss_bytes
 
 def _hmmss(sec: int | float | None) -> str:
     if not sec: return "--:--"
     sec = int(sec); m, s = divmod(sec, 60); return f"{m:02d}:{s:02d}"
 
-def _normalize_entries(info: Optional[dict]) -> list[dict]:
+def _take_entries(info: Optional[dict]) -> list[Optional[dict]]:
+    """
+    The probe's raw entries (aligned with TrackTable.from_info(info).rows), detached from
+    info; None where the probe couldn't resolve an entry.
+    """
     if not info: return []
     entries = info.get("entries")
     if isinstance(entries, list) and entries:
-        return [e or {} for e in entries if e is not None]
+        del info["entries"]
+        return list(entries)
     return [info]
 
-def _derive_zip_basename(info: Optional[dict]) -> str:
+def _relist_lost(url: str, out_dir: str, include_art: bool, raw: list, rows: List[TrackInfo]) -> Dict[int, dict]:
+    """
+    Entries the probe returned as None (unavailable, private, a host error...): find them
+    in a flat listing of url, which only reads the playlist page. Fills in their rows
+    (id, title) and returns {position: flat entry} for the ones that have a URL to retry.
+    """
+    lost = [i for i, e in enumerate(raw) if e is None]
+    if not lost or not url: return {}
+    listing = extract_info(url, out_dir, include_art, flat=True)
+    flat = (listing or {}).get("entries")
+    if not isinstance(flat, list) or len(flat) != len(raw): return {}   # can't line them up
+    found = {}
+    for i in lost:
+        if not flat[i]: continue
+        rows[i] = TrackInfo.from_info(flat[i]).filled(rows[i])
+        if entry_url(flat[i]): found[i] = flat[i]
+    return found
+
+def _derive_zip_basename(table: TrackTable) -> str:
     def safe(t: str) -> str:
         import re
         t = re.sub(r"[^A-Za-z0-9 \-_.]+", "_", t or "").strip()
         t = re.sub(r"\s+", " ", t)
         return (t[:80]).strip() or "rip"
-    if not info: return "rip"
-    entry = info
-    if isinstance(info.get("entries"), list) and info["entries"]:
-        entry = next((e for e in info["entries"] if e), {}) or {}
-    artist = entry.get("artist") or entry.get("uploader") or entry.get("channel") or info.get("uploader") or info.get("channel") or ""
-    album  = entry.get("album") or info.get("playlist_title") or info.get("playlist") or ""
-    title  = entry.get("track") or entry.get("title") or info.get("title") or ""
+    first = next((t for t in table.rows if t.id or t.title or t.artist), None) or TrackInfo()
+    artist = first.artist or table.uploader
+    album  = first.album or table.playlist
+    title  = first.title or table.title
     if artist and album: return safe(f"{artist} - {album}")
     if artist and title: return safe(f"{artist} - {title}")
     if title: return safe(title)
     return "rip"
 
-def _collect_audio_files(dirpath: str) -> List[str]:
-    exts = {".mp3", ".m4a", ".opus", ".webm", ".aac", ".flac", ".wav", ".ogg"}
-    out = []
-    for name in os.listdir(dirpath):
-        if os.path.splitext(name)[1].lower() in exts:
-            out.append(os.path.join(dirpath, name))
-    out.sort()
-    return out
-
-def _write_docs(session_dir: str, info: Optional[dict], audio_files: List[str]) -> List[str]:
-    entries = _normalize_entries(info)
+def _write_docs(session_dir: str, table: TrackTable, done: TrackManifest) -> List[str]:
+    rows = [(t, done.get(t)) for t in table.rows]
+    # tracks the probe didn't list (failed probe, playlist resolved by URL) follow in completion order
+    listed = {rec["key"] for _, rec in rows if rec}
+    rows += [(rec["track"], rec) for rec in done.records() if rec["key"] not in listed]
     tracks = []
-    for i, e in enumerate(entries, start=1):
-        title  = e.get("track") or e.get("title") or ""
-        artist = e.get("artist") or e.get("uploader") or e.get("channel") or ""
-        album  = e.get("album") or (info.get("playlist_title") if info else "") or (info.get("playlist") if info else "") or ""
-        idx    = e.get("playlist_index") or e.get("track_number") or i
-        dur    = e.get("duration")
-        filename = os.path.basename(audio_files[min(len(audio_files)-1, i-1)]) if audio_files else None
+    for i, (t, rec) in enumerate(rows, start=1):
+        if rec: t = rec["track"]   # the probed row, gaps filled from its download
+        dur = (rec and rec["duration"]) or t.duration
         tracks.append({
-            "index": idx, "title": title, "artist": artist, "album": album,
-            "duration": dur, "duration_hmmss": _hmmss(dur), "filename": filename,
+            "index": t.index or i,
+            "id": (rec and rec["id"]) or t.id,
+            "title": t.title,
+            "artist": t.artist,
+            "album": t.album or table.playlist,
+            "duration": dur, "duration_hmmss": _hmmss(dur),
+            "filename": rec["name"] if rec else None,   # as stored in the ZIP; None: skipped or failed
         })
 
     tl = os.path.join(session_dir, "TRACKLIST.txt")
@@ -71,9 +92,10 @@ def _write_docs(session_dir: str, info: Optional[dict], audio_files: List[str])
             line = f"{idx}. {artist} — {title}"
             if album: line += f"  ({album})"
             line += f"  [{dur}]"
+            if not t["filename"]: line += "  (unavailable)"
             f.write(line + "\n")
 
-    meta = {"zip_basename": _derive_zip_basename(info), "count": len(tracks), "tracks": tracks}
+    meta = {"zip_basename": _derive_zip_basename(table), "count": len(tracks), "tracks": tracks}
     meta_path = os.path.join(session_dir, "metadata.json")
     with open(meta_path, "w", encoding="utf-8") as f:
         json.dump(meta, f, ensure_ascii=False, indent=2)
@@ -82,6 +104,7 @@ def _write_docs(session_dir: str, info: Optional[dict], audio_files: List[str])
     with open(m3u, "w", encoding="utf-8") as f:
         f.write("#EXTM3U\n")
         for t in tracks:
+            if not t["filename"]: continue
             dur = int(t["duration"]) if t["duration"] else -1
             artist = t["artist"] or "Unknown Artist"
             title  = t["title"]  or (t["filename"] or "Unknown Title")
@@ -89,86 +112,261 @@ def _write_docs(session_dir: str, info: Optional[dict], audio_files: List[str])
             f.write(f"#EXTINF:{dur},{artist} - {title}\n{fn}\n")
     return [tl, meta_path, m3u]
 
-def _all_parts_under(parts: List[str], limit: int) -> bool:
-    return all(os.path.getsize(p) < limit for p in parts)
+def _cache_key(entry: Optional[dict], include_art: bool, output_format: str = DEFAULT_OUTPUT_FORMAT) -> Optional[str]:
+    return TrackCache.key_for(entry, TARGET_ABR_KBPS, include_art, output_format)
+
+def _link_cached(cache: Optional[TrackCache], keys: list[Optional[str]], session_dir: str) -> Dict[str, str]:
+    """Hard-link cache hits (by _cache_key) into session_dir; returns {cache key: linked file}."""
+    hits: Dict[str, str] = {}
+    if not cache: return hits
+    for key in keys:
+        fp = cache.link_into(key, session_dir) if key else None
+        if fp: hits[key] = fp
+    return hits
 
 def rip_to_zips(
     url: str,
     include_art: bool,
     zip_part_limit_bytes: int = DEFAULT_ZIP_PART_MB * 1024 * 1024,
     progress_cb: Optional[Callable[[dict], None]] = None,
+    part_cb: Optional[Callable[[dict], None]] = None,
+    info: Optional[dict] = None,
+    output_format: str = DEFAULT_OUTPUT_FORMAT,
+    work_dir: Optional[str] = None,
+    resume: Optional[Dict[str, Any]] = None,
+    track_cb: Optional[Callable[[dict], None]] = None,
 ) -> Dict[str, Any]:
     """
-    Downloads (playlist-safe) with yt-dlp (using ffmpeg postprocessor → MP3),
-    streams progress via progress_cb(dict), writes docs, and zips into parts.
-    Returns { 'zips': [...], 'count', 'duration_hmmss', 'bitrate', 'zip_base', 'work_dir' }.
+    Downloads raw audio (playlist-safe, entries in parallel) with yt-dlp while the shared
+    ffmpeg pool transcodes finished ones to MP3 (transcoder.TranscodeStage),
+    streams progress via progress_cb(dict), writes docs, and plans stored-ZIP parts.
+    Parts are dicts (see packager) streamed from the session files with packager.open_part;
+    no ZIP is written to disk, so work_dir must outlive the upload.
+    With part_cb, packaging is pipelined: each part is sealed and handed to part_cb(part)
+    while later tracks are still downloading (docs ride in the last part).
+    Pass an already-probed `info` (e.g. from the scheduler's cost estimate) to skip the probe;
+    it is consumed: the probe is reduced to a tracks.TrackTable up front and its raw entries
+    are detached from it and released as they download (read what you need from it first).
+    output_format: "mp3" (re-encode), "original" (stream copy) or "auto" (copy when the
+    source already meets the target; see transcoder.output_ext).
+    work_dir: session dir to use (e.g. reserved by workspace.Workspace); a temp dir otherwise.
+    track_cb(record) fires per finished track (a tracks.TrackManifest record), e.g. for journal.JobJournal;
+    resume (JobJournal.resume_state()) picks a rip up after a restart in the same work_dir: recorded
+    tracks are reused, tracks of parts already sent aren't packaged again and part numbering continues.
+    Playlist entries that fail on their own are retried (only those; entries the probe returned as
+    None are found again in a flat listing and go straight to the retries) with YTDLP_FORMAT_FALLBACK,
+    backing off between rounds, up to ENTRY_RETRY_ATTEMPTS tries each and ENTRY_RETRY_MAX_PER_JOB
+    retries in all; whatever still isn't delivered is listed in 'skipped'.
+    Returns { 'parts': [...], 'count', 'duration_hmmss', 'bitrate', 'format', 'copied', 'zip_base', 'work_dir', 'streamed', 'timings', 'counters', 'memory', 'entry_ids', 'skipped' }.
     """
-    session_dir = tempfile.mkdtemp(prefix="ripperroo_")
-
-    # Probe info for naming/tracklist (non-fatal)
-    info = extract_info(url, session_dir, include_art)
-
-    # PASS 1: strict chain + MP3 via ffmpeg postprocessor
-    download_all(
-        url, session_dir, include_art,
-        progress_hook=progress_cb,
-        format_str=None,
-        use_pp_mp3=True,
-        abr_kbps=TARGET_ABR_KBPS
-    )
-
-    files = _collect_audio_files(session_dir)
-
-    # PASS 2: looser format if nothing grabbed
-    if not files:
-        download_all(
-            url, session_dir, include_art,
-            progress_hook=progress_cb,
-            format_str=YTDLP_FORMAT_FALLBACK,
-            use_pp_mp3=True,
-            abr_kbps=TARGET_ABR_KBPS
-        )
-        files = _collect_audio_files(session_dir)
-
-    if not files:
+    session_dir = work_dir or tempfile.mkdtemp(prefix="ripperroo_")
+    timings: Dict[str, float] = {"art": 0.0}   # stage -> wall seconds (see bench.py, metrics.py)
+    counters: Dict[str, int] = {"bytes_downloaded": 0, "fallback_pass": 0, "entry_retries": 0}
+    tally = threading.Lock()
+    memory = {"rss_start_bytes": rss_bytes(), "rss_peak_bytes": 0}   # per-job peak, sampled per track
+    def sample_rss():
+        rss = rss_bytes()
+        with tally:
+            memory["rss_peak_bytes"] = max(memory["rss_peak_bytes"], rss)
+    sample_rss()
+    mark = time.perf_counter()
+
+    # Single extraction: this probe feeds naming/docs *and* the downloads (non-fatal)
+    if info is None:
+        info = extract_info(url, session_dir, include_art)
+    timings["probe"] = time.perf_counter() - mark
+    sample_rss()
+
+    # The probe becomes a compact table right away; everything downstream reads that. Raw
+    # entries (formats, thumbnails, headers...) live on only until their download starts/ends.
+    table = TrackTable.from_info(info)
+    rows = table.rows
+    raw = _take_entries(info)
+    lost = _relist_lost(url, session_dir, include_art, raw, rows) if table.is_playlist else {}
+    keys = [_cache_key(e, include_art, output_format) for e in raw]
+    single = info if info and not table.is_playlist and info.get("_type", "video") == "video" else None
+    info = None
+    base = _derive_zip_basename(table)
+
+    # Parts are sized exactly (packager.ZipSizer), so no safety margin / shrink passes
+    resume = resume or {}
+    sent = set(resume.get("sent_files") or [])
+    streamer = PartStreamer(base, zip_part_limit_bytes, part_cb, (resume.get("sent_parts") or 0) + 1) if part_cb else None
+
+    # Finished tracks, as they land (hooks + cache hits): docs, packaging and the result read this
+    done = TrackManifest()
+    too_big: set = set()   # keys of tracks no part can hold
+    def accept(entry: Optional[TrackInfo], fp: str, resolved: Optional[dict] = None, resumed: bool = False) -> None:
+        rec = done.add(entry, fp, info=resolved)
+        if not rec: return
+        if os.path.basename(fp) in sent: return   # delivered before a restart
+        try:
+            if streamer and not streamer.add(fp, rec["size"], rec["name"]):
+                return   # the same file, already packed for another entry
+        except TrackTooLarge:
+            done.drop(entry, fp)
+            too_big.add(rec["key"])
+            return
+        if track_cb and not resumed:
+            track_cb(rec)
+
+    # Resume: tracks finished before a restart are still in session_dir (continuedl picks up .part files)
+    if resume.get("tracks"):
+        by_key = {TrackManifest.key(t): t for t in rows}
+        for key, name in resume["tracks"].items():
+            fp = os.path.join(session_dir, name)
+            if key in by_key and os.path.isfile(fp):
+                accept(by_key[key], fp, resumed=True)
+
+    # Cache: link tracks we already have, download only the misses
+    cache = get_track_cache()
+    hits = _link_cached(cache, keys, session_dir)
+    for t, key in zip(rows, keys):
+        fp = hits.get(key or "")
+        if fp: accept(t, fp)
+
+    # Playlists fan out per entry over the worker pool; single items (or a failed probe) go by URL
+    is_playlist = table.is_playlist
+    # an entry listed twice downloads once (both would write the same file)
+    first = {}
+    for i, t in enumerate(rows):
+        first.setdefault(TrackManifest.key(t) or i, i)
+    todo = [i for i, key in enumerate(keys)
+            if key not in hits and rows[i] not in done and first[TrackManifest.key(rows[i]) or i] == i]
+    pending, pending_rows = [raw[i] for i in todo], [rows[i] for i in todo]
+    # entries that failed at probe time already had their first try: they wait for the retry rounds
+    relisted = {j: lost[i] for j, i in enumerate(todo) if i in lost}
+    raw = lost = None   # cache hits' and resumed tracks' info dicts go now
+
+    # Each converted track: tag its (already fetched) art, publish to the cache, then record it under its probed entry
+    def on_track(fp: str, e: dict, ref: tuple):
+        probed, cover = ref
+        if cover:
+            t = time.perf_counter()
+            embed_cover(fp, cover)
+            with tally:
+                timings["art"] += time.perf_counter() - t
+        key = _cache_key(e, include_art, output_format)
+        if cache and key: cache.insert(key, fp)
+        accept(probed or TrackInfo.from_info(e), fp, e)
+    stage = TranscodeStage(on_track, TARGET_ABR_KBPS, output_format)
+
+    # Downloads only fetch raw audio; each finished download is queued for the transcode stage
+    def hook_for(batch_rows: List[TrackInfo]):
+        def pp_hook(d: dict):
+            e = finished_track(d)
+            if not e: return
+            try:
+                size = os.path.getsize(e["filepath"])
+            except OSError:
+                size = 0
+            with tally:
+                counters["bytes_downloaded"] += size
+            sample_rss()
+            cover = None
+            if include_art:
+                # the cover fetch is network I/O: done here on the download side, so the
+                # CPU-sized transcode pool only writes the tag
+                t = time.perf_counter()
+                cover = fetch_cover(e)
+                with tally:
+                    timings["art"] += time.perf_counter() - t
+            i = d.get("entry_index")   # parallel playlist mode: which entry of this batch it is
+            stage.submit(e["filepath"], e, (batch_rows[i] if i is not None else None, cover))
+        return pp_hook
+
+    def run_pass(format_str: Optional[str], idxs: Optional[List[int]] = None):
+        """Download pending (or just pending[idxs]); entries that downloaded are released."""
+        kw = dict(progress_hook=progress_cb, format_str=format_str, use_pp_mp3=False, abr_kbps=TARGET_ABR_KBPS)
+        try:
+            if is_playlist:
+                if idxs is None:
+                    download_entries(pending, session_dir, include_art, release=True, pp_hook=hook_for(pending_rows), **kw)
+                    return
+                ok = download_entries([pending[i] for i in idxs], session_dir, include_art,
+                                      pp_hook=hook_for([pending_rows[i] for i in idxs]), **kw)
+                for i, good in zip(idxs, ok):
+                    if good: pending[i] = None
+            else:
+                # reuse the probe for a single video; anything else is resolved by URL
+                download_all(url, session_dir, include_art, info=single, pp_hook=hook_for([]), **kw)
+        finally:
+            stage.drain()
+
+    # PASS 1: strict chain, MP3 via the transcode stage (skipped if every entry hit)
+    mark = time.perf_counter()
+    if not (rows and not pending):
+        run_pass(None)
+    for j, e in relisted.items():
+        pending[j] = e
+
+    # Retry queue: only the entries that failed to download (their info dicts are still in
+    # pending), with the looser format, backing off between rounds
+    attempts = [1] * len(pending)
+    budget = ENTRY_RETRY_MAX_PER_JOB
+    for rnd in range(1, ENTRY_RETRY_ATTEMPTS if is_playlist else 1):
+        retry = [i for i, e in enumerate(pending) if e is not None and pending_rows[i] not in done][:budget]
+        if not retry: break
+        time.sleep(ENTRY_RETRY_BACKOFF_SEC * 2 ** (rnd - 1))
+        budget -= len(retry)
+        counters["entry_retries"] += len(retry)
+        for i in retry: attempts[i] += 1
+        run_pass(YTDLP_FORMAT_FALLBACK, retry)
+
+    # Single items / by-URL rips: looser format for the whole URL if nothing grabbed
+    if not is_playlist and not len(done):
+        counters["fallback_pass"] += 1
+        run_pass(YTDLP_FORMAT_FALLBACK)
+
+    timings["download"] = time.perf_counter() - mark   # downloads + overlapped transcodes
+    timings["transcode_busy"] = stage.busy              # summed ffmpeg time across workers
+
+    if not len(done):
+        if streamer and streamer.oversized:
+            raise RuntimeError(f"Track too large for part limit: {os.path.basename(streamer.oversized[0])}")
         raise RuntimeError("No audio files were downloaded (all items unavailable?).")
 
     # Docs + playlist
-    docs = _write_docs(session_dir, info, files)
-
-    # Build parts, then *verify* and shrink if any part >= limit (zip overhead can push over)
-    base = _derive_zip_basename(info)
-    margin = max(256 * 1024, int(zip_part_limit_bytes * 0.03))   # 3% or 256 KiB
-    target = max(1, zip_part_limit_bytes - margin)
-
-    def build(target_size: int) -> List[str]:
-        return build_zip_parts(files, session_dir, base, target_size, extra_first=docs)
-
-    parts = build(target)
-    if not parts:
-        biggest = max((os.path.getsize(f), f) for f in files)[1]
-        raise RuntimeError(f"Track too large for part limit: {os.path.basename(biggest)}")
-
-    # Iteratively shrink (safety) until all parts < (limit - margin)
-    if not _all_parts_under(parts, target):
-        for scale in (0.85, 0.75, 0.66, 0.5, 0.4, 0.33, 0.25):
-            target = max(1, int((zip_part_limit_bytes - margin) * scale))
-            parts = build(target)
-            if parts and _all_parts_under(parts, zip_part_limit_bytes - margin):
-                break
-
-    # Duration (best-effort: sum entry durations)
-    total_sec = 0
-    for e in _normalize_entries(info):
-        if e and e.get("duration"):
-            total_sec += int(e["duration"])
+    mark = time.perf_counter()
+    docs = _write_docs(session_dir, table, done)
+    timings["docs"] = time.perf_counter() - mark
+
+    mark = time.perf_counter()
+    if streamer:
+        parts = streamer.close(extra_last=docs)
+    else:
+        recs = [r for r in done.ordered(rows) if os.path.basename(r["path"]) not in sent]
+        parts = plan_parts([r["path"] for r in recs], base, zip_part_limit_bytes, extra_first=docs,
+                           names={r["path"]: r["name"] for r in recs})
+    timings["package"] = time.perf_counter() - mark
+
+    # What the probe listed but isn't delivered, and why
+    tries = {TrackManifest.key(t): n for t, n in zip(pending_rows, attempts)}
+    skipped = [{"id": t.id, "title": t.title, "attempts": tries.get(TrackManifest.key(t), 0),
+                "reason": "too large" if TrackManifest.key(t) in too_big else "unavailable"}
+               for t in rows if t not in done]
+
+    # Duration of what was delivered
+    total_sec = sum(int(r["duration"]) for r in done.records() if r["duration"])
     dur_hmmss = _hmmss(total_sec if total_sec > 0 else None)
+    sample_rss()
 
     return {
-        "zips": parts,
-        "count": len(files),
+        "parts": parts,
+        "count": len(done),
         "duration_hmmss": dur_hmmss,
         "bitrate": TARGET_ABR_KBPS,
+        "format": output_format,
+        "copied": stage.copied,
         "zip_base": base,
         "work_dir": session_dir,
+        "streamed": bool(streamer),
+        "timings": timings,
+        "memory": memory,
+        "entry_ids": sorted({r["id"] for r in done.records() if r["id"]}),   # for manifest.PlaylistManifest
+        "skipped": skipped,
+        "counters": {**counters, "tracks": len(done), "cache_hits": len(hits), "tracks_copied": stage.copied,
+                     "transcode_fallbacks": stage.fallbacks, "transcode_failures": len(stage.failed),
+                     "entries_rescued": sum(1 for t, n in zip(pending_rows, attempts) if n > 1 and t in done),
+                     "entries_skipped": len(skipped)},
     }
@@ -0,0 +1,177 @@
+# scheduler.py
+import time, asyncio, functools, itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Any, Dict
+from constants import (
+    RIP_MAX_CONCURRENT, RIP_MAX_PER_GUILD, RIP_MAX_PER_USER,
+    RIP_MAX_QUEUED, RIP_MAX_QUEUED_PER_GUILD, RIP_MAX_PROBES, RIP_AGING_PER_MIN,
+)
+from config import BROKER_WORKERS
+from broker import broker_enabled
+
+class QueueFull(RuntimeError):
+    """Admission refused: the rip queue (global or this guild's share) is full."""
+
+# -------------------- COST --------------------
+UNKNOWN_DURATION_SEC = 240  # assume a ~4 min track when the probe has no duration
+
+def estimate_cost(info: Optional[dict]) -> float:
+    """Job cost in audio-minutes from the probed info (entry count × duration)."""
+    if not info: return UNKNOWN_DURATION_SEC / 60
+    entries = info.get("entries")
+    items = [e for e in entries if e] if isinstance(entries, list) else [info]
+    total = sum(float(e.get("duration") or UNKNOWN_DURATION_SEC) for e in items)
+    return max(1.0, total / 60)
+
+# -------------------- TICKETS --------------------
+class Ticket:
+    """A queued/running rip. Tagged with its guild's virtual start/finish time when it is dispatched."""
+    __slots__ = ("seq", "guild_id", "user_id", "cost", "queued_at", "start_tag", "finish_tag",
+                 "on_position", "position", "_ready", "_sched", "running", "done")
+
+    def __init__(self, sched: "RipScheduler", seq: int, guild_id: Any, user_id: Any, cost: float,
+                 on_position: Optional[Callable[[int], None]]):
+        self.seq, self.guild_id, self.user_id, self.cost = seq, guild_id, user_id, cost
+        self.queued_at = time.monotonic()
+        self.start_tag = self.finish_tag = 0.0
+        self.on_position = on_position
+        self.position: Optional[int] = None
+        self._ready = asyncio.Event()
+        self._sched = sched
+        self.running = self.done = False
+
+    async def wait(self) -> None:
+        """Wait for a run slot; leaving the queue on cancellation."""
+        try:
+            await self._ready.wait()
+        except asyncio.CancelledError:
+            self.release()
+            raise
+
+    def release(self) -> None:
+        self._sched._release(self)
+
+# -------------------- SCHEDULER --------------------
+class RipScheduler:
+    """
+    Admission control + fair dispatch in front of rip_to_zips.
+    - at most max_running jobs overall, per_guild per guild and per_user per user
+    - across guilds, start-time fair queueing: each guild's virtual clock advances by
+      the cost of the jobs it runs, so one busy guild can't starve the rest
+    - within a guild, shortest job first with aging: a single track overtakes that
+      guild's 300-track playlist, but a waiting job's cost counts down by
+      aging_per_min audio-minutes per minute, so big jobs still get their turn
+    - the queue is bounded (overall and per guild); beyond that submit() raises QueueFull
+    Rips run on a dedicated thread pool (not the loop's default executor).
+    Loop-thread only.
+    """
+    def __init__(self, max_running: int = RIP_MAX_CONCURRENT, per_guild: int = RIP_MAX_PER_GUILD,
+                 per_user: int = RIP_MAX_PER_USER, max_queued: int = RIP_MAX_QUEUED,
+                 max_queued_per_guild: int = RIP_MAX_QUEUED_PER_GUILD, max_probes: int = RIP_MAX_PROBES,
+                 aging_per_min: float = RIP_AGING_PER_MIN):
+        self.max_running, self.per_guild, self.per_user = max_running, per_guild, per_user
+        self.max_queued, self.max_queued_per_guild = max_queued, max_queued_per_guild
+        self.aging_per_min = aging_per_min
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._guild_finish: Dict[Any, float] = {}
+        self._queued: list[Ticket] = []
+        self._running: list[Ticket] = []
+        self._pool = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="rip-job")
+        self._probe_pool = ThreadPoolExecutor(max_workers=max_probes, thread_name_prefix="rip-probe")
+
+    # ---------- admission ----------
+    def submit(self, guild_id: Any, user_id: Any, cost: float,
+               on_position: Optional[Callable[[int], None]] = None) -> Ticket:
+        if len(self._queued) >= self.max_queued:
+            raise QueueFull(f"The rip queue is full ({self.max_queued} waiting). Try again in a bit.")
+        if sum(1 for t in self._queued if t.guild_id == guild_id) >= self.max_queued_per_guild:
+            raise QueueFull(f"This server already has {self.max_queued_per_guild} rips waiting. Try again in a bit.")
+        t = Ticket(self, next(self._seq), guild_id, user_id, max(cost, 1e-6), on_position)
+        self._queued.append(t)
+        self._dispatch()
+        return t
+
+    def _eligible(self, t: Ticket) -> bool:
+        return (sum(1 for r in self._running if r.guild_id == t.guild_id) < self.per_guild
+                and sum(1 for r in self._running if r.user_id == t.user_id) < self.per_user)
+
+    def _urgency(self, t: Ticket, now: float) -> tuple:
+        """Within-guild order: cost minus aging credit (shortest first), then arrival."""
+        return t.cost - self.aging_per_min * (now - t.queued_at) / 60, t.seq
+
+    def _order(self) -> list[Ticket]:
+        """
+        Projected dispatch order: each guild's queue by urgency, tagged on from the
+        guild's virtual clock, all guilds merged by finish tag.
+        """
+        now = time.monotonic()
+        by_guild: Dict[Any, list[Ticket]] = {}
+        for t in self._queued:
+            by_guild.setdefault(t.guild_id, []).append(t)
+        for guild_id, tickets in by_guild.items():
+            tag = max(self._vtime, self._guild_finish.get(guild_id, 0.0))
+            for t in sorted(tickets, key=lambda t: self._urgency(t, now)):
+                t.start_tag, tag = tag, tag + t.cost
+                t.finish_tag = tag
+        return sorted(self._queued, key=lambda t: (t.finish_tag, t.seq))
+
+    def _dispatch(self) -> None:
+        self._queued = self._order()
+        for t in list(self._queued):
+            if len(self._running) >= self.max_running: break
+            if not self._eligible(t): continue
+            self._queued.remove(t)
+            self._running.append(t)
+            t.running = True
+            # charge the guild what actually ran (a job it skipped may have been tagged first)
+            t.start_tag = max(self._vtime, self._guild_finish.get(t.guild_id, 0.0))
+            t.finish_tag = t.start_tag + t.cost
+            self._guild_finish[t.guild_id] = t.finish_tag
+            self._vtime = max(self._vtime, t.start_tag)
+            t._ready.set()
+        for pos, t in enumerate(self._queued, start=1):
+            if t.position != pos:
+                t.position = pos
+                if t.on_position:
+                    try: t.on_position(pos)
+                    except Exception: pass
+
+    def _release(self, t: Ticket) -> None:
+        if t.done: return
+        t.done = True
+        if t in self._queued:
+            self._queued.remove(t)
+        if t in self._running:
+            self._running.remove(t)
+        if not self._queued and not self._running:
+            self._guild_finish.clear()  # idle: reset the virtual clock's history
+        self._dispatch()
+
+    # ---------- execution ----------
+    async def run(self, ticket: Ticket, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Wait for ticket's slot, run fn on the rip pool, then free the slot."""
+        await ticket.wait()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+        finally:
+            ticket.release()
+
+    async def probe(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a link probe on its own small pool so probes can't crowd out rips."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._probe_pool, functools.partial(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        return {"running": len(self._running), "queued": len(self._queued)}
+
+_scheduler: Optional[RipScheduler] = None
+
+def get_scheduler() -> RipScheduler:
+    global _scheduler
+    if _scheduler is None:
+        # worker mode: rips run in the worker processes, so the cap follows how many there are
+        workers = BROKER_WORKERS if broker_enabled() else 0
+        _scheduler = RipScheduler(max_running=workers or RIP_MAX_CONCURRENT)
+    return _scheduler
@@ -0,0 +1,118 @@
+# singleflight.py
+import asyncio, threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from utils import normalize_url
+
+def flight_key(link: str, include_art: bool, abr_kbps: int, part_limit: int, output_format: str = "mp3",
+               only_new_scope: Optional[str] = None) -> Tuple:
+    """only_new_scope: the manifest scope of an "only new" re-rip (its result depends on it)."""
+    return (normalize_url(link), bool(include_art), int(abr_kbps), int(part_limit), output_format, only_new_scope)
+
+class Flight:
+    """
+    One in-flight rip shared by every caller that asked for the same thing.
+    The leader runs rip_to_zips with progress_cb/part_cb below, which fan out to
+    every attached caller (late joiners get already-sealed parts replayed).
+    Each caller holds a reference (taken at join) until its delivery is done; the last release()
+    tells the caller to clean up the shared work dir.
+    """
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.info: Optional[dict] = None   # probed info, once the leader has it (consumed by the rip)
+        self.total: Optional[int] = None      # playlist entries to rip (the info's entries go with the rip)
+        self.work_dir: Optional[str] = None   # session dir reserved by the leader
+        self.manifest = None                  # "only new" re-rips: manifest.PlaylistManifest + full probe
+        self.full_info: Optional[dict] = None
+        self.link_mode = False                # deliver by download link (fileserver.py), not attachments
+        self.finished = 0                  # tracks finished so far
+        self.refs = 0
+        self._future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._subs: list[tuple[Optional[Callable[[dict], None]], Optional[Callable[[dict], None]]]] = []
+        self._parts: list[dict] = []
+        self._lock = threading.Lock()
+
+    # ---------- fan-out (called from rip worker threads) ----------
+    def progress_cb(self, d: dict) -> None:
+        with self._lock:
+            if d.get("status") == "finished":
+                self.finished += 1
+            subs = list(self._subs)
+        for on_progress, _ in subs:
+            if on_progress: on_progress(d)
+
+    def part_cb(self, part: dict) -> None:
+        with self._lock:
+            self._parts.append(part)
+            subs = list(self._subs)
+        for _, on_part in subs:
+            if on_part: on_part(part)
+
+    # ---------- callers (loop thread) ----------
+    def attach(self, on_progress: Optional[Callable[[dict], None]],
+               on_part: Optional[Callable[[dict], None]]) -> int:
+        """Subscribe (replaying sealed parts); returns tracks finished so far."""
+        with self._lock:
+            for part in self._parts:
+                if on_part: on_part(part)
+            self._subs.append((on_progress, on_part))
+            return self.finished
+
+    async def wait(self) -> Dict[str, Any]:
+        return await asyncio.shield(self._future)
+
+    def release(self) -> bool:
+        """Drop a reference after delivery; True for the last one (clean the work dir)."""
+        self.refs -= 1
+        return self.refs <= 0 and self._future.done()
+
+class FlightRegistry:
+    """In-flight rips by flight_key; a key is free again as soon as its rip ends."""
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+
+    def join(self, key: Hashable) -> Tuple[Flight, bool]:
+        """
+        (flight, is_leader) with a reference taken for the caller (drop it with release()).
+        The first caller leads and must finish() or fail() the flight.
+        """
+        f = self._flights.get(key)
+        leader = f is None
+        if leader:
+            f = self._flights[key] = Flight(key)
+        f.refs += 1
+        return f, leader
+
+    def detach(self, flight: Flight) -> bool:
+        """
+        Drop a caller's reference without a delivery (its task was cancelled). The last one
+        out cancels the flight (its key is free again); True then: clean the work dir.
+        """
+        flight.refs -= 1
+        if flight.refs > 0: return False
+        self.fail(flight, asyncio.CancelledError())
+        return True
+
+    def _forget(self, flight: Flight) -> None:
+        if self._flights.get(flight.key) is flight:   # not a newer flight under the same key
+            del self._flights[flight.key]
+
+    def finish(self, flight: Flight, result: Dict[str, Any]) -> None:
+        self._forget(flight)
+        if not flight._future.done():
+            flight._future.set_result(result)
+
+    def fail(self, flight: Flight, exc: BaseException) -> None:
+        self._forget(flight)
+        if not isinstance(exc, Exception):
+            exc = RuntimeError("rip was cancelled")
+        if not flight._future.done():
+            flight._future.set_exception(exc)
+            flight._future.exception()  # followers may be gone; don't warn "never retrieved"
+
+_registry: Optional[FlightRegistry] = None
+
+def get_flights() -> FlightRegistry:
+    global _registry
+    if _registry is None:
+        _registry = FlightRegistry()
+    return _registry
@@ -0,0 +1,106 @@
+# test_fileserver.py
+import os, sys, asyncio, zipfile, io
+from urllib.parse import urlsplit
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("aiohttp")
+from aiohttp.test_utils import TestClient, TestServer
+from fileserver import LinkServer
+from packager import make_part, open_part
+
+@pytest.fixture
+def part(tmp_path):
+    files = []
+    for i, size in enumerate((5000, 12345, 77), start=1):
+        fp = tmp_path / f"Track {i}.mp3"
+        fp.write_bytes(os.urandom(size))
+        files.append(str(fp))
+    return make_part(files, "Album", 1)
+
+@pytest.fixture
+def body(part):
+    with open_part(part) as z:
+        return z.read()
+
+def _path(url: str) -> str:
+    u = urlsplit(url)
+    return f"{u.path}?{u.query}"
+
+def run(server: LinkServer, fn):
+    async def main():
+        async with TestClient(TestServer(server.app())) as client:
+            return await fn(client)
+    return asyncio.run(main())
+
+def test_full_get(part, body):
+    server = LinkServer(port=1, secret="s")
+    url = server.publish(part)
+    async def go(client):
+        r = await client.get(_path(url))
+        assert r.status == 200
+        assert r.headers["Accept-Ranges"] == "bytes"
+        assert "Album_part_01.zip" in r.headers["Content-Disposition"]
+        return await r.read()
+    data = run(server, go)
+    assert data == body
+    assert zipfile.ZipFile(io.BytesIO(data)).testzip() is None
+
+@pytest.mark.parametrize("header,start,end", [("bytes=0-99", 0, 99), ("bytes=100-", 100, None), ("bytes=-50", -50, None)])
+def test_range(part, body, header, start, end):
+    server = LinkServer(port=1, secret="s")
+    url = server.publish(part)
+    async def go(client):
+        r = await client.get(_path(url), headers={"Range": header})
+        assert r.status == 206
+        first = start % len(body)
+        last = len(body) - 1 if end is None else end
+        assert r.headers["Content-Range"] == f"bytes {first}-{last}/{len(body)}"
+        return await r.read()
+    assert run(server, go) == body[start:None if end is None else end + 1]
+
+def test_unsatisfiable_range(part, body):
+    server = LinkServer(port=1, secret="s")
+    url = server.publish(part)
+    async def go(client):
+        r = await client.get(_path(url), headers={"Range": f"bytes={len(body)}-"})
+        assert r.status == 416
+        assert r.headers["Content-Range"] == f"bytes */{len(body)}"
+    run(server, go)
+
+def test_head(part, body):
+    server = LinkServer(port=1, secret="s")
+    url = server.publish(part)
+    async def go(client):
+        r = await client.head(_path(url))
+        assert r.status == 200
+        assert int(r.headers["Content-Length"]) == len(body)
+        assert await r.read() == b""
+    run(server, go)
+
+def test_bad_signature(part):
+    server = LinkServer(port=1, secret="s")
+    url = server.publish(part)
+    async def go(client):
+        r = await client.get(_path(url).replace("&s=", "&s=x"))
+        assert r.status == 403
+        other = LinkServer(port=1, secret="other").publish(part)   # signed with another key
+        r = await client.get(_path(other))
+        assert r.status == 403
+    run(server, go)
+
+def test_expired_and_unknown(part):
+    server = LinkServer(port=1, secret="s")
+    expired = server.publish(part, ttl_sec=-1)
+    fired = []
+    live = server.publish(part, on_expire=lambda: fired.append(1))
+    async def go(client):
+        assert (await client.get(_path(expired))).status == 410
+        link_id = urlsplit(live).path.split("/")[2]
+        server._expire(link_id)   # what the sweeper does at expiry
+        assert fired == [1]
+        assert (await client.get(_path(live))).status == 410
+        # signed with the same secret by another process (e.g. before a restart): unknown id
+        other = LinkServer(port=1, secret="s").publish(part)
+        assert (await client.get(_path(other))).status == 410
+    run(server, go)
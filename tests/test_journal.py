@@ -0,0 +1,113 @@
+# test_journal.py
+import os, sys, asyncio, types
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("discord")
+import journal, discord_adapter
+from journal import JobJournal
+from packager import make_part
+from scheduler import RipScheduler
+from workspace import Workspace
+
+@pytest.fixture
+def jdir(tmp_path, monkeypatch):
+    d = tmp_path / "jobs"
+    monkeypatch.setattr(journal, "JOURNAL_DIR", str(d))
+    return d
+
+def _start(job_id, work_dir, **kw):
+    fields = dict(channel=3, guild=1, user=2, link="https://youtube.com/watch?v=abc", include_art=False,
+                  output_format="mp3", only_new=False, scope=None, guild_limit=25 << 20, work_dir=str(work_dir),
+                  reserved=1000, link_mode=False)
+    fields.update(kw)
+    return JobJournal.start(job_id, **fields)
+
+def test_round_trip(jdir, tmp_path):
+    j = _start(7, tmp_path)
+    j.track({"key": "youtube:a", "path": str(tmp_path / "A [a].mp3")})
+    j.sent([{"files": [str(tmp_path / "A [a].mp3")]}])
+    (got,) = JobJournal.pending()
+    assert got.path == j.path and got.data["link"] == j.data["link"]
+    assert got.resume_state() == {"tracks": {"youtube:a": "A [a].mp3"}, "sent_files": ["A [a].mp3"], "sent_parts": 1}
+    j.close()
+    j.track({"key": "youtube:b", "path": str(tmp_path / "B [b].mp3")})   # late progress from the stopped rip
+    assert JobJournal.pending() == [] and not os.path.exists(j.path)
+
+# -------------------- RESUME --------------------
+class _Msg:
+    def __init__(self, sent):
+        self.id, self._sent = len(sent), sent
+    async def edit(self, **kw): self._sent.append(kw.get("content"))
+    async def delete(self): pass
+
+class _Channel:
+    id = 3
+    def __init__(self):
+        self.sent, self.files = [], []
+    async def send(self, content=None, files=None, **kw):
+        self.sent.append(content)
+        self.files += [f.filename for f in files or []]
+        return _Msg(self.sent)
+
+def test_journalled_job_is_resumed(jdir, tmp_path, monkeypatch):
+    ws = Workspace(str(tmp_path / "work"), quota_bytes=10 << 20, min_free_bytes=0)
+    work = tmp_path / "work" / "ripperroo_live"
+    work.mkdir()
+    (work / "A [a].mp3").write_bytes(b"a" * 100)
+    live = _start(1, work)
+    live.track({"key": "youtube:a", "path": str(work / "A [a].mp3")})
+    _start(2, tmp_path / "work" / "ripperroo_done").close()   # finished before the restart
+    calls = []
+    def rip(link, include_art, limit, progress_cb, part_cb, info, output_format, work_dir, resume, track_cb):
+        calls.append((link, work_dir, resume))
+        (work / "B [b].mp3").write_bytes(b"b" * 100)
+        track_cb({"key": "youtube:b", "path": str(work / "B [b].mp3")})
+        files = sorted(str(p) for p in work.iterdir())
+        part = make_part(files, "abc", 1, {fp: os.path.basename(fp) for fp in files})
+        part_cb(part)
+        return {"count": 2, "parts": [part], "work_dir": work_dir, "zip_base": "abc", "entry_ids": []}
+    monkeypatch.setattr(discord_adapter, "_backend", lambda: ((lambda *a: {"title": "x", "duration": 60}), rip))
+    monkeypatch.setattr(discord_adapter, "get_workspace", lambda: ws)
+    monkeypatch.setattr(discord_adapter, "get_scheduler", lambda: RipScheduler(max_running=1))
+    monkeypatch.setattr(discord_adapter, "broker_enabled", lambda: False)
+    channel = _Channel()
+    client = types.SimpleNamespace(get_channel=lambda cid: channel if cid == 3 else None)
+
+    journals = discord_adapter.reclaim_jobs()
+    assert [j.data["job"] for j in journals] == ["1"]
+    assert ws.stats()["reserved"] == 1000   # the session dir is adopted, so the sweep keeps it
+
+    async def main():
+        await discord_adapter.resume_jobs(client, journals)
+        while os.path.exists(live.path):
+            await asyncio.sleep(0.01)
+    asyncio.run(asyncio.wait_for(main(), 10))
+    assert calls == [(live.data["link"], str(work), {"tracks": {"youtube:a": "A [a].mp3"}, "sent_files": [], "sent_parts": 0})]
+    assert channel.files == ["abc_part_01.zip"]
+    assert any("resumed after a restart" in (c or "") for c in channel.sent)
+    assert JobJournal.pending() == []
+
+def test_failed_journal_write_leaves_no_ticket(jdir, tmp_path, monkeypatch):
+    # the journal is written before admission: a failed write mustn't leave a ticket holding a slot
+    class View:
+        choice = False
+        async def wait(self): pass
+    class Followup:
+        async def send(self, *a, **kw): return _Msg([])
+    class Response:
+        async def defer(self, **kw): pass
+    def boom(*a, **kw): raise OSError("disk full")
+    sched = RipScheduler(max_running=1)
+    ws = Workspace(str(tmp_path / "work"), quota_bytes=10 << 20, min_free_bytes=0)
+    monkeypatch.setattr(discord_adapter, "ArtChoice", View)
+    monkeypatch.setattr(discord_adapter, "_backend", lambda: ((lambda *a: {"title": "x", "duration": 60}), None))
+    monkeypatch.setattr(discord_adapter, "get_scheduler", lambda: sched)
+    monkeypatch.setattr(discord_adapter, "get_workspace", lambda: ws)
+    monkeypatch.setattr(JobJournal, "start", boom)
+    interaction = types.SimpleNamespace(id=10, guild=types.SimpleNamespace(id=1, filesize_limit=25 << 20),
+                                        user=types.SimpleNamespace(id=2, mention="@u"), channel=_Channel(),
+                                        response=Response(), followup=Followup())
+    with pytest.raises(OSError):
+        asyncio.run(discord_adapter.handle_rip(interaction, "https://youtube.com/watch?v=abc"))
+    assert sched.stats() == {"running": 0, "queued": 0}
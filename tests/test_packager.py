@@ -0,0 +1,139 @@
+# test_packager.py
+import os, io, sys, random, zipfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import packager
+from packager import ZipSizer, StoredZipStream, zip_stored_size, plan_zip_parts, plan_parts, open_part, _write_zip
+
+NAMES = ["01 Intro.mp3", "Café del Mar.mp3", "Ünïcödé – 曲名 🎵.m4a", "empty.txt", "TRACKLIST.txt"]
+
+@pytest.fixture
+def tracks(tmp_path):
+    rnd = random.Random(5)
+    sizes = [4096, 70000, 123, 0, 900]
+    out = []
+    for name, size in zip(NAMES, sizes):
+        fp = tmp_path / name
+        fp.write_bytes(rnd.randbytes(size))
+        out.append(str(fp))
+    return out
+
+def _zipfile_bytes(files, names=None) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_STORED) as zf:
+        for fp in files:
+            zf.write(fp, packager.arcname(fp, names))
+    return buf.getvalue()
+
+def _streamed(files, names=None) -> bytes:
+    with StoredZipStream(files, arcnames=[packager.arcname(fp, names) for fp in files]) as z:
+        return z.read()
+
+# -------------------- BYTE IDENTITY --------------------
+def test_stream_matches_zipfile(tracks):
+    expected = _zipfile_bytes(tracks)
+    assert _streamed(tracks) == expected
+    assert zip_stored_size(tracks) == len(expected)
+
+def test_non_ascii_names_roundtrip(tracks):
+    with zipfile.ZipFile(io.BytesIO(_streamed(tracks))) as zf:
+        assert zf.namelist() == NAMES
+        assert zf.testzip() is None
+        info = zf.getinfo(NAMES[2])
+        assert info.flag_bits & 0x800   # UTF-8 name flag
+
+def test_member_names(tracks):
+    names = {tracks[0]: "Song.mp3", tracks[2]: "Song (2).m4a"}
+    expected = _zipfile_bytes(tracks, names)
+    assert _streamed(tracks, names) == expected
+    assert zip_stored_size(tracks, names) == len(expected)
+    part = plan_parts(tracks, "t", 10**6, names=names)[0]
+    with open_part(part) as z:
+        assert z.read() == _zipfile_bytes(part["files"], names)
+
+def test_seek_and_ranges(tracks):
+    data = _zipfile_bytes(tracks)
+    rnd = random.Random(1)
+    with StoredZipStream(tracks) as z:
+        assert z.seek(0, io.SEEK_END) == len(data) == z.size
+        for _ in range(200):
+            start = rnd.randrange(len(data))
+            n = rnd.randrange(1, 9000)
+            z.seek(start)
+            got = b""
+            while len(got) < n and (chunk := z.read(n - len(got))):   # raw reads may stop at a member boundary
+                got += chunk
+            assert got == data[start:start + n]
+
+def test_sizer_incremental(tracks):
+    sizer = ZipSizer()
+    for i, fp in enumerate(tracks, start=1):
+        name, size = os.path.basename(fp), os.path.getsize(fp)
+        predicted = sizer.with_member(name, size)
+        sizer.add(name, size)
+        assert predicted == sizer.total == len(_zipfile_bytes(tracks[:i]))
+    assert ZipSizer().total == len(_zipfile_bytes([]))
+
+# -------------------- ZIP64 --------------------
+# Real ZIP64 archives need > 4 GiB; zipfile and packager both read the limits at call
+# time, so lowering them puts the same code paths at small sizes.
+@pytest.mark.parametrize("limit", [50, 122, 123, 130, 900, 4096, 4300, 5000, 70000, 74000, 76000, 80000])
+def test_zip64_boundary(tracks, monkeypatch, limit):
+    monkeypatch.setattr(zipfile, "ZIP64_LIMIT", limit)
+    expected = _zipfile_bytes(tracks)
+    if limit < 70000: assert b"PK\x06\x06" in expected   # the central directory starts past the limit
+    assert _streamed(tracks) == expected
+    assert zip_stored_size(tracks) == len(expected)
+
+@pytest.mark.parametrize("count_limit", [1, 4, 5])
+def test_zip64_file_count(tracks, monkeypatch, count_limit):
+    monkeypatch.setattr(zipfile, "ZIP_FILECOUNT_LIMIT", count_limit)
+    expected = _zipfile_bytes(tracks)
+    assert _streamed(tracks) == expected
+    assert zip_stored_size(tracks) == len(expected)
+
+# -------------------- PLANNING --------------------
+def test_planned_parts_fit_exactly(tracks, tmp_path):
+    docs, music = tracks[3:], tracks[:3]
+    limit = 75000
+    plan = plan_zip_parts(music, limit, extra_first=docs)
+    assert sorted(fp for members in plan for fp in members) == sorted(tracks)
+    assert all(fp in plan[0] for fp in docs)
+    out = tmp_path / "zips"
+    out.mkdir()
+    for i, members in enumerate(plan):
+        zp = _write_zip(str(out / f"p{i}.zip"), members)
+        assert os.path.getsize(zp) == zip_stored_size(members) <= limit
+
+def test_duplicate_paths_packed_once(tracks):
+    plan = plan_zip_parts([tracks[0], tracks[0], tracks[1]], 10**6)
+    assert plan == [[tracks[0], tracks[1]]]
+
+def test_track_too_large(tracks):
+    with pytest.raises(packager.TrackTooLarge):
+        plan_zip_parts(tracks[:2], 5000)
+
+# -------------------- STREAMED PARTS --------------------
+def test_part_streamer_keeps_a_second_part_open(tmp_path):
+    # 60k, 60k, 30k, 30k in a 100k limit: next-fit seals [60k] [60k] [30k 30k]; with a second
+    # open part the 30k tracks fill the room next to the 60k ones
+    sizes = [60000, 60000, 30000, 30000]
+    files = []
+    for i, size in enumerate(sizes):
+        fp = tmp_path / f"t{i}.mp3"
+        fp.write_bytes(b"\0" * size)
+        files.append(str(fp))
+    doc = tmp_path / "TRACKLIST.txt"
+    doc.write_text("tracks")
+    sealed = []
+    streamer = packager.PartStreamer("x", 100000, sealed.append)
+    for fp in files:
+        assert streamer.add(fp)
+    assert not streamer.add(files[0])
+    parts = streamer.close(extra_last=[str(doc)])
+    assert parts == sealed and [p["name"] for p in parts] == ["x_part_01.zip", "x_part_02.zip"]
+    assert sorted(fp for p in parts for fp in p["files"]) == sorted(files + [str(doc)])
+    assert str(doc) in parts[-1]["files"]
+    for p in parts:
+        assert p["size"] == zip_stored_size(p["files"]) <= 100000
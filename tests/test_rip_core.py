@@ -0,0 +1,104 @@
+# test_rip_core.py
+import os, sys, shutil, threading, subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("yt_dlp")
+if not shutil.which("ffmpeg"):
+    pytest.skip("ffmpeg not on PATH", allow_module_level=True)
+import rip_core
+
+DEAD = 3   # this entry's enclosure 404s, so a full probe returns it as None
+
+@pytest.fixture(scope="module")
+def feed(tmp_path_factory):
+    src = tmp_path_factory.mktemp("src") / "t.m4a"
+    subprocess.run(["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-f", "lavfi",
+                    "-i", "sine=frequency=440:duration=1", "-c:a", "aac", "-b:a", "96k", str(src)], check=True)
+    audio = src.read_bytes()
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *a): pass
+        def do_HEAD(self): self._send(head=True)
+        def do_GET(self): self._send()
+        def _send(self, head=False):
+            base = f"http://{self.headers.get('Host')}"
+            if self.path == "/feed.xml":
+                items = "".join(f'<item><title>Track {i}</title><guid>g{i}</guid><enclosure url="{base}/t/{i}.m4a" '
+                                f'type="audio/mp4" length="1"/></item>' for i in range(1, 5))
+                body = (f'<?xml version="1.0"?><rss version="2.0"><channel><title>Feed</title><link>{base}/</link>'
+                        f'<description>test</description>{items}</channel></rss>').encode("utf-8")
+            elif self.path == f"/t/{DEAD}.m4a":
+                self.send_error(404); return
+            else:
+                body = audio
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if not head: self.wfile.write(body)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/feed.xml"
+    httpd.shutdown()
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(rip_core, "get_track_cache", lambda: None)
+    monkeypatch.setattr(rip_core, "ENTRY_RETRY_BACKOFF_SEC", 0)
+
+def test_dead_entry_is_retried_and_reported(feed, tmp_path):
+    res = rip_core.rip_to_zips(feed, False, 45 << 20, part_cb=lambda p: None, work_dir=str(tmp_path))
+    assert res["count"] == 3
+    assert [(s["title"], s["attempts"], s["reason"]) for s in res["skipped"]] == \
+        [(f"Track {DEAD}", rip_core.ENTRY_RETRY_ATTEMPTS, "unavailable")]
+    assert res["counters"]["entry_retries"] == rip_core.ENTRY_RETRY_ATTEMPTS - 1
+    lines = (tmp_path / "TRACKLIST.txt").read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 4
+    assert lines[DEAD - 1].startswith(f"{DEAD:02d}.") and lines[DEAD - 1].endswith("(unavailable)")
+
+def test_parts_use_display_names(feed, tmp_path):
+    parts = []
+    res = rip_core.rip_to_zips(feed, False, 45 << 20, part_cb=parts.append, work_dir=str(tmp_path))
+    names = [n for p in res["parts"] for n in p["names"]]
+    assert sorted(n for n in names if n.endswith(".mp3")) == ["Track 1.mp3", "Track 2.mp3", "Track 4.mp3"]
+
+def test_flat_probe_parts_use_display_names(feed, tmp_path):
+    # only_new rips pass a flat probe: entries have no extractor id, manifest ids are "url:..."
+    info = rip_core.extract_info(feed, str(tmp_path), False, flat=True)
+    res = rip_core.rip_to_zips(feed, False, 45 << 20, part_cb=lambda p: None, info=info, work_dir=str(tmp_path))
+    names = [n for p in res["parts"] for n in p["names"]]
+    assert sorted(n for n in names if n.endswith(".mp3")) == ["Track 1.mp3", "Track 2.mp3", "Track 4.mp3"]
+
+def test_display_name_strips_only_the_extractor_id():
+    from tracks import display_name
+    assert display_name("/s/Song [g1].mp3", "g1") == display_name("/s/Song [g1].mp3") == "Song.mp3"
+    assert display_name("/s/Live [2019] [g1].mp3", "g1") == "Live [2019].mp3"
+    assert display_name("/s/Live [2019].mp3", "g1") == "Live [2019].mp3"
+
+def test_worker_gets_a_compact_probe(feed, tmp_path):
+    # worker mode sends the probe through the broker's job row as a flat listing
+    from broker import _compact_probe
+    import json
+    full = rip_core.extract_info(feed, str(tmp_path), False)
+    compact = _compact_probe(json.loads(json.dumps(full, default=str)))
+    assert len(json.dumps(compact)) < len(json.dumps(full, default=str)) / 2
+    assert compact["entries"][DEAD - 1] is None and compact["entries"][0]["_type"] == "url_transparent"
+    res = rip_core.rip_to_zips(feed, False, 45 << 20, part_cb=lambda p: None, info=compact, work_dir=str(tmp_path))
+    names = [n for p in res["parts"] for n in p["names"]]
+    assert sorted(n for n in names if n.endswith(".mp3")) == ["Track 1.mp3", "Track 2.mp3", "Track 4.mp3"]
+    assert [s["title"] for s in res["skipped"]] == [f"Track {DEAD}"]
+
+def test_covers_are_fetched_on_the_download_side(feed, tmp_path, monkeypatch):
+    jpeg = tmp_path / "c.jpg"
+    subprocess.run(["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", "color=red:s=16x16",
+                    "-frames:v", "1", str(jpeg)], check=True)
+    fetched = []
+    def fetch_cover(e):
+        fetched.append(threading.current_thread().name)
+        return jpeg.read_bytes()
+    monkeypatch.setattr(rip_core, "fetch_cover", fetch_cover)
+    res = rip_core.rip_to_zips(feed, True, 45 << 20, part_cb=lambda p: None, work_dir=str(tmp_path))
+    assert len(fetched) == res["count"] and not any(n.startswith("rip-ffmpeg") for n in fetched)
+    from mutagen.id3 import ID3
+    mp3s = [fp for p in res["parts"] for fp in p["files"] if fp.endswith(".mp3")]
+    assert mp3s and all(ID3(fp).getall("APIC") for fp in mp3s)
@@ -0,0 +1,91 @@
+# test_scheduler.py
+import os, sys, asyncio
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scheduler import RipScheduler, QueueFull
+
+def _sched(**kw) -> RipScheduler:
+    opts = dict(max_running=1, per_guild=1, per_user=1, max_queued=50, max_queued_per_guild=20, aging_per_min=0.0)
+    opts.update(kw)
+    return RipScheduler(**opts)
+
+def _drain(s: RipScheduler) -> list:
+    """Finish running jobs one at a time; the tickets in the order they were admitted."""
+    order = []
+    while s._running:
+        t = s._running[0]
+        order.append(t)
+        t.release()
+    return order
+
+def _running(tickets) -> list:
+    return [t.running for t in tickets]
+
+# -------------------- CAPS --------------------
+def test_global_cap():
+    s = _sched(max_running=2, per_guild=5, per_user=5)
+    ts = [s.submit(g, g, 1) for g in range(4)]
+    assert _running(ts) == [True, True, False, False]
+    assert s.stats() == {"running": 2, "queued": 2}
+    ts[0].release()
+    assert _running(ts) == [True, True, True, False]
+
+def test_guild_and_user_caps():
+    s = _sched(max_running=5, per_guild=2, per_user=1)
+    a1, a2, b1 = s.submit("g", "a", 1), s.submit("g", "a", 1), s.submit("g", "b", 1)
+    c1, d1 = s.submit("g", "c", 1), s.submit("h", "d", 1)
+    assert _running([a1, a2, b1, c1, d1]) == [True, False, True, False, True]   # a: 1/user, g: 2/guild
+    a1.release()
+    assert a2.running is True and c1.running is False   # a's next job queued before c's
+    assert sum(1 for t in s._running if t.guild_id == "g") == 2
+
+def test_queue_full():
+    s = _sched(max_queued=3, max_queued_per_guild=2)
+    s.submit("g", 1, 1)   # runs
+    s.submit("g", 2, 1); s.submit("g", 3, 1)
+    with pytest.raises(QueueFull):
+        s.submit("g", 4, 1)   # this guild's share
+    s.submit("h", 5, 1)
+    with pytest.raises(QueueFull):
+        s.submit("k", 6, 1)   # the whole queue
+    assert s.stats() == {"running": 1, "queued": 3}
+
+# -------------------- ORDER --------------------
+def test_shortest_first_within_guild():
+    s = _sched(max_running=1, per_guild=1, per_user=10)
+    first = s.submit("g", "u", 5)
+    big, small, mid = s.submit("g", "u", 300), s.submit("g", "u", 4), s.submit("g", "u", 20)
+    assert [small.position, mid.position, big.position] == [1, 2, 3]
+    assert _drain(s) == [first, small, mid, big]
+
+def test_aging_lets_a_big_job_through():
+    s = _sched(max_running=1, per_guild=1, per_user=10, aging_per_min=20.0)
+    first = s.submit("g", "u", 5)
+    big = s.submit("g", "u", 300)
+    big.queued_at -= 16 * 60   # waited 16 min: 300 - 320 audio-minutes
+    small = s.submit("g", "u", 4)
+    assert _drain(s) == [first, big, small]
+
+def test_fair_between_guilds():
+    s = _sched(max_running=1, per_guild=1, per_user=10)
+    hog = [s.submit("busy", "u", 10) for _ in range(6)]
+    late = [s.submit("quiet", "v", 10) for _ in range(2)]
+    order = [t.guild_id for t in _drain(s)]
+    # the quiet guild's jobs start right after the busy guild's first one, not after all six
+    assert order[:5] == ["busy", "quiet", "busy", "quiet", "busy"]
+    assert all(t.done for t in hog + late)
+
+def test_cancel_while_queued():
+    s = _sched()
+    running, queued = s.submit("g", "u", 1), s.submit("h", "v", 1)
+    async def main():
+        task = asyncio.create_task(queued.wait())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(main())
+    assert queued.done and s.stats() == {"running": 1, "queued": 0}
+    running.release()
+    assert s.stats() == {"running": 0, "queued": 0}
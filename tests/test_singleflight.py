@@ -0,0 +1,50 @@
+# test_singleflight.py
+import os, sys, asyncio
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from singleflight import FlightRegistry, flight_key
+
+URL = "https://www.youtube.com/watch?v=abc&utm_source=x"
+
+def _key(link=URL, art=True, abr=192, limit=8 << 20, fmt="mp3", scope=None):
+    return flight_key(link, art, abr, limit, fmt, scope)
+
+def test_identical_requests_share_one_flight():
+    async def main():
+        reg = FlightRegistry()
+        f1, lead1 = reg.join(_key())
+        f2, lead2 = reg.join(_key("https://m.youtube.com/watch/?v=abc"))   # same link, normalized
+        f3, lead3 = reg.join(_key("https://youtu.be/abc"))
+        assert f1 is f2 is f3 and (lead1, lead2, lead3) == (True, False, False)
+        assert f1.refs == 3
+        reg.finish(f1, {"count": 1})
+        assert await f2.wait() == {"count": 1}
+        assert [f.release() for f in (f1, f2, f3)] == [False, False, True]   # the last delivery cleans up
+        assert reg.join(_key())[1]   # finished: the next request starts a new flight
+    asyncio.run(main())
+
+@pytest.mark.parametrize("other", [dict(art=False), dict(abr=128), dict(limit=25 << 20), dict(fmt="opus"),
+                                   dict(scope="guild:1"), dict(link="https://youtube.com/watch?v=xyz")])
+def test_different_options_do_not_share(other):
+    async def main():
+        reg = FlightRegistry()
+        f1, _ = reg.join(_key())
+        f2, leader = reg.join(_key(**other))
+        assert f1 is not f2 and leader
+    asyncio.run(main())
+
+def test_last_detach_cancels_the_flight():
+    async def main():
+        reg = FlightRegistry()
+        f1, _ = reg.join(_key())
+        f2, _ = reg.join(_key())
+        assert reg.detach(f2) is False and not f1._future.done()   # the leader still wants it
+        assert reg.detach(f1) is True
+        with pytest.raises(RuntimeError, match="cancelled"):
+            await f1.wait()
+        f3, leader = reg.join(_key())
+        assert leader and f3 is not f1
+        reg.fail(f1, RuntimeError("late"))   # a stale flight doesn't drop its successor
+        assert reg.join(_key())[0] is f3
+    asyncio.run(main())
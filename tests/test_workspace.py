@@ -0,0 +1,68 @@
+# test_workspace.py
+import os, sys, time, asyncio
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import workspace
+from workspace import Workspace, WorkspaceFull, SESSION_PREFIX
+
+@pytest.fixture
+def ws(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace, "WORK_WAIT_SEC", 0)
+    legacy = tmp_path / "tmp"
+    legacy.mkdir()
+    monkeypatch.setattr(workspace.tempfile, "gettempdir", lambda: str(legacy))
+    return Workspace(str(tmp_path / "work"), quota_bytes=1000, min_free_bytes=0)
+
+def _reserve(ws, nbytes):
+    return asyncio.run(ws.reserve(nbytes))
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+# -------------------- QUOTA --------------------
+def test_reserve_rejects_over_quota(ws):
+    with pytest.raises(WorkspaceFull, match="more than the bot can ever"):
+        _reserve(ws, 1001)
+    a = _reserve(ws, 600)
+    assert os.path.isdir(a) and os.path.basename(a).startswith(SESSION_PREFIX)
+    with pytest.raises(WorkspaceFull, match="right now"):
+        _reserve(ws, 500)   # fits the quota, not next to the running rip
+    assert ws.stats() == {"sessions": 1, "reserved": 600, "pending_deletes": 0}
+    _reserve(ws, 400)
+    assert ws.reserved() == 1000
+
+def test_adopt_and_discard_accounting(ws, tmp_path):
+    a = _reserve(ws, 300)
+    resumed = tmp_path / "work" / f"{SESSION_PREFIX}resumed"
+    resumed.mkdir()
+    assert ws.adopt(str(resumed), 500) and ws.reserved() == 800
+    assert not ws.adopt(str(tmp_path / "gone"), 100) and ws.reserved() == 800
+    (resumed / "t.mp3").write_bytes(b"x")
+    ws.discard(str(resumed))
+    _wait_for(lambda: ws.reserved() == 300)
+    assert not resumed.exists() and os.path.isdir(a)
+    ws.discard(a)
+    ws.discard(None)
+    _wait_for(lambda: ws.stats() == {"sessions": 0, "reserved": 0, "pending_deletes": 0})
+
+# -------------------- SWEEP --------------------
+def test_sweep_removes_only_stale_untracked_session_dirs(ws, tmp_path):
+    old = time.time() - workspace.ORPHAN_MAX_AGE_HOURS * 3600 - 60
+    def mkdir(path, stale=True):
+        path.mkdir()
+        if stale: os.utime(path, (old, old))
+        return path
+    work, legacy = tmp_path / "work", tmp_path / "tmp"
+    orphan = mkdir(work / f"{SESSION_PREFIX}orphan")
+    legacy_orphan = mkdir(legacy / f"{SESSION_PREFIX}legacy")
+    fresh = mkdir(work / f"{SESSION_PREFIX}fresh", stale=False)
+    other = mkdir(work / "not_ours")
+    active = _reserve(ws, 100)
+    os.utime(active, (old, old))   # a long rip: old, but still reserved
+    assert ws.sweep() == 2
+    assert not orphan.exists() and not legacy_orphan.exists()
+    assert fresh.exists() and other.exists() and os.path.isdir(active)
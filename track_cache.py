@@ -0,0 +1,143 @@
+# track_cache.py
+import os, shutil, hashlib, tempfile, threading
+from collections import OrderedDict
+from typing import Optional
+from constants import TRACK_CACHE_MAX_MB
+from config import TRACK_CACHE_DIR
+
+_TMP_PREFIX = ".incoming_"
+
+def _link_or_copy(src: str, dst: str) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        # cross-device / FS without hard links
+        shutil.copy2(src, dst)
+
+class TrackCache:
+    """
+    Persistent store of finished tracks shared across rips.
+    Layout: <root>/<key>/<final filename>; the key dir's mtime is the LRU clock.
+    Inserts are staged in a hidden temp dir and published with one rename.
+    """
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes, oldest first
+        self._total = 0
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    # ---------- keys ----------
+    @staticmethod
+    def key_for(entry: Optional[dict], abr_kbps: int, include_art: bool,
+                output_format: str = "mp3") -> Optional[str]:
+        """extractor + video id + bitrate + art flag (+ output format); None if the entry can't be identified."""
+        if not entry or entry.get("_type") in ("playlist", "multi_video"): return None
+        vid = entry.get("id")
+        ie = entry.get("extractor_key") or entry.get("ie_key") or entry.get("extractor")
+        if not vid or not ie: return None
+        raw = f"{str(ie).lower()}:{vid}:{int(abr_kbps)}:{'art' if include_art else 'noart'}"
+        if output_format != "mp3": raw += f":{output_format}"  # mp3 keys predate the option
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ---------- index ----------
+    def _key_file(self, key: str) -> Optional[str]:
+        d = os.path.join(self.root, key)
+        try:
+            names = [n for n in os.listdir(d) if not n.startswith(".")]
+        except OSError:
+            return None
+        return os.path.join(d, names[0]) if names else None
+
+    def _load(self) -> None:
+        found = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(_TMP_PREFIX):
+                shutil.rmtree(path, ignore_errors=True)  # interrupted insert
+                continue
+            fp = self._key_file(name)
+            if not fp: continue
+            try:
+                found.append((os.path.getmtime(path), name, os.path.getsize(fp)))
+            except OSError:
+                pass
+        for _, key, size in sorted(found):
+            self._index[key] = size
+            self._total += size
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self._total -= size
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+    # ---------- public ----------
+    def lookup(self, key: Optional[str]) -> Optional[str]:
+        """Return the cached file for key (and mark it recently used), else None."""
+        if not key: return None
+        with self._lock:
+            fp = self._key_file(key)
+            if key not in self._index:
+                # published by another process (rip workers share the cache dir)
+                try: size = os.path.getsize(fp) if fp else None
+                except OSError: size = None
+                if size is None: return None
+                self._index[key] = size
+                self._total += size
+            if not fp:
+                self._total -= self._index.pop(key)
+                return None
+            self._index.move_to_end(key)
+        try: os.utime(os.path.join(self.root, key))
+        except OSError: pass
+        return fp
+
+    def link_into(self, key: Optional[str], dest_dir: str) -> Optional[str]:
+        """Hard-link the cached track into dest_dir; returns the new path or None on a miss."""
+        fp = self.lookup(key)
+        if not fp: return None
+        dst = os.path.join(dest_dir, os.path.basename(fp))
+        if os.path.exists(dst):
+            # another entry's file by the same name (e.g. a same-titled track) isn't a hit
+            try: return dst if os.path.samefile(dst, fp) else None
+            except OSError: return None
+        try:
+            _link_or_copy(fp, dst)
+        except OSError:
+            return None
+        return dst
+
+    def insert(self, key: Optional[str], src_path: str) -> None:
+        """Atomically publish src_path under key (no-op if present or unidentifiable)."""
+        if not key or not os.path.isfile(src_path): return
+        size = os.path.getsize(src_path)
+        if size > self.max_bytes: return
+        final = os.path.join(self.root, key)
+        if os.path.isdir(final): return
+        stage = tempfile.mkdtemp(prefix=_TMP_PREFIX, dir=self.root)
+        try:
+            _link_or_copy(src_path, os.path.join(stage, os.path.basename(src_path)))
+            os.rename(stage, final)
+        except OSError:
+            # lost a race with another insert, or the copy failed
+            shutil.rmtree(stage, ignore_errors=True)
+            return
+        with self._lock:
+            self._index[key] = size
+            self._total += size
+            self._evict()
+
+_cache: Optional[TrackCache] = None
+_cache_lock = threading.Lock()
+
+def get_track_cache() -> Optional[TrackCache]:
+    """Process-wide cache; None when disabled (TRACK_CACHE_MAX_MB <= 0)."""
+    global _cache
+    if TRACK_CACHE_MAX_MB <= 0: return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TrackCache(TRACK_CACHE_DIR, TRACK_CACHE_MAX_MB * 1024 * 1024)
+        return _cache
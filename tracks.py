@@ -0,0 +1,166 @@
+# tracks.py
+import os, re, threading
+from typing import Dict, List, Optional
+from manifest import entry_id
+
+# -------------------- TRACK TABLE --------------------
+def _pick(e: dict, *keys: str):
+    return next((e[k] for k in keys if e.get(k)), None)
+
+class TrackInfo:
+    """
+    The fields of one yt-dlp entry the pipeline reads after the probe (docs, naming,
+    manifest ids, sizing), so the full info dict (formats, thumbnails, subtitles,
+    HTTP headers) doesn't have to stay alive for the whole job.
+    """
+    __slots__ = ("id", "title", "artist", "album", "index", "duration", "filesize", "vid")
+
+    def __init__(self, id: Optional[str] = None, title: str = "", artist: str = "", album: str = "",
+                 index: Optional[int] = None, duration: Optional[float] = None, filesize: Optional[int] = None,
+                 vid: Optional[str] = None):
+        self.id, self.title, self.artist, self.album = id, title, artist, album
+        self.index, self.duration, self.filesize = index, duration, filesize
+        self.vid = vid   # the extractor's own id, as the download template writes it (id is manifest.entry_id)
+
+    @classmethod
+    def from_info(cls, e: Optional[dict]) -> "TrackInfo":
+        e = e or {}
+        return cls(entry_id(e), _pick(e, "track", "title") or "", _pick(e, "artist", "uploader", "channel") or "",
+                   e.get("album") or "", _pick(e, "playlist_index", "track_number"), e.get("duration"),
+                   _pick(e, "filesize", "filesize_approx"), e.get("id"))
+
+    def filled(self, other: Optional["TrackInfo"]) -> "TrackInfo":
+        """Copy with empty fields taken from other (e.g. the probed entry + its resolved download)."""
+        if other is None: return self
+        return TrackInfo(*(getattr(self, f) or getattr(other, f) for f in self.__slots__))
+
+class TrackTable:
+    """
+    Compact form of a probe: playlist-level names plus one TrackInfo per entry, in
+    playlist order (a single video is a one-row table; an entry that failed to resolve
+    is a row with only its index). rip_core builds it right
+    after extraction and reads only this from then on.
+    """
+    __slots__ = ("title", "playlist", "uploader", "is_playlist", "rows")
+
+    def __init__(self, title: str = "", playlist: str = "", uploader: str = "", is_playlist: bool = False,
+                 rows: Optional[List[TrackInfo]] = None):
+        self.title, self.playlist, self.uploader = title, playlist, uploader
+        self.is_playlist, self.rows = is_playlist, rows or []
+
+    @classmethod
+    def from_info(cls, info: Optional[dict]) -> "TrackTable":
+        if not info: return cls()
+        entries = info.get("entries")
+        listed = isinstance(entries, list) and bool(entries)
+        # an entry the probe couldn't resolve (None) keeps its slot as a bare row, so it can be
+        # retried and reported instead of silently vanishing
+        rows = ([TrackInfo.from_info(e) if e is not None else TrackInfo(index=i) for i, e in enumerate(entries, start=1)]
+                if listed else [TrackInfo.from_info(info)])
+        return cls(info.get("title") or "", _pick(info, "playlist_title", "playlist") or "",
+                   _pick(info, "uploader", "channel") or "", listed, rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+# -------------------- FINISHED TRACKS --------------------
+_ID_MARK = re.compile(r"^(.*\S) \[([^\[\]]+)\]$")   # "<title> [<id>]", see OUT_FILENAME_TEMPLATE
+
+def display_name(path: str, vid: Optional[str] = None) -> str:
+    """
+    A track's file name without the " [<id>]" the download template adds to keep
+    same-titled entries apart on disk; given vid (the extractor's id, TrackInfo.vid),
+    only that id is stripped, so a title ending in brackets keeps them.
+    """
+    stem, ext = os.path.splitext(os.path.basename(path))
+    m = _ID_MARK.match(stem)
+    if m and (vid is None or m.group(2) == vid):
+        stem = m.group(1)
+    return stem + ext
+
+class TrackManifest:
+    """
+    One rip's finished tracks, recorded from yt-dlp's post-move hooks (and cache
+    hits) as each one lands: entry key -> {"key", "id", "path", "name", "size", "duration", "track"}
+    ("track" is the entry's TrackInfo, filled in from the resolved download; "name" is
+    its display_name, made unique within the rip, which docs and ZIP members use).
+    Docs, packaging and caching look tracks up here instead of scanning the
+    session dir or matching files to entries by position.
+    Keys are the probed entry's id (manifest.entry_id, falling back to the file path),
+    so a skipped or failed entry leaves a gap instead of shifting later tracks.
+    Thread-safe (transcode workers add concurrently).
+    (Not to be confused with manifest.PlaylistManifest, which spans rips.)
+    """
+    def __init__(self):
+        self._by_key: Dict[str, dict] = {}
+        self._order: List[str] = []   # completion order
+        self._names: Dict[str, str] = {}   # display names taken (casefolded) -> path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(entry: Optional[TrackInfo], path: Optional[str] = None) -> Optional[str]:
+        return (entry.id if entry else None) or path
+
+    def add(self, entry: Optional[TrackInfo], path: str, size: Optional[int] = None,
+            info: Optional[dict] = None) -> Optional[dict]:
+        """
+        Record a finished track under the probed entry it came from; info is the
+        resolved info dict (richer metadata), if any; only its TrackInfo fields are kept.
+        Returns the record, or None if the entry already has one.
+        """
+        resolved = TrackInfo.from_info(info) if info else None
+        track = entry.filled(resolved) if entry else (resolved or TrackInfo())
+        key = self.key(entry, path)
+        rec = {"key": key, "id": entry.id if entry else None, "path": path, "name": None,
+               "size": os.path.getsize(path) if size is None else size,
+               "duration": (resolved and resolved.duration) or track.duration, "track": track}
+        stem, ext = os.path.splitext(display_name(path, (resolved and resolved.vid) or track.vid))
+        with self._lock:
+            if key in self._by_key: return None
+            # two entries resolved to one file share its name; anything else gets a free one
+            name = next((r["name"] for r in self._by_key.values() if r["path"] == path), None)
+            if name is None:
+                name, n = stem + ext, 1
+                while name.casefold() in self._names:
+                    n += 1
+                    name = f"{stem} ({n}){ext}"
+            self._names[name.casefold()] = path
+            rec["name"] = name
+            self._by_key[key] = rec
+            self._order.append(key)
+        return rec
+
+    def drop(self, entry: Optional[TrackInfo], path: Optional[str] = None) -> None:
+        """Forget a track that won't be delivered (e.g. too big for any part)."""
+        key = self.key(entry, path)
+        with self._lock:
+            rec = self._by_key.pop(key, None)
+            if rec is not None:
+                self._order.remove(key)
+                if not any(r["path"] == rec["path"] for r in self._by_key.values()):
+                    self._names.pop(rec["name"].casefold(), None)
+
+    def get(self, entry: Optional[TrackInfo]) -> Optional[dict]:
+        key = self.key(entry)
+        return self._by_key.get(key) if key else None
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def __contains__(self, entry: Optional[TrackInfo]) -> bool:
+        return self.get(entry) is not None
+
+    def records(self) -> List[dict]:
+        """Records in completion order."""
+        with self._lock:
+            return [self._by_key[k] for k in self._order]
+
+    def ordered(self, entries: List[TrackInfo]) -> List[dict]:
+        """Records in the probe's entry order; tracks the probe didn't list (e.g. a playlist resolved by URL) follow."""
+        seen, out = set(), []
+        for e in entries:
+            rec = self.get(e)
+            if rec and rec["key"] not in seen:
+                seen.add(rec["key"]); out.append(rec)
+        out += [r for r in self.records() if r["key"] not in seen]
+        return out
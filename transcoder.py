@@ -0,0 +1,157 @@
+# transcoder.py
+import os, threading, time, tempfile
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Optional
+from constants import TARGET_ABR_KBPS, TRANSCODE_WORKERS, DEFAULT_OUTPUT_FORMAT, PASSTHROUGH_MIN_KBPS
+from ffmpeg_utils import transcode_to_mp3, remux_audio
+
+def track_metadata(entry: Optional[dict]) -> Dict[str, str]:
+    """Text tags for a track (what yt-dlp's FFmpegMetadata would have written)."""
+    if not entry: return {}
+    meta = {
+        "title": entry.get("track") or entry.get("title"),
+        "artist": entry.get("artist") or entry.get("uploader") or entry.get("channel"),
+        "album": entry.get("album"),
+        "track": entry.get("track_number") or entry.get("playlist_index"),
+        "date": entry.get("release_year") or (entry.get("upload_date") or "")[:4] or None,
+    }
+    return {k: str(v) for k, v in meta.items() if v}
+
+# -------------------- PASSTHROUGH --------------------
+# codec family -> container its stream is copied into
+_COPY_EXT = {"mp3": ".mp3", "aac": ".m4a", "alac": ".m4a", "opus": ".opus", "vorbis": ".ogg", "flac": ".flac"}
+
+def codec_family(acodec: Optional[str]) -> Optional[str]:
+    """'mp4a.40.2' -> 'aac', 'opus' -> 'opus', ...; None if unknown."""
+    c = (acodec or "").lower().split(".")[0]
+    if not c or c == "none": return None
+    return "aac" if c in ("mp4a", "aac") else c
+
+def output_ext(entry: Optional[dict], output_format: str, abr_kbps: int = TARGET_ABR_KBPS) -> Optional[str]:
+    """
+    Container to stream-copy this track into, or None to transcode to MP3.
+    'original' copies any known codec; 'auto' only when the source already meets
+    the target (PASSTHROUGH_MIN_KBPS, scaled to abr_kbps).
+    """
+    if output_format == "mp3" or not entry: return None
+    fam = codec_family(entry.get("acodec"))
+    ext = _COPY_EXT.get(fam or "")
+    if output_format == "original":
+        # direct-file sources often report no codec; keep a known audio container as is
+        return ext or ("." + entry["ext"] if entry.get("ext") in ("mp3", "m4a", "opus", "ogg", "flac") else None)
+    if not ext: return None
+    floor = PASSTHROUGH_MIN_KBPS.get(fam)
+    abr = entry.get("abr") or entry.get("tbr")
+    if floor is None or not abr: return None
+    return ext if float(abr) >= floor * abr_kbps / TARGET_ABR_KBPS else None
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def get_transcode_pool() -> ThreadPoolExecutor:
+    """Bot-wide transcode pool (one ffmpeg per worker), shared by all rips; sized to the CPUs."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = TRANSCODE_WORKERS or os.cpu_count() or 2
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rip-ffmpeg")
+        return _pool
+
+class TranscodeStage:
+    """
+    One rip's CPU stage: downloads hand raw audio to submit() and go straight on
+    to the next entry; ffmpeg runs on the shared pool. Each track is transcoded
+    to MP3 or, per output_format, stream-copied (see output_ext); a failed copy
+    falls back to transcoding. on_done(out_path, entry, ref) fires from the pool
+    thread per finished track (raw input removed); ref is whatever was passed to submit().
+    drain() waits for everything submitted so far; failures (ffmpeg or on_done) drop the
+    track without stopping the others.
+    A submitted raw file belongs to the stage; ffmpeg writes to a private temp file that is
+    moved to a name no other track holds, so only files a track created are ever removed.
+    """
+    def __init__(self, on_done: Callable[[str, dict, Any], None], abr_kbps: int = TARGET_ABR_KBPS,
+                 output_format: str = DEFAULT_OUTPUT_FORMAT):
+        self.on_done = on_done
+        self.abr_kbps = abr_kbps
+        self.output_format = output_format
+        self.failed: list[str] = []
+        self.copied = 0
+        self.fallbacks = 0   # stream copies that had to be transcoded instead
+        self.busy = 0.0   # seconds spent in ffmpeg, summed over workers
+        self._futures: list[Future] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _claim(path: str) -> str:
+        """Create path, or 'stem (2).ext', ... if taken (by another track); returns the one created."""
+        stem, ext = os.path.splitext(path)
+        n = 1
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return path
+            except FileExistsError:
+                n += 1
+                path = f"{stem} ({n}){ext}"
+
+    def _convert(self, src: str, ext: Optional[str], entry: dict) -> str:
+        dst = os.path.splitext(src)[0] + (ext or ".mp3")
+        fd, out = tempfile.mkstemp(prefix=".transcode_", suffix=ext or ".mp3", dir=os.path.dirname(src) or ".")
+        os.close(fd)
+        meta = track_metadata(entry)
+        claimed = None
+        try:
+            if ext: remux_audio(src, out, metadata=meta)
+            else: transcode_to_mp3(src, out, self.abr_kbps, metadata=meta)
+            if dst != src: dst = claimed = self._claim(dst)
+            os.replace(out, dst)
+        except BaseException:
+            for fp in (out, claimed):
+                try:
+                    if fp: os.remove(fp)
+                except OSError: pass
+            raise
+        if dst != src: os.remove(src)
+        return dst
+
+    def _run(self, src: str, entry: dict, ref: Any) -> None:
+        ext = output_ext(entry, self.output_format, self.abr_kbps)
+        started = time.perf_counter()
+        try:
+            try:
+                dst = self._convert(src, ext, entry)
+            except Exception:
+                if not ext: raise
+                ext = None
+                with self._lock:
+                    self.fallbacks += 1
+                dst = self._convert(src, None, entry)   # container refused the stream
+        except Exception:
+            try: os.remove(src)
+            except OSError: pass
+            with self._lock:
+                self.failed.append(src)
+                self.busy += time.perf_counter() - started
+            return
+        with self._lock:
+            self.busy += time.perf_counter() - started
+            if ext: self.copied += 1
+        try:
+            self.on_done(dst, entry, ref)
+        except Exception as e:
+            print(f"⚠️ Dropped {os.path.basename(dst)}: {e}")
+            with self._lock:
+                self.failed.append(dst)
+
+    def submit(self, src_path: str, entry: dict, ref: Any = None) -> None:
+        f = get_transcode_pool().submit(self._run, src_path, entry, ref)
+        with self._lock:
+            self._futures.append(f)
+
+    def drain(self) -> None:
+        while True:
+            with self._lock:
+                pending, self._futures = self._futures, []
+            if not pending: return
+            for f in pending:
+                f.result()
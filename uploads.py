@@ -0,0 +1,57 @@
+# uploads.py
+import asyncio, random
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import aiohttp
+import discord
+from constants import UPLOAD_MAX_FILES, UPLOAD_RETRIES, UPLOAD_BACKOFF_SEC
+
+REQUEST_OVERHEAD = 64 * 1024   # multipart framing + message JSON, per request
+
+# -------------------- PLANNING --------------------
+def plan_batches(parts: List[Dict[str, Any]], request_limit: int,
+                 max_files: int = UPLOAD_MAX_FILES) -> List[List[Dict[str, Any]]]:
+    """
+    Group consecutive parts into messages before anything is sent: at most
+    max_files attachments and request_limit bytes (exact part sizes, see packager)
+    per message. A part that is alone over the limit still gets its own message.
+    """
+    batches: List[List[Dict[str, Any]]] = []
+    cur: List[Dict[str, Any]] = []
+    size = REQUEST_OVERHEAD
+    for p in parts:
+        if cur and (len(cur) >= max_files or size + p["size"] > request_limit):
+            batches.append(cur)
+            cur, size = [], REQUEST_OVERHEAD
+        cur.append(p)
+        size += p["size"]
+    if cur: batches.append(cur)
+    return batches
+
+def part_label(start: int, n: int, total: Optional[int]) -> str:
+    """'Part 2/5', 'Parts 2–3/5', 'Download' (single part); no '/total' while it's unknown."""
+    if total == 1: return "Download"
+    span = f"Part {start}" if n == 1 else f"Parts {start}–{start + n - 1}"
+    return f"{span}/{total}" if total else span
+
+# -------------------- RETRIES --------------------
+def too_large(e: BaseException) -> bool:
+    return isinstance(e, discord.HTTPException) and (e.status == 413 or "Payload Too Large" in str(e))
+
+def retryable(e: BaseException) -> bool:
+    """Transient: Discord 5xx, dropped connections, timeouts. 4xx (incl. 413) won't get better by resending."""
+    if isinstance(e, discord.HTTPException): return e.status >= 500
+    return isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError))
+
+async def send_with_retry(send: Callable[[], Awaitable[Any]], retries: int = UPLOAD_RETRIES,
+                          on_retry: Optional[Callable[[BaseException], None]] = None) -> Any:
+    """
+    Await send() (which must build fresh discord.File objects each call), resending
+    only it on transient errors with jittered exponential backoff.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return await send()
+        except Exception as e:
+            if attempt >= retries or not retryable(e): raise
+            if on_retry: on_retry(e)
+            await asyncio.sleep(UPLOAD_BACKOFF_SEC * (2 ** attempt) * (0.5 + random.random()))
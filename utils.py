@@ -1,4 +1,4 @@
-import os, shutil, time, zipfile, tempfile
+import os, shutil, time, zipfile
 
 # -------------------- PROGRESS BAR --------------------
 def progress_bar(percent: float, length: int = 10) -> str:
@@ -49,21 +49,31 @@ def clean_dir(path: str):
     except Exception:
         pass
 
-# -------------------- AUTO CLEANUP ON STARTUP --------------------
-def auto_clean_temp(prefix: str = "ripperroo_", older_than_hours: float = 1.0):
-    """Delete stale temporary ripperroo_* folders older than given age."""
-    tempdir = tempfile.gettempdir()
-    now = time.time()
-    cutoff = older_than_hours * 3600
+# -------------------- URL NORMALIZATION --------------------
+_TRACKING_PARAMS = {"si", "feature", "pp", "ab_channel", "fbclid", "gclid", "ref", "ref_src"}
 
-    for name in os.listdir(tempdir):
-        if not name.startswith(prefix):
-            continue
-        path = os.path.join(tempdir, name)
-        try:
-            mtime = os.path.getmtime(path)
-            if (now - mtime) > cutoff:
-                shutil.rmtree(path, ignore_errors=True)
-                print(f"🧹 Removed old temp folder: {path}")
-        except Exception:
-            pass
+def normalize_url(link: str) -> str:
+    """Canonical form of a media link, so equivalent URLs compare equal (dedup keys)."""
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+    parts = urlsplit(link.strip())
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m.", "music."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    path = parts.path.rstrip("/") or "/"
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=False)
+             if k not in _TRACKING_PARAMS and not k.startswith("utm_")]
+    if host == "youtu.be" and path != "/":
+        host, query = "youtube.com", [("v", path.lstrip("/"))] + query
+        path = "/watch"
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+# -------------------- MEMORY --------------------
+def rss_bytes() -> int:
+    """Resident set size of this process now (Linux /proc; peak RSS elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -0,0 +1,115 @@
+# worker.py
+"""
+Rip worker: takes probe/rip jobs from the local broker (see broker.py) and runs
+them with ytdlp_wrapper / rip_core, streaming progress and sealed parts back.
+The bot (with RIPPERROO_BROKER_DB set) only enqueues jobs and relays events, so
+yt-dlp never runs in the gateway process. Run as many as the host can take, and
+tell the bot how many (RIPPERROO_WORKERS): it runs that many rips at once.
+
+    RIPPERROO_BROKER_DB=cache/broker.sqlite3 python worker.py
+"""
+import os, sys, time, socket, argparse, threading, traceback
+from typing import Any, Dict
+import yt_dlp
+from constants import BROKER_POLL_SEC, WORKER_HEARTBEAT_SEC, PROGRESS_EVENT_SEC
+from broker import get_broker, broker_enabled, Broker
+from ytdlp_wrapper import extract_info, _PROGRESS_KEYS
+from rip_core import rip_to_zips
+
+class JobAbandoned(RuntimeError):
+    """The bot that enqueued the job restarted and gave up on it."""
+
+class _Heartbeat:
+    """
+    Keeps a claimed job's heartbeat fresh while it runs, so the bot can tell a dead
+    worker; .abandoned turns True when the bot gives up on the job.
+    """
+    def __init__(self, broker: Broker, job_id: int):
+        self.broker, self.job_id = broker, job_id
+        self.abandoned = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="worker-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(WORKER_HEARTBEAT_SEC):
+            try: self.abandoned = not self.broker.heartbeat(self.job_id)
+            except Exception: pass
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def _progress_relay(broker: Broker, job_id: int, hb: _Heartbeat):
+    """
+    yt-dlp progress hook -> events, 'downloading' ticks thinned to one per
+    PROGRESS_EVENT_SEC per file. Raises once the job is abandoned, stopping its downloads.
+    """
+    last: Dict[Any, float] = {}
+    lock = threading.Lock()
+    def hook(d: dict):
+        if hb.abandoned: raise JobAbandoned("job abandoned by the bot")
+        if d.get("status") == "downloading":
+            now = time.monotonic()
+            with lock:
+                if now - last.get(d.get("filename"), 0.0) < PROGRESS_EVENT_SEC: return
+                last[d.get("filename")] = now
+        broker.emit(job_id, "progress", {k: d.get(k) for k in _PROGRESS_KEYS})
+    return hook
+
+def _slim_track(rec: dict) -> dict:
+    """A TrackManifest record without the info dict, for a 'track' event."""
+    return {k: rec[k] for k in ("key", "id", "path", "size")}
+
+def run_job(broker: Broker, job_id: int, kind: str, args: Dict[str, Any], hb: _Heartbeat) -> Any:
+    if kind == "probe":
+        info = extract_info(args["url"], args["out_dir"], args["include_art"], args.get("format_str"), args.get("flat", False))
+        return yt_dlp.YoutubeDL.sanitize_info(info) if info else None
+    if kind == "rip":
+        part_cb = (lambda zp: broker.emit(job_id, "part", zp)) if args.get("stream_parts") else None
+        track_cb = (lambda rec: broker.emit(job_id, "track", _slim_track(rec))) if args.get("track_events") else None
+        return rip_to_zips(args["url"], args["include_art"], args["zip_part_limit_bytes"],
+                           _progress_relay(broker, job_id, hb), part_cb, args.get("info"), args["output_format"],
+                           args.get("work_dir"), args.get("resume"), track_cb)
+    raise ValueError(f"unknown job kind: {kind}")
+
+def serve(name: str, once: bool = False) -> None:
+    broker = get_broker()
+    broker.prune()
+    print(f"🛠️ Worker {name} waiting for jobs on {broker.path}")
+    while True:
+        job = broker.claim(name)
+        if not job:
+            if once: return
+            time.sleep(BROKER_POLL_SEC)
+            continue
+        job_id, kind, args = job
+        started = time.monotonic()
+        hb = _Heartbeat(broker, job_id)
+        try:
+            with hb:
+                result = run_job(broker, job_id, kind, args, hb)
+            broker.finish(job_id, result)
+            print(f"✅ {kind} #{job_id} done in {time.monotonic() - started:.1f}s")
+        except Exception as e:
+            if not hb.abandoned: traceback.print_exc()
+            broker.fail(job_id, str(e) or type(e).__name__)
+        st = broker.status(job_id)
+        if st and st["state"] == "abandoned":
+            broker.forget(job_id)   # nobody will collect it; the restarted bot resumes the rip itself
+            print(f"🛑 {kind} #{job_id} abandoned")
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="ripperRoo rip worker")
+    ap.add_argument("--name", default=f"{socket.gethostname()}:{os.getpid()}", help="worker id shown in the broker")
+    ap.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = ap.parse_args()
+    if not broker_enabled():
+        sys.exit("RIPPERROO_BROKER_DB is not set.")
+    serve(args.name, args.once)
+
+if __name__ == "__main__":
+    main()
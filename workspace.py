@@ -0,0 +1,201 @@
+# workspace.py
+import os, time, queue, shutil, asyncio, tempfile, threading
+from typing import Dict, Optional
+from constants import (
+    TARGET_ABR_KBPS, WORK_QUOTA_MB, WORK_MIN_FREE_MB, WORK_WAIT_SEC,
+    JANITOR_INTERVAL_SEC, ORPHAN_MAX_AGE_HOURS,
+)
+from config import WORK_DIR
+from scheduler import UNKNOWN_DURATION_SEC
+from utils import clean_dir
+
+SESSION_PREFIX = "ripperroo_"
+SOURCE_KBPS_GUESS = 160        # raw download bitrate when the probe has no size
+SLACK = 1.15                   # containers, docs, estimate error
+MB = 1024 * 1024
+
+class WorkspaceFull(RuntimeError):
+    """A rip can't get working space (over quota / disk too full, even after waiting)."""
+
+# -------------------- ESTIMATE --------------------
+def _entry_bytes(e: dict, output_format: str) -> tuple[float, float]:
+    """(raw download, finished track) bytes for one probed entry."""
+    dur = float(e.get("duration") or UNKNOWN_DURATION_SEC)
+    raw = e.get("filesize") or e.get("filesize_approx") or dur * SOURCE_KBPS_GUESS * 125
+    return raw, (raw if output_format != "mp3" else dur * TARGET_ABR_KBPS * 125)
+
+def _items(info: dict) -> list:
+    entries = info.get("entries")
+    return [e for e in entries if e] if isinstance(entries, list) else [info]
+
+def estimate_bytes(info: Optional[dict], output_format: str = "mp3") -> int:
+    """
+    Peak disk use of a rip from the probe: each track's raw download (filesize /
+    filesize_approx, else duration x SOURCE_KBPS_GUESS) plus its output (MP3 at the
+    target bitrate, or another copy of the source when stream-copying).
+    """
+    if not info: return int(UNKNOWN_DURATION_SEC * (SOURCE_KBPS_GUESS + TARGET_ABR_KBPS) * 125 * SLACK)
+    return int(sum(sum(_entry_bytes(e, output_format)) for e in _items(info)) * SLACK)
+
+def estimate_output_bytes(info: Optional[dict], output_format: str = "mp3") -> int:
+    """Size of the finished tracks alone (what gets delivered), from the probe."""
+    if not info: return int(UNKNOWN_DURATION_SEC * TARGET_ABR_KBPS * 125)
+    return int(sum(_entry_bytes(e, output_format)[1] for e in _items(info)))
+
+# -------------------- MANAGER --------------------
+class Workspace:
+    """
+    Session dirs for rips, under a byte quota.
+    - reserve() checks the estimate against the quota and the volume's real free
+      space (minus what running rips may still write); it waits for space up to
+      WORK_WAIT_SEC, and rejects with WorkspaceFull if it can never fit
+    - discard() hands a finished session dir to the janitor thread (no rmtree on
+      the event loop); its reservation is released once the files are gone
+    - the janitor also sweeps untracked ripperroo_* dirs older than ORPHAN_MAX_AGE_HOURS
+      every JANITOR_INTERVAL_SEC
+    reserve() is loop-thread only; discard() is safe from any thread.
+    """
+    def __init__(self, root: str = WORK_DIR, quota_bytes: int = WORK_QUOTA_MB * MB,
+                 min_free_bytes: int = WORK_MIN_FREE_MB * MB):
+        self.root = root
+        self.quota = quota_bytes
+        self.min_free = min_free_bytes
+        self._lock = threading.Lock()
+        self._reserved: Dict[str, int] = {}     # session dir -> reserved bytes
+        self._trash: "queue.Queue[str]" = queue.Queue()
+        self._janitor: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._freed: Optional[asyncio.Event] = None
+        os.makedirs(root, exist_ok=True)
+
+    # ---------- accounting ----------
+    def reserved(self) -> int:
+        with self._lock:
+            return sum(self._reserved.values())
+
+    def _fits(self, nbytes: int) -> bool:
+        reserved = self.reserved()
+        if reserved and reserved + nbytes > self.quota: return False
+        try:
+            free = shutil.disk_usage(self.root).free
+        except OSError:
+            return True
+        # running rips haven't written everything they reserved yet; count it as spoken for
+        return free - reserved - nbytes >= self.min_free
+
+    def _never_fits(self, nbytes: int) -> bool:
+        try:
+            total = shutil.disk_usage(self.root).total
+        except OSError:
+            total = None
+        return nbytes > self.quota or (total is not None and nbytes > total - self.min_free)
+
+    def _signal_freed(self) -> None:
+        if self._loop and self._freed:
+            self._loop.call_soon_threadsafe(self._freed.set)
+
+    # ---------- public ----------
+    async def reserve(self, nbytes: int, on_wait=None) -> str:
+        """Reserve nbytes and create a session dir for them; returns its path."""
+        if self._loop is None:
+            self._loop, self._freed = asyncio.get_running_loop(), asyncio.Event()
+        if self._never_fits(nbytes):
+            raise WorkspaceFull(f"This rip needs ~{nbytes // MB} MB of working space, more than the bot can ever free up.")
+        deadline = time.monotonic() + WORK_WAIT_SEC
+        waited = False
+        while not self._fits(nbytes):
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise WorkspaceFull("Not enough working disk space right now. Try again in a bit.")
+            if not waited and on_wait:
+                on_wait()
+            waited = True
+            self._freed.clear()
+            try:
+                # re-check periodically too: space can also be freed outside the bot
+                await asyncio.wait_for(self._freed.wait(), timeout=min(left, 15.0))
+            except asyncio.TimeoutError:
+                pass
+        path = tempfile.mkdtemp(prefix=SESSION_PREFIX, dir=self.root)
+        with self._lock:
+            self._reserved[path] = nbytes
+        return path
+
+    def adopt(self, path: str, nbytes: int) -> bool:
+        """Track an existing session dir (a rip resumed after a restart) so the sweep leaves it alone."""
+        if not os.path.isdir(path): return False
+        with self._lock:
+            self._reserved[path] = nbytes
+        return True
+
+    def discard(self, path: Optional[str]) -> None:
+        """Queue a session dir for deletion in the background (releases its reservation after)."""
+        if not path: return
+        self.start()
+        self._trash.put(path)
+
+    # ---------- janitor ----------
+    def start(self) -> None:
+        """Start the janitor thread (idempotent); it sweeps orphans right away."""
+        with self._lock:
+            if self._janitor and self._janitor.is_alive(): return
+            self._janitor = threading.Thread(target=self._run, name="rip-janitor", daemon=True)
+            self._janitor.start()
+
+    def _delete(self, path: str) -> None:
+        clean_dir(path)
+        with self._lock:
+            self._reserved.pop(path, None)
+        self._signal_freed()
+
+    def sweep(self) -> int:
+        """Remove untracked, stale session dirs; returns how many were removed."""
+        cutoff = time.time() - ORPHAN_MAX_AGE_HOURS * 3600
+        with self._lock:
+            active = set(self._reserved)
+        roots = {self.root, tempfile.gettempdir()}   # legacy dirs from before WORK_DIR
+        removed = 0
+        for root in roots:
+            try:
+                names = os.listdir(root)
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(root, name)
+                if not name.startswith(SESSION_PREFIX) or path in active: continue
+                try:
+                    if os.path.getmtime(path) > cutoff: continue
+                except OSError:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                print(f"🧹 Removed old temp folder: {path}")
+                removed += 1
+        return removed
+
+    def _run(self) -> None:
+        next_sweep = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= next_sweep:
+                try: self.sweep()
+                except Exception: pass
+                next_sweep = now + JANITOR_INTERVAL_SEC
+            try:
+                path = self._trash.get(timeout=max(0.1, next_sweep - time.monotonic()))
+            except queue.Empty:
+                continue
+            try: self._delete(path)
+            except Exception: pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._reserved), "reserved": sum(self._reserved.values()),
+                    "pending_deletes": self._trash.qsize()}
+
+_workspace: Optional[Workspace] = None
+
+def get_workspace() -> Workspace:
+    global _workspace
+    if _workspace is None:
+        _workspace = Workspace()
+    return _workspace
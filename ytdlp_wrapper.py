@@ -1,7 +1,14 @@
 # ytdlp_wrapper.py
-import os, yt_dlp
-from typing import Callable, Optional, Dict, Any
-from constants import OUT_FILENAME_TEMPLATE, YTDLP_FORMAT_PRIMARY, COOKIES_FILE
+import os, atexit, tempfile, threading, multiprocessing, yt_dlp
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from typing import Callable, Optional, Dict, Any, List
+from constants import (
+    OUT_FILENAME_TEMPLATE, YTDLP_FORMAT_PRIMARY, COOKIES_FILE,
+    PLAYLIST_WORKERS, PLAYLIST_PER_HOST, PLAYLIST_POOL,
+    YTDLP_SESSIONS, YTDLP_SESSION_MAX_USES,
+)
 
 class QuietLogger:
     def debug(self, msg): pass
@@ -16,6 +23,7 @@ def build_ydl_opts(
     format_str: Optional[str] = None,
     use_pp_mp3: bool = False,
     abr_kbps: int = 192,
+    pp_hook: Optional[Callable[[Dict[str, Any]], None]] = None,
 ):
     hooks = [progress_hook] if progress_hook else []
     fmt = format_str or YTDLP_FORMAT_PRIMARY
@@ -39,12 +47,13 @@ def build_ydl_opts(
         "socket_timeout": 10,
         "geo_bypass": True,
 
-        # playlists & art
+        # playlists (art is fetched/tagged once per distinct cover by art.py, not per entry here)
         "noplaylist": False,
-        "writethumbnail": include_art,
+        "writethumbnail": False,
         "skip_download": False,
 
         "progress_hooks": hooks,
+        "postprocessor_hooks": [pp_hook] if pp_hook else [],
 
         # Often helps YouTube when desktop player formats are odd
         "extractor_args": {"youtube": {"player_client": ["android"]}},
@@ -64,17 +73,283 @@ def build_ydl_opts(
 
     return opts
 
-def extract_info(url: str, out_dir: str, include_art: bool, format_str: Optional[str] = None) -> Optional[dict]:
-    with yt_dlp.YoutubeDL(build_ydl_opts(out_dir, include_art, format_str=format_str)) as ydl:
+# -------------------- SESSION POOL --------------------
+# Options that differ per call; everything else in build_ydl_opts is the same for every job
+_JOB_KEYS = ("format", "outtmpl", "noplaylist", "extract_flat",
+             "progress_hooks", "postprocessor_hooks")
+
+def _signature(opts: dict) -> str:
+    """Identity of a session's fixed options (a session only serves calls with the same ones)."""
+    return repr(sorted((k, repr(v)) for k, v in opts.items() if k not in _JOB_KEYS and k != "logger"))
+
+class _Session:
+    __slots__ = ("ydl", "sig", "uses", "selectors")
+    def __init__(self, ydl: yt_dlp.YoutubeDL, sig: str):
+        self.ydl, self.sig, self.uses = ydl, sig, 0
+        self.selectors: Dict[str, Any] = {}   # format string -> built selector
+
+class SessionPool:
+    """
+    Long-lived YoutubeDL instances, one per concurrent call, reused across jobs so
+    the HTTP connection pool (keep-alive), the loaded cookie jar and extractor
+    instances (with their player/JS caches) survive between calls instead of being
+    rebuilt up to three times per rip.
+    A checked-out session gets the call's _JOB_KEYS (outtmpl, format, hooks, filters)
+    swapped in and its per-run counters reset; on return every _JOB_KEYS param and the
+    hooks are dropped, so an idle session holds nothing of the job (hook closures would
+    otherwise keep a finished rip's stages, manifest and parts alive). Sessions are retired after YTDLP_SESSION_MAX_USES calls
+    or when a call raised or reported an error (ignoreerrors turns a failed probe or download
+    into a retcode); calls with postprocessors always get a fresh instance.
+    Thread-safe; a session is only ever used by one thread at a time.
+    """
+    def __init__(self, size: int = YTDLP_SESSIONS, max_uses: int = YTDLP_SESSION_MAX_USES):
+        self.size, self.max_uses = size, max_uses
+        self._idle: List[_Session] = []
+        self._lock = threading.Lock()
+        self.created = self.reused = 0
+
+    def _take(self, sig: str) -> Optional[_Session]:
+        with self._lock:
+            for i in range(len(self._idle) - 1, -1, -1):   # most recently used first (warmest)
+                if self._idle[i].sig == sig:
+                    self.reused += 1
+                    return self._idle.pop(i)
+            self.created += 1
+        return None
+
+    def _give(self, sess: _Session) -> None:
+        ydl = sess.ydl
+        for k in _JOB_KEYS:
+            ydl.params.pop(k, None)
+        ydl._progress_hooks, ydl._postprocessor_hooks = [], []
+        ydl._playlist_urls.clear()
+        sess.uses += 1
+        with self._lock:
+            if sess.uses < self.max_uses and len(self._idle) < self.size:
+                self._idle.append(sess)
+                return
+        ydl.close()
+
+    @staticmethod
+    def _configure(sess: _Session, opts: dict) -> None:
+        ydl, params = sess.ydl, sess.ydl.params
+        for k in _JOB_KEYS:
+            if k in opts: params[k] = opts[k]
+            else: params.pop(k, None)
+        ydl._parse_outtmpl()
+        fmt = params.get("format")
+        if fmt not in sess.selectors:
+            sess.selectors[fmt] = ydl.build_format_selector(fmt)
+        ydl.format_selector = sess.selectors[fmt]
+        ydl._progress_hooks = list(opts.get("progress_hooks") or [])
+        ydl._postprocessor_hooks = list(opts.get("postprocessor_hooks") or [])
+        # what YoutubeDL.__init__ would start a run with
+        ydl._download_retcode = ydl._num_downloads = ydl._num_videos = ydl._playlist_level = 0
+        ydl._playlist_urls.clear()
+        ydl._printed_messages.clear()
+
+    @contextmanager
+    def session(self, opts: dict):
+        """A YoutubeDL configured with opts: pooled when possible, else fresh (and closed after)."""
+        sess = None
+        if self.size > 0 and not opts.get("postprocessors"):
+            sig = _signature(opts)
+            sess = self._take(sig)
+            if sess:
+                self._configure(sess, opts)
+            else:
+                sess = _Session(yt_dlp.YoutubeDL(dict(opts)), sig)
+                sess.selectors[opts.get("format")] = sess.ydl.format_selector
+        if sess is None:
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                yield ydl
+            return
         try:
+            yield sess.ydl
+        except BaseException:
+            sess.ydl.close()   # mid-run state we can't vouch for
+            raise
+        if sess.ydl._download_retcode:
+            sess.ydl.close()
+            return
+        self._give(sess)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sess in idle:
+            sess.ydl.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"idle": len(self._idle), "created": self.created, "reused": self.reused}
+
+_sessions: Optional[SessionPool] = None
+_sessions_lock = threading.Lock()
+
+def get_sessions() -> SessionPool:
+    global _sessions
+    with _sessions_lock:
+        if _sessions is None:
+            _sessions = SessionPool()
+            atexit.register(_sessions.close)   # closing saves the cookie jar back to cookies.txt
+        return _sessions
+
+def extract_info(url: str, out_dir: str, include_art: bool, format_str: Optional[str] = None,
+                 flat: bool = False) -> Optional[dict]:
+    """Probe url; flat=True lists playlist entries without resolving each one (cheap)."""
+    opts = build_ydl_opts(out_dir, include_art, format_str=format_str)
+    if flat:
+        opts["extract_flat"] = "in_playlist"
+    try:
+        # outside the session: one that raised is retired, not pooled
+        with get_sessions().session(opts) as ydl:
             return ydl.extract_info(url, download=False)
-        except Exception:
-            return None
+    except Exception:
+        return None
+
+def warm_extractors() -> int:
+    """Load yt-dlp's extractor classes and open one pooled session now (the first probe would otherwise pay for it)."""
+    n = sum(1 for _ in yt_dlp.extractor.gen_extractor_classes())
+    with get_sessions().session(build_ydl_opts(tempfile.gettempdir(), False)):
+        pass
+    return n
+
+def _process_resolved(ydl: yt_dlp.YoutubeDL, info: dict) -> bool:
+    """
+    Download from an already-extracted info dict instead of resolving the URL again.
+    Format selection re-runs on info['formats'], so a fallback format_str still applies.
+    False if nothing was downloaded, or a download failed (ignoreerrors only records it in the retcode).
+    """
+    res = ydl.process_ie_result(dict(info), download=True)
+    return bool(res and res.get("requested_downloads")) and not ydl._download_retcode
 
 def download_all(url: str, out_dir: str, include_art: bool,
                  progress_hook: Optional[Callable[[Dict[str, Any]], None]] = None,
                  format_str: Optional[str] = None,
                  use_pp_mp3: bool = False,
-                 abr_kbps: int = 192) -> None:
-    with yt_dlp.YoutubeDL(build_ydl_opts(out_dir, include_art, progress_hook, format_str, use_pp_mp3, abr_kbps)) as ydl:
-        ydl.download([url])
+                 abr_kbps: int = 192,
+                 pp_hook: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 info: Optional[dict] = None) -> None:
+    """Download url; pass the probed (single-video) info to skip re-extraction."""
+    opts = build_ydl_opts(out_dir, include_art, progress_hook, format_str, use_pp_mp3, abr_kbps,
+                          pp_hook=pp_hook)
+    with get_sessions().session(opts) as ydl:
+        if info:
+            _process_resolved(ydl, info)
+        else:
+            ydl.download([url])
+
+# -------------------- PARALLEL PLAYLIST MODE --------------------
+# Fields relayed back from process-pool workers (hook dicts must be picklable)
+_PROGRESS_KEYS = ("status", "filename", "total_bytes", "total_bytes_estimate", "downloaded_bytes",
+                  "fragment_count", "n_fragments", "fragment_index", "eta", "speed", "elapsed")
+_TRACK_KEYS = ("id", "title", "extractor_key", "filepath", "playlist_index", "duration", "thumbnail",
+               "track", "artist", "album", "uploader", "channel", "track_number", "release_year", "upload_date",
+               "acodec", "abr", "tbr", "ext")
+
+def entry_url(e: Optional[dict]) -> Optional[str]:
+    if not e: return None
+    return e.get("webpage_url") or e.get("original_url") or e.get("url")
+
+def _host_of(url: str) -> str:
+    host = (urlparse(url).hostname or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+def _download_one(entry: dict, out_dir: str, include_art: bool, format_str: Optional[str],
+                  use_pp_mp3: bool, abr_kbps: int, progress_hook, pp_hook) -> bool:
+    opts = build_ydl_opts(out_dir, include_art, progress_hook, format_str, use_pp_mp3, abr_kbps, pp_hook=pp_hook)
+    opts["noplaylist"] = True
+    with get_sessions().session(opts) as ydl:
+        return _process_resolved(ydl, entry)
+
+def _download_one_proc(relay, index: int, entry: dict, out_dir: str, include_art: bool, format_str: Optional[str],
+                       use_pp_mp3: bool, abr_kbps: int) -> bool:
+    """Process-pool body: hook dicts are slimmed and relayed to the parent."""
+    def progress_hook(d):
+        relay.put(("progress", {k: d.get(k) for k in _PROGRESS_KEYS}))
+    def pp_hook(d):
+        info = d.get("info_dict") or {}
+        relay.put(("pp", {"status": d.get("status"), "postprocessor": d.get("postprocessor"),
+                          "entry_index": index, "info_dict": {k: info.get(k) for k in _TRACK_KEYS}}))
+    return _download_one(entry, out_dir, include_art, format_str, use_pp_mp3, abr_kbps, progress_hook, pp_hook)
+
+def download_entries(entries: List[dict], out_dir: str, include_art: bool,
+                     progress_hook: Optional[Callable[[Dict[str, Any]], None]] = None,
+                     format_str: Optional[str] = None,
+                     use_pp_mp3: bool = False,
+                     abr_kbps: int = 192,
+                     pp_hook: Optional[Callable[[Dict[str, Any]], None]] = None,
+                     workers: int = PLAYLIST_WORKERS,
+                     per_host: int = PLAYLIST_PER_HOST,
+                     pool: str = PLAYLIST_POOL,
+                     release: bool = False) -> List[bool]:
+    """
+    Parallel playlist mode: every probed entry is downloaded from its info dict
+    (no re-extraction) by its own YoutubeDL on a bounded pool ("thread" or
+    "process"), with at most per_host runs against one host.
+    Hooks keep the download_all contract but fire from worker threads; postprocessor
+    hook dicts also carry "entry_index", the position in entries of the entry they belong to.
+    release=True sets entries[i] to None once it downloaded, so a long playlist's info
+    dicts are freed as it progresses (None entries are skipped, e.g. on a second pass).
+    Returns per-entry success, in playlist order.
+    """
+    results = [False] * len(entries)
+    if not entries: return results
+
+    caps: Dict[str, threading.Semaphore] = {}
+    caps_lock = threading.Lock()
+    def host_cap(url: str) -> threading.Semaphore:
+        with caps_lock:
+            return caps.setdefault(_host_of(url), threading.Semaphore(max(1, per_host)))
+
+    procs = relay = pump = manager = None
+    if pool == "process":
+        manager = multiprocessing.Manager()
+        relay = manager.Queue()
+        procs = ProcessPoolExecutor(max_workers=max(1, workers))
+        def relay_hooks():
+            while (msg := relay.get()) is not None:
+                kind, d = msg
+                hook = progress_hook if kind == "progress" else pp_hook
+                if hook: hook(d)
+        pump = threading.Thread(target=relay_hooks, name="rip-dl-relay", daemon=True)
+        pump.start()
+
+    def run(i: int, e: dict):
+        with host_cap(entry_url(e) or ""):
+            try:
+                if procs:
+                    # live info dicts may hold lazy/unpicklable values
+                    ok = procs.submit(_download_one_proc, relay, i, yt_dlp.YoutubeDL.sanitize_info(e), out_dir,
+                                      include_art, format_str, use_pp_mp3, abr_kbps).result()
+                else:
+                    hook = (lambda d: pp_hook({**d, "entry_index": i})) if pp_hook else None
+                    ok = _download_one(e, out_dir, include_art, format_str, use_pp_mp3, abr_kbps,
+                                       progress_hook, hook)
+            except Exception:
+                ok = False
+        results[i] = ok
+        if ok and release: entries[i] = None
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rip-dl") as ex:
+            for f in [ex.submit(run, i, e) for i, e in enumerate(entries) if e is not None]:
+                f.result()
+    finally:
+        if procs:
+            procs.shutdown()
+            relay.put(None)
+            pump.join()
+            manager.shutdown()
+    return results
+
+def finished_track(d: Dict[str, Any]) -> Optional[dict]:
+    """
+    For postprocessor hooks: the info dict of a track whose files reached their
+    final location (MoveFiles finished), else None. info['filepath'] is the final file.
+    """
+    if d.get("postprocessor") != "MoveFiles" or d.get("status") != "finished":
+        return None
+    info = d.get("info_dict") or {}
+    return info if info.get("filepath") else None